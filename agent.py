@@ -1,10 +1,11 @@
 import asyncio
 import json
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
 import os
 from dotenv import load_dotenv
-from openai import AsyncOpenAI, OpenAI
+from openai import AsyncOpenAI, BadRequestError, NotFoundError, OpenAI
 
 from enumerations import (
     EffortType,
@@ -12,7 +13,13 @@ from enumerations import (
     ModelType,
     VerbosityType,
 )
+from chat_store import ChatStore, TieredChatStore
+from compaction import SUMMARY_INSTRUCTIONS, ConversationCompactor
+from context_window import ContextWindow
 from prompt import SYSTEM_PROMPT
+from streaming import StreamError, StreamTimer, read_response_event
+from tool_runtime import BaseToolRunner
+from tools.serialization import to_text
 
 load_dotenv(".env")
 
@@ -22,10 +29,21 @@ class SetMessagesError(Exception):
 
 
 class ChatMemory:
-    def __init__(self, prompt=SYSTEM_PROMPT):
+    def __init__(self, prompt=SYSTEM_PROMPT, store: Optional[ChatStore] = None):
         self.__ai_output: dict[str, Any] = {}
-        self.__messages: dict[str, list[dict]] = {}
-        self.__tool_msgs: dict[str, list[dict]] = {}
+        # user_id -> messages; by default an LRU in memory backed by SQLite
+        self.__messages: ChatStore = (
+            store if store is not None else TieredChatStore.from_env()
+        )
+        self.__messages.on_load = self._on_chat_loaded
+        self.__messages.on_evict = self._on_chat_evicted
+        # Tool messages of the current turn are always the tail of the history:
+        # keep only where that ephemeral segment starts so purging is a slice
+        self.__lock = threading.RLock()
+        self.__ephemeral_start: dict[str, int] = {}
+        # user_id -> (response_id, messages covered, last covered message):
+        # the part of the history the server already has for that response
+        self.__chain: dict[str, tuple] = {}
         self.init_msg = {
             "role": MessageType.DEVELOPER.value,
             "content": prompt,
@@ -39,9 +57,9 @@ class ChatMemory:
         return self.__ai_output[user_id].output
 
     def get_tool_msgs(self, user_id: int):
-        if user_id not in self.__tool_msgs:
+        if user_id not in self.__ephemeral_start:
             return []
-        return self.__tool_msgs[user_id]
+        return self.__messages[user_id][self.__ephemeral_start[user_id] :]
 
     def get_messages(self, user_id: int, with_prompt: bool = True):
         if user_id not in self.__messages:
@@ -53,6 +71,37 @@ class ChatMemory:
         else:
             return self.__messages[user_id][1:]
 
+    def reduce_context(self, user_id: int, model: str, context_window: ContextWindow) -> int:
+        """Drop the oldest turns that don't fit the token budget; returns tokens saved."""
+        messages, saved = context_window.fit(self.get_messages(user_id), model)
+        if saved:
+            self.set_messages(messages, user_id)
+        return saved
+
+    def get_chain(self, user_id: int) -> Optional[tuple[str, int]]:
+        """
+        (previous_response_id, messages covered) to continue a chained turn,
+        or None if the history changed and must be replayed in full.
+        """
+        chain = self.__chain.get(user_id)
+        if chain is None or user_id not in self.__messages:
+            return None
+
+        response_id, covered, anchor = chain
+        messages = self.__messages[user_id]
+        if covered > len(messages) or messages[covered - 1] is not anchor:
+            self.reset_chain(user_id)
+            return None
+        return response_id, covered
+
+    def _set_chain(self, user_id: int, response_id: str) -> None:
+        """The server state of `response_id` covers the whole current history."""
+        messages = self.__messages[user_id]
+        self.__chain[user_id] = (response_id, len(messages), messages[-1])
+
+    def reset_chain(self, user_id: int) -> None:
+        self.__chain.pop(user_id, None)
+
     def get_last_time(self):
         return self.__last_time
 
@@ -63,18 +112,57 @@ class ChatMemory:
             print(f"{user_id} not found in memory")
             return False
 
-        if user_id not in self.__tool_msgs:
-            self.__tool_msgs[user_id] = ai_output.output.copy()
-        else:
-            self.__tool_msgs[user_id] += ai_output.output.copy()
-
+        self._mark_ephemeral(user_id)
         self.__messages[user_id] += ai_output.output.copy()
 
+    def _mark_ephemeral(self, user_id: int):
+        with self.__lock:
+            if user_id not in self.__ephemeral_start:
+                self.__ephemeral_start[user_id] = len(self.__messages[user_id])
+                self.__messages.pin(user_id)
+
+    def _replace_history_prefix(self, user_id: int, old: list, replacement: list) -> bool:
+        """
+        Replace `old` (the messages right after the prompt) with `replacement`.
+
+        Returns False without changes if a turn is in progress or the history
+        no longer starts with exactly those messages.
+        """
+        with self.__lock:
+            if user_id in self.__ephemeral_start or user_id not in self.__messages:
+                return False
+
+            messages = self.__messages[user_id]
+            current = messages[1 : 1 + len(old)]
+            if len(current) != len(old) or any(a is not b for a, b in zip(current, old)):
+                return False
+
+            messages[1 : 1 + len(old)] = replacement
+            self.reset_chain(user_id)
+            return True
+
     def _clean_tool_msgs(self, user_id: int):
-        if user_id not in self.__tool_msgs:
+        if user_id not in self.__ephemeral_start:
             print(f"{user_id} not have tool messages")
 
-        self.__tool_msgs[user_id] = []
+        self.__ephemeral_start.pop(user_id, None)
+        self.__messages.unpin(user_id)
+
+    def commit(self, user_id: int) -> None:
+        """Persist the user's history in the chat store (end of each turn)."""
+        self.__messages.persist(user_id)
+
+    def _on_chat_loaded(self, user_id: int, messages: list) -> None:
+        # The stored prompt may be stale: always start from the current one
+        if messages and messages[0].get("role") == self.init_msg["role"]:
+            messages[0] = self.init_msg
+        self.reset_chain(user_id)
+        print(f"Chat of {user_id} loaded from storage")
+
+    def _on_chat_evicted(self, user_id: int) -> None:
+        self.__ai_output.pop(user_id, None)
+        self.reset_chain(user_id)
+        print(f"Chat of {user_id} evicted from memory")
 
     def has_chat(self, user_id: int) -> bool:
         return user_id in self.__messages and len(self.__messages[user_id]) > 0
@@ -82,10 +170,11 @@ class ChatMemory:
     def delete_chat(self, user_id: int) -> None:
         if user_id in self.__messages:
             del self.__messages[user_id]
-        if user_id in self.__tool_msgs:
-            del self.__tool_msgs[user_id]
+        if user_id in self.__ephemeral_start:
+            del self.__ephemeral_start[user_id]
         if user_id in self.__ai_output:
             del self.__ai_output[user_id]
+        self.reset_chain(user_id)
 
     def init_chat(self, user_id: int):
         self.set_messages([self.init_msg], user_id)
@@ -119,6 +208,9 @@ class ChatMemory:
                 )
 
         self.__messages[user_id] = messages
+        self.__ephemeral_start.pop(user_id, None)
+        self.__messages.unpin(user_id)
+        self.reset_chain(user_id)
 
     def _get_ai_msg(self, user_id: int):
         ai_output = self.get_ai_output(user_id)
@@ -136,16 +228,14 @@ class ChatMemory:
         return "No Answer"
 
     def _purge_tool_msgs(self, user_id: int):
-        tool_msgs = self.get_tool_msgs(user_id)
+        if user_id not in self.__ephemeral_start:
+            return
+
         messages = self.get_messages(user_id)
-        if tool_msgs:
-            clean_messages = [m for m in messages if m not in tool_msgs]
-            try:
-                self.set_messages(clean_messages, user_id)
-            except SetMessagesError as exc:
-                print(f"Error purging tool messages: {exc}")
-            finally:
-                self._clean_tool_msgs(user_id)
+        start = self.__ephemeral_start[user_id]
+        print(f"{len(messages) - start} tool messages purged")
+        del messages[start:]
+        self._clean_tool_msgs(user_id)
 
     def _set_tool_output(self, call_id, function_out, user_id: int):
         # Store as ephemeral tool output; do not persist in history
@@ -156,14 +246,10 @@ class ChatMemory:
         msg = {
             "type": "function_call_output",
             "call_id": call_id,
-            "output": str(function_out),
+            "output": to_text(function_out),
         }
 
-        if user_id not in self.__tool_msgs:
-            self.__tool_msgs[user_id] = [msg]
-        else:
-            self.__tool_msgs[user_id].append(msg)
-
+        self._mark_ephemeral(user_id)
         self.__messages[user_id].append(msg)
 
 
@@ -182,119 +268,32 @@ class AIClient:
     def _gen_ai_output(self, params: dict):
         return self.__client.responses.create(**params)
 
+    def _stream_ai_output(self, params: dict):
+        return self.__client.responses.create(**params, stream=True)
 
-class ToolRunner:
-    def __init__(
-        self,
-        error_msg="Ha ocurrido un error inesperado",
-    ):
-        self.ERROR_MSG = error_msg
-
-    def _run_functions(
-        self,
-        functions_called,
-        user_id: int,
-        chat_memory: ChatMemory,
-        rag_functions,
-    ) -> None:
-        print(f"{len(functions_called)} functions need to be called!")
-
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for tool in functions_called:
-                function_name = tool.name
-                function_args = tool.arguments
-                function_to_call = rag_functions[function_name]
-
-                print(f"function_name: {function_name}")
-                print(
-                    f"function_args: {function_args[:100]}{'...' if len(function_args) > 100 else ''}"
-                )
-                function_args = json.loads(function_args)
-
-                futures.append(executor.submit(function_to_call, **function_args))
-
-            self.run_futures(futures, functions_called, user_id, chat_memory)
-
-    def _run_custom_tools(
-        self, custom_tools_called, user_id: int, chat_memory: ChatMemory, rag_functions
-    ) -> None:
-        print(f"{len(custom_tools_called)} custom tools need to be called!")
-
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for tool in custom_tools_called:
-                print(f"Custom tool name: {tool.name}")
-                print(f"Custom tool input: {tool.input}")
-
-                function_args = {"tool_input": tool.input}
-                function_to_call = rag_functions[tool.name]
-
-                futures.append(executor.submit(function_to_call, **function_args))
-
-            self.run_futures(futures, custom_tools_called, user_id, chat_memory)
-
-    def run_futures(self, futures, tools_called, user_id: int, chat_memory: ChatMemory):
-        for future, tool in zip(futures, tools_called):
-            try:
-                function_out = future.result()
-                print(f"{tool.name}: {function_out[:100]}")  # type: ignore
-            except Exception as exc:
-                print(f"{tool.name}: {exc}")
-                function_out = self.ERROR_MSG
-
-            chat_memory._set_tool_output(tool.call_id, function_out, user_id)
-
-    async def _async_run_functions(
-        self, functions_called, user_id: int, chat_memory: ChatMemory, rag_functions
-    ) -> None:
-        print(f"{len(functions_called)} function need to be called!")
-        tasks = []
-        for tool in functions_called:
-            function_name = tool.name
-            function_args = tool.arguments
-            function_to_call = rag_functions[function_name]  # type: ignore
-
-            print(f"function_name: {function_name}")
-            print(
-                f"function_args: {function_args[:100]}{'...' if len(function_args) > 100 else ''}"
-            )
-            function_args = json.loads(function_args)
-
-            tasks.append(function_to_call(**function_args))
+    async def _async_stream_ai_output(self, params: dict):
+        return await self.__async_client.responses.create(**params, stream=True)
 
-        await self.run_coroutines(functions_called, tasks, user_id, chat_memory)
 
-    async def _async_run_custom_tools(  # type: ignore
-        self, custom_tools_called, user_id: int, chat_memory: ChatMemory, rag_functions
-    ) -> None:
-        print(f"{len(custom_tools_called)} custom tools need to be called!")
+class ToolRunner(BaseToolRunner):
+    """Runs the function and custom tool calls of a Responses API output."""
 
-        tasks = []
-        for tool in custom_tools_called:
-            print(f"function_name: {tool.name}")
-            print(f"Input tool: {tool.input}")
+    def _prepare_call(self, tool, rag_functions) -> tuple[str, Any, dict]:
+        function_to_call = rag_functions[tool.name]
+        if tool.type == MessageType.CUSTOM_TOOL_CALL.value:
+            print(f"Custom tool name: {tool.name}")
+            print(f"Custom tool input: {tool.input}")
+            return tool.name, function_to_call, {"tool_input": tool.input}
 
-            function_to_call = rag_functions[tool.name]  # type: ignore
-            function_args = {"tool_input": tool.input}
+        function_args = tool.arguments
+        print(f"function_name: {tool.name}")
+        print(
+            f"function_args: {function_args[:100]}{'...' if len(function_args) > 100 else ''}"
+        )
+        return tool.name, function_to_call, json.loads(function_args)
 
-            tasks.append(function_to_call(**function_args))
-
-        await self.run_coroutines(custom_tools_called, tasks, user_id, chat_memory)
-
-    async def run_coroutines(
-        self, tools_called, tasks, user_id: int, chat_memory: ChatMemory
-    ):
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for tool, function_out in zip(tools_called, results):
-            if isinstance(function_out, Exception):
-                print(f"{tool.name}: {function_out}")
-                function_out = self.ERROR_MSG  # type: ignore
-            else:
-                print(f"{tool.name}: {function_out[:100]}")  # type: ignore
-
-            chat_memory._set_tool_output(tool.call_id, function_out, user_id)
+    def _set_tool_output(self, chat_memory: ChatMemory, tool, output: str, user_id: int) -> None:
+        chat_memory._set_tool_output(tool.call_id, output, user_id)
 
 
 class Agent:
@@ -304,12 +303,221 @@ class Agent:
         model=ModelType.GPT_5.value,
         prompt=SYSTEM_PROMPT,
         api_key=os.getenv("OPENAI_API_KEY"),
+        tool_settings: Optional[dict] = None,
+        compaction: bool = False,
+        summary_model=ModelType.GPT_5_nano.value,
+        chain_responses: bool = False,
+        turn_timeout: Optional[float] = None,
     ):
         self.name = name
         self.model = model
         self.chat_memory = ChatMemory(prompt=prompt)
         self._ai_client = AIClient(api_key)
-        self._tool_runner = ToolRunner()
+        self._tool_runner = ToolRunner(tool_settings=tool_settings)
+        self.context_window = ContextWindow()
+        self.last_tokens_saved = 0
+        self.last_ttft: Optional[float] = None
+        self.summary_model = summary_model
+        self._compactor = (
+            ConversationCompactor(
+                self.context_window, self._summarize, self._async_summarize
+            )
+            if compaction
+            else None
+        )
+        # Chain calls with previous_response_id and send only the new items
+        self.chain_responses = chain_responses
+        # Seconds a user turn may spend calling tools (AGENT_TURN_TIMEOUT, 0 = no limit)
+        self.turn_timeout = (
+            float(os.getenv("AGENT_TURN_TIMEOUT") or 300)
+            if turn_timeout is None
+            else turn_timeout
+        )
+        self.input_stats = {
+            "requests": 0,
+            "chained": 0,
+            "fallbacks": 0,
+            "items_sent": 0,
+            "items_full": 0,
+            "bytes_sent": 0,
+            "bytes_full": 0,
+            "tokens_sent": 0,
+            "tokens_full": 0,
+        }
+
+    def _fit_context(self, user_id: int) -> int:
+        saved = self.chat_memory.reduce_context(
+            user_id, self.model, self.context_window
+        )
+        self.last_tokens_saved = saved
+        if saved:
+            print(f"Context reduced for {user_id}: {saved} tokens saved")
+        return saved
+
+    def _summary_params(self, transcript: str) -> dict:
+        params = {
+            "model": self.summary_model,
+            "input": [
+                {"role": MessageType.DEVELOPER.value, "content": SUMMARY_INSTRUCTIONS},
+                {"role": MessageType.USER.value, "content": transcript},
+            ],
+        }
+        if self.summary_model.startswith(ModelType.GPT_5.value):
+            params["reasoning"] = {"effort": EffortType.MINIMAL.value}
+        return params
+
+    def _summarize(self, transcript: str) -> str:
+        return self._ai_client._gen_ai_output(self._summary_params(transcript)).output_text
+
+    async def _async_summarize(self, transcript: str) -> str:
+        ai_output = await self._ai_client._async_gen_ai_output(
+            self._summary_params(transcript)
+        )
+        return ai_output.output_text
+
+    def _turn_deadline(self, turn_timeout: Optional[float]) -> Optional[float]:
+        timeout = self.turn_timeout if turn_timeout is None else turn_timeout
+        return time.monotonic() + timeout if timeout else None
+
+    @staticmethod
+    def _is_final(user_id: int, deadline: Optional[float]) -> bool:
+        """True once the turn deadline has passed: the model must answer without tools."""
+        if deadline is None or time.monotonic() < deadline:
+            return False
+        print(f"Turn deadline reached for {user_id}, asking for a final answer")
+        return True
+
+    def _turn_params(self, user_id: int, rag_prompt: list[dict], final: bool = False) -> dict:
+        messages = self.chat_memory.get_messages(user_id)
+        params = {
+            "model": self.model,  # type: ignore
+            "input": messages,  # type: ignore
+        }
+        chain = self.chat_memory.get_chain(user_id) if self.chain_responses else None
+        if chain is not None:
+            response_id, covered = chain
+            params["previous_response_id"] = response_id
+            params["input"] = messages[covered:]
+        if self.chain_responses:
+            params["store"] = True
+
+        if rag_prompt:
+            params["tools"] = rag_prompt
+            if final:
+                params["tool_choice"] = "none"
+        if self.model == ModelType.GPT_5.value:  # type: ignore
+            params["text"] = {"verbosity": VerbosityType.LOW.value}
+            params["reasoning"] = {"effort": EffortType.LOW.value}
+        return params
+
+    @staticmethod
+    def _tools_called(ai_output) -> list:
+        """Function and custom tool calls of a response, in call order."""
+        tool_types = (MessageType.FUNCTION_CALL.value, MessageType.CUSTOM_TOOL_CALL.value)
+        return [
+            item
+            for item in ai_output.output  # type: ignore
+            if item.type in tool_types
+        ]
+
+    def _run_tools(
+        self, tools_called, user_id: int, rag_functions, deadline: Optional[float] = None
+    ) -> None:
+        self._tool_runner._run_tools(
+            tools_called, user_id, self.chat_memory, rag_functions, deadline
+        )
+
+    async def _async_run_tools(
+        self, tools_called, user_id: int, rag_functions, deadline: Optional[float] = None
+    ) -> None:
+        await self._tool_runner._async_run_tools(
+            tools_called, user_id, self.chat_memory, rag_functions, deadline
+        )
+
+    def _request(self, create, user_id: int, rag_prompt: list[dict], final: bool = False):
+        """
+        Call the Responses API with `create`; if a chained call fails because
+        the previous response is no longer available on the server, replay
+        the full history.
+        """
+        params = self._turn_params(user_id, rag_prompt, final)
+        try:
+            response = create(params)
+        except (NotFoundError, BadRequestError) as exc:
+            if "previous_response_id" not in params:
+                raise
+            self._on_chain_error(user_id, exc)
+            params = self._turn_params(user_id, rag_prompt, final)
+            response = create(params)
+        self._count_input(user_id, params)
+        return response
+
+    async def _async_request(
+        self, create, user_id: int, rag_prompt: list[dict], final: bool = False
+    ):
+        params = self._turn_params(user_id, rag_prompt, final)
+        try:
+            response = await create(params)
+        except (NotFoundError, BadRequestError) as exc:
+            if "previous_response_id" not in params:
+                raise
+            self._on_chain_error(user_id, exc)
+            params = self._turn_params(user_id, rag_prompt, final)
+            response = await create(params)
+        self._count_input(user_id, params)
+        return response
+
+    def _on_chain_error(self, user_id: int, exc: Exception) -> None:
+        print(f"Previous response unavailable for {user_id}, replaying history: {exc}")
+        self.input_stats["fallbacks"] += 1
+        self.chat_memory.reset_chain(user_id)
+
+    def _advance_chain(self, user_id: int, ai_output) -> None:
+        if self.chain_responses and getattr(ai_output, "id", None):
+            self.chat_memory._set_chain(user_id, ai_output.id)
+
+    def _count_input(self, user_id: int, params: dict) -> None:
+        """Input of the request that was sent vs. the full history (only when chaining)."""
+        if not self.chain_responses:
+            return
+
+        sent = params["input"]
+        messages = self.chat_memory.get_messages(user_id)
+        stats = self.input_stats
+        stats["requests"] += 1
+        stats["chained"] += "previous_response_id" in params
+        stats["items_sent"] += len(sent)
+        stats["items_full"] += len(messages)
+        for msg in sent:
+            stats["bytes_sent"] += self.context_window.message_bytes(msg)
+            stats["tokens_sent"] += self.context_window.message_tokens(msg)
+        for msg in messages:
+            stats["bytes_full"] += self.context_window.message_bytes(msg)
+            stats["tokens_full"] += self.context_window.message_tokens(msg)
+
+    def input_savings(self) -> dict:
+        """Input uploaded vs. what full-history replay would have uploaded."""
+        stats = dict(self.input_stats)
+        stats["bytes_saved"] = stats["bytes_full"] - stats["bytes_sent"]
+        stats["tokens_saved"] = stats["tokens_full"] - stats["tokens_sent"]
+        return stats
+
+    def _end_turn(self, user_id: int, ai_output, commit: bool = True) -> str:
+        self.chat_memory._purge_tool_msgs(user_id)
+        ai_msg = self.chat_memory._get_ai_msg(user_id)
+        print(f"{self.name}: {ai_msg}")
+        self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, user_id)
+        # The final answer closes the server-side state of the last response
+        self._advance_chain(user_id, ai_output)
+        if commit:
+            self.chat_memory.commit(user_id)
+        return ai_msg
+
+    async def _async_end_turn(self, user_id: int, ai_output) -> str:
+        ai_msg = self._end_turn(user_id, ai_output, commit=False)
+        # SQLite I/O of the chat store stays off the event loop
+        await asyncio.to_thread(self.chat_memory.commit, user_id)
+        return ai_msg
 
     def run_callback(self, tool_execution_callback, user_id):
         reasoning_items = [
@@ -341,63 +549,41 @@ class Agent:
         rag_functions: dict = {},
         rag_prompt: list[dict] = [],
         tool_execution_callback=None,
+        turn_timeout: Optional[float] = None,
     ) -> str | None:
         print(f"Running {self.model} with {len(rag_prompt)} tools")
 
         self.chat_memory.add_msg(message, MessageType.USER.value, user_id)
+        self._fit_context(user_id)
+        deadline = self._turn_deadline(turn_timeout)
 
-        while True:
-            params = {
-                "model": self.model,  # type: ignore
-                "input": self.chat_memory.get_messages(user_id),  # type: ignore
-            }
-            if rag_prompt:
-                params["tools"] = rag_prompt
-            if self.model == ModelType.GPT_5.value:  # type: ignore
-                params["text"] = {"verbosity": VerbosityType.LOW.value}
-                params["reasoning"] = {"effort": EffortType.LOW.value}
-
-            ai_output = self._ai_client._gen_ai_output(params)
-            self.chat_memory._set_ai_output(ai_output, user_id)
-
-            functions_called = [
-                item
-                for item in ai_output.output  # type: ignore
-                if item.type == MessageType.FUNCTION_CALL.value
-            ]
-
-            custom_tools_called = [
-                item
-                for item in ai_output.output  # type: ignore
-                if item.type == MessageType.CUSTOM_TOOL_CALL.value
-            ]
-
-            if not functions_called and not custom_tools_called:
-                break
+        finished = False
+        try:
+            while True:
+                final = self._is_final(user_id, deadline)
+                ai_output = self._request(
+                    self._ai_client._gen_ai_output, user_id, rag_prompt, final
+                )
+                self.chat_memory._set_ai_output(ai_output, user_id)
+                self._advance_chain(user_id, ai_output)
 
-            if tool_execution_callback:
-                self.run_callback(tool_execution_callback, user_id)
+                tools_called = self._tools_called(ai_output)
+                if final or not tools_called:
+                    break
 
-            if functions_called:
-                self._tool_runner._run_functions(
-                    functions_called,
-                    user_id,
-                    self.chat_memory,
-                    rag_functions,
-                )
+                if tool_execution_callback:
+                    self.run_callback(tool_execution_callback, user_id)
 
-            if custom_tools_called:
-                self._tool_runner._run_custom_tools(
-                    custom_tools_called,
-                    user_id,
-                    self.chat_memory,
-                    rag_functions,
-                )
+                self._run_tools(tools_called, user_id, rag_functions, deadline)
 
-        self.chat_memory._purge_tool_msgs(user_id)
-        ai_msg = self.chat_memory._get_ai_msg(user_id)
-        print(f"{self.name}: {ai_msg}")
-        self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, user_id)
+            ai_msg = self._end_turn(user_id, ai_output)
+            finished = True
+        finally:
+            if not finished:  # a request or a tool failed mid-turn
+                self.chat_memory._purge_tool_msgs(user_id)
+
+        if self._compactor:
+            self._compactor.schedule(self.chat_memory, user_id, self.model)
         # print(self.chat_memory.get_messages(user_id, with_prompt=False))
         return ai_msg
 
@@ -408,63 +594,166 @@ class Agent:
         rag_functions: dict = {},
         rag_prompt: list[dict] = [],
         tool_execution_callback=None,
+        turn_timeout: Optional[float] = None,
     ) -> str | None:
         print(f"Running {self.model} with {len(rag_prompt)} tools")
 
         self.chat_memory.add_msg(message, MessageType.USER.value, user_id)
+        self._fit_context(user_id)
 
-        while True:
-            params = {
-                "model": self.model,  # type: ignore
-                "input": self.chat_memory.get_messages(user_id),  # type: ignore
-            }
-            if rag_prompt:
-                params["tools"] = rag_prompt
-            if self.model == ModelType.GPT_5.value:  # type: ignore
-                params["text"] = {"verbosity": VerbosityType.LOW.value}
-                params["reasoning"] = {"effort": EffortType.LOW.value}
-
-            ai_output = await self._ai_client._async_gen_ai_output(params)
-            self.chat_memory._set_ai_output(ai_output, user_id)
-
-            functions_called = [
-                item
-                for item in ai_output.output  # type: ignore
-                if item.type == MessageType.FUNCTION_CALL.value
-            ]
-
-            custom_tools_called = [
-                item
-                for item in ai_output.output  # type: ignore
-                if item.type == MessageType.CUSTOM_TOOL_CALL.value
-            ]
-
-            if not functions_called and not custom_tools_called:
-                break
-
-            if tool_execution_callback:
-                self.run_callback(tool_execution_callback, user_id)
+        deadline = self._turn_deadline(turn_timeout)
 
-            if functions_called:
-                await self._tool_runner._async_run_functions(
-                    functions_called,
-                    user_id,
-                    self.chat_memory,
+        finished = False
+        try:
+            while True:
+                final = self._is_final(user_id, deadline)
+                ai_output = await self._async_request(
+                    self._ai_client._async_gen_ai_output, user_id, rag_prompt, final
                 )
+                self.chat_memory._set_ai_output(ai_output, user_id)
+                self._advance_chain(user_id, ai_output)
 
-            if custom_tools_called:
-                await self._tool_runner._async_run_custom_tools(
-                    custom_tools_called,
-                    user_id,
-                    self.chat_memory,
-                )
+                tools_called = self._tools_called(ai_output)
+                if final or not tools_called:
+                    break
 
-        self.chat_memory._purge_tool_msgs(user_id)
-        ai_msg = self.chat_memory._get_ai_msg(user_id)
-        print(f"{self.name}: {ai_msg}")
-        self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, user_id)
+                if tool_execution_callback:
+                    self.run_callback(tool_execution_callback, user_id)
+
+                await self._async_run_tools(tools_called, user_id, rag_functions, deadline)
+
+            ai_msg = await self._async_end_turn(user_id, ai_output)
+            finished = True
+        finally:
+            if not finished:  # a request or a tool failed mid-turn
+                self.chat_memory._purge_tool_msgs(user_id)
+
+        if self._compactor:
+            self._compactor.schedule_async(self.chat_memory, user_id, self.model)
         return ai_msg
 
+    def stream_msg(
+        self,
+        message: str,
+        user_id: int,
+        rag_functions: dict = {},
+        rag_prompt: list[dict] = [],
+        tool_execution_callback=None,
+        turn_timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        """
+        Like process_msg, but yields the text of the answer as it is generated.
+
+        Tool calls are still run inside the loop. The time to first token of
+        the turn is left in `self.last_ttft`.
+        """
+        print(f"Running {self.model} with {len(rag_prompt)} tools (stream)")
+
+        self.chat_memory.add_msg(message, MessageType.USER.value, user_id)
+        self._fit_context(user_id)
+        timer = StreamTimer()
+        self.last_ttft = None
+        finished = False
+        deadline = self._turn_deadline(turn_timeout)
+
+        try:
+            while True:
+                ai_output = None
+                final = self._is_final(user_id, deadline)
+                with self._request(
+                    self._ai_client._stream_ai_output, user_id, rag_prompt, final
+                ) as stream:
+                    for event in stream:
+                        delta, response = read_response_event(event)
+                        if delta:
+                            timer.mark()
+                            yield delta
+                        if response is not None:
+                            ai_output = response
+
+                if ai_output is None:
+                    raise StreamError("Stream ended without a final response")
+                self.chat_memory._set_ai_output(ai_output, user_id)
+                self._advance_chain(user_id, ai_output)
+
+                tools_called = self._tools_called(ai_output)
+                if final or not tools_called:
+                    break
+
+                if tool_execution_callback:
+                    self.run_callback(tool_execution_callback, user_id)
+
+                self._run_tools(tools_called, user_id, rag_functions, deadline)
+
+            self.last_ttft = timer.ttft
+            print(f"Time to first token: {timer.ttft}")
+            self._end_turn(user_id, ai_output)
+            finished = True
+            if self._compactor:
+                self._compactor.schedule(self.chat_memory, user_id, self.model)
+        finally:
+            if not finished:  # consumer stopped early or the stream failed
+                self.chat_memory._purge_tool_msgs(user_id)
+
+    async def async_stream_msg(
+        self,
+        message: str,
+        user_id: int,
+        rag_functions: dict = {},
+        rag_prompt: list[dict] = [],
+        tool_execution_callback=None,
+        turn_timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Async version of stream_msg."""
+        print(f"Running {self.model} with {len(rag_prompt)} tools (stream)")
+
+        self.chat_memory.add_msg(message, MessageType.USER.value, user_id)
+        self._fit_context(user_id)
+        timer = StreamTimer()
+        self.last_ttft = None
+        finished = False
+        deadline = self._turn_deadline(turn_timeout)
+
+        try:
+            while True:
+                ai_output = None
+                final = self._is_final(user_id, deadline)
+                stream = await self._async_request(
+                    self._ai_client._async_stream_ai_output, user_id, rag_prompt, final
+                )
+                async with stream:
+                    async for event in stream:
+                        delta, response = read_response_event(event)
+                        if delta:
+                            timer.mark()
+                            yield delta
+                        if response is not None:
+                            ai_output = response
+
+                if ai_output is None:
+                    raise StreamError("Stream ended without a final response")
+                self.chat_memory._set_ai_output(ai_output, user_id)
+                self._advance_chain(user_id, ai_output)
+
+                tools_called = self._tools_called(ai_output)
+                if final or not tools_called:
+                    break
+
+                if tool_execution_callback:
+                    self.run_callback(tool_execution_callback, user_id)
+
+                await self._async_run_tools(tools_called, user_id, rag_functions, deadline)
+
+            self.last_ttft = timer.ttft
+            print(f"Time to first token: {timer.ttft}")
+            await self._async_end_turn(user_id, ai_output)
+            finished = True
+            if self._compactor:
+                self._compactor.schedule_async(self.chat_memory, user_id, self.model)
+        finally:
+            if not finished:
+                self.chat_memory._purge_tool_msgs(user_id)
+
 
 async def console_chat_main():
     """
@@ -1,13 +1,17 @@
 import asyncio
 import json
+import threading
 import sys
 import pathlib
 import os
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Optional
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
 
-# Add project root to sys.path for direct execution
-sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[3]))
+# Add project root to sys.path for direct execution (when nested three levels
+# below it; a checkout closer to / has nothing to add)
+_parents = pathlib.Path(__file__).resolve().parents
+if len(_parents) > 3:
+    sys.path.insert(0, str(_parents[3]))
 
 from dotenv import load_dotenv
 from openai import AsyncOpenAI, OpenAI
@@ -19,7 +23,13 @@ from enumerations import (
     ModelType,
     VerbosityType,
 )
+from chat_store import ChatStore, TieredChatStore
+from compaction import SUMMARY_INSTRUCTIONS, ConversationCompactor
+from context_window import ContextWindow
 from prompt import SYSTEM_PROMPT
+from streaming import ChatStreamAccumulator, StreamTimer
+from tool_runtime import BaseToolRunner
+from tools.serialization import to_text
 
 
 load_dotenv(".env")
@@ -38,10 +48,18 @@ class FunctionDoesNotExist(Exception):
 
 
 class ChatMemory:
-    def __init__(self, prompt=SYSTEM_PROMPT):
+    def __init__(self, prompt=SYSTEM_PROMPT, store: Optional[ChatStore] = None):
         self.__ai_output: dict[int, Any] = {}
-        self.__messages: dict[int, list[dict]] = {}
-        self.__pos_tool_msgs: dict[int, list[int]] = {}
+        # user_id -> messages; by default an LRU in memory backed by SQLite
+        self.__messages: ChatStore = (
+            store if store is not None else TieredChatStore.from_env()
+        )
+        self.__messages.on_load = self._on_chat_loaded
+        self.__messages.on_evict = self._on_chat_evicted
+        # Tool messages of the current turn are always the tail of the history:
+        # keep only where that ephemeral segment starts so purging is a slice
+        self.__lock = threading.RLock()
+        self.__ephemeral_start: dict[int, int] = {}
         self.init_msg = {
             "role": MessageType.SYSTEM.value,
             "content": prompt,
@@ -54,10 +72,30 @@ class ChatMemory:
 
         return self.__ai_output[user_id]
 
-    def _get_pos_tool_msgs(self, user_id: int):
-        if user_id not in self.__pos_tool_msgs:
-            return []
-        return self.__pos_tool_msgs[user_id]
+    def _mark_ephemeral(self, user_id: int):
+        with self.__lock:
+            if user_id not in self.__ephemeral_start:
+                self.__ephemeral_start[user_id] = len(self.__messages[user_id])
+                self.__messages.pin(user_id)
+
+    def _replace_history_prefix(self, user_id: int, old: list, replacement: list) -> bool:
+        """
+        Replace `old` (the messages right after the prompt) with `replacement`.
+
+        Returns False without changes if a turn is in progress or the history
+        no longer starts with exactly those messages.
+        """
+        with self.__lock:
+            if user_id in self.__ephemeral_start or user_id not in self.__messages:
+                return False
+
+            messages = self.__messages[user_id]
+            current = messages[1 : 1 + len(old)]
+            if len(current) != len(old) or any(a is not b for a, b in zip(current, old)):
+                return False
+
+            messages[1 : 1 + len(old)] = replacement
+            return True
 
     def get_messages(self, user_id: int, with_prompt: bool = True):
         if user_id not in self.__messages:
@@ -69,18 +107,12 @@ class ChatMemory:
         else:
             return self.__messages[user_id][1:]
 
-    def reduce_context(self, user_id: int):
-        if len(self.__messages[user_id]) < 20:
-            return
-
-        new_messages = [self.__messages[user_id][0]]
-        last_idx = len(self.__messages) - 1
-
-        for idx, msg in enumerate(self.__messages[user_id][10:], start=10):
-            if msg["role"] == MessageType.USER.value:
-                new_messages += self.__messages[user_id][idx:last_idx]
-
-        self.__messages[user_id] = new_messages
+    def reduce_context(self, user_id: int, model: str, context_window: ContextWindow) -> int:
+        """Drop the oldest turns that don't fit the token budget; returns tokens saved."""
+        messages, saved = context_window.fit(self.get_messages(user_id), model)
+        if saved:
+            self.set_messages(messages, user_id)
+        return saved
 
     def get_last_time(self):
         return self.__last_time
@@ -113,17 +145,29 @@ class ChatMemory:
             ],
         }
 
+        self._mark_ephemeral(user_id)
         self.__messages[user_id].append(tool_call_msg)
-        if user_id not in self.__pos_tool_msgs:
-            self.__pos_tool_msgs[user_id] = [len(self.__messages[user_id]) - 1]
-        else:
-            self.__pos_tool_msgs[user_id].append(len(self.__messages[user_id]) - 1)
 
     def _clean_tool_msgs(self, user_id: int):
-        if user_id not in self.__pos_tool_msgs:
+        if user_id not in self.__ephemeral_start:
             print(f"{user_id} not have tool messages")
 
-        self.__pos_tool_msgs[user_id] = []
+        self.__ephemeral_start.pop(user_id, None)
+        self.__messages.unpin(user_id)
+
+    def commit(self, user_id: int) -> None:
+        """Persist the user's history in the chat store (end of each turn)."""
+        self.__messages.persist(user_id)
+
+    def _on_chat_loaded(self, user_id: int, messages: list) -> None:
+        # The stored prompt may be stale: always start from the current one
+        if messages and messages[0].get("role") == self.init_msg["role"]:
+            messages[0] = self.init_msg
+        print(f"Chat of {user_id} loaded from storage")
+
+    def _on_chat_evicted(self, user_id: int) -> None:
+        self.__ai_output.pop(user_id, None)
+        print(f"Chat of {user_id} evicted from memory")
 
     def has_chat(self, user_id: int) -> bool:
         return user_id in self.__messages and len(self.__messages[user_id]) > 0
@@ -131,8 +175,8 @@ class ChatMemory:
     def delete_chat(self, user_id: int) -> None:
         if user_id in self.__messages:
             del self.__messages[user_id]
-        if user_id in self.__pos_tool_msgs:
-            del self.__pos_tool_msgs[user_id]
+        if user_id in self.__ephemeral_start:
+            del self.__ephemeral_start[user_id]
         if user_id in self.__ai_output:
             del self.__ai_output[user_id]
 
@@ -168,26 +212,22 @@ class ChatMemory:
                 )
 
         self.__messages[user_id] = messages
+        self.__ephemeral_start.pop(user_id, None)
+        self.__messages.unpin(user_id)
 
     def _get_ai_msg(self, user_id: int):
         ai_output = self._get_ai_output(user_id)
         return ai_output.choices[0].message.content.strip()
 
     def _purge_tool_msgs(self, user_id: int):
-        pos_tool_msgs = self._get_pos_tool_msgs(user_id)
-        messages = self.get_messages(user_id)
+        if user_id not in self.__ephemeral_start:
+            return
 
-        if pos_tool_msgs:
-            clean_messages = [
-                m for idx, m in enumerate(messages) if idx not in pos_tool_msgs
-            ]
-            try:
-                self.set_messages(clean_messages, user_id)
-                print(f"{len(messages) - len(clean_messages)} tool messages purged")
-            except SetMessagesError as exc:
-                print(f"Error purging tool messages: {exc}")
-            finally:
-                self._clean_tool_msgs(user_id)
+        messages = self.get_messages(user_id)
+        start = self.__ephemeral_start[user_id]
+        print(f"{len(messages) - start} tool messages purged")
+        del messages[start:]
+        self._clean_tool_msgs(user_id)
 
     def _set_tool_output(self, call_id, function_out, user_id: int, function_name: str):
         # Store as ephemeral tool output; do not persist in history
@@ -196,10 +236,7 @@ class ChatMemory:
             return False
 
         # Serialize function output to string if it's not already a string
-        if isinstance(function_out, (dict, list)):
-            content = json.dumps(function_out, ensure_ascii=False)
-        else:
-            content = str(function_out)
+        content = to_text(function_out)
 
         msg = {
             "tool_call_id": call_id,
@@ -208,11 +245,8 @@ class ChatMemory:
             "content": content,
         }
 
+        self._mark_ephemeral(user_id)
         self.__messages[user_id].append(msg)
-        if user_id not in self.__pos_tool_msgs:
-            self.__pos_tool_msgs[user_id] = [len(self.__messages[user_id]) - 1]
-        else:
-            self.__pos_tool_msgs[user_id].append(len(self.__messages[user_id]) - 1)
 
 
 class AIClient:
@@ -261,104 +295,40 @@ class AIClient:
             )
 
     async def _async_gen_ai_output(self, params: dict):
-        ai_output = await self.__async_client.client.chat.completions.create(**params)
+        ai_output = await self.__async_client.chat.completions.create(**params)
         return ai_output
 
     def _gen_ai_output(self, params: dict):
         return self.__client.chat.completions.create(**params)
 
+    def _stream_ai_output(self, params: dict):
+        return self.__client.chat.completions.create(**params, stream=True)
 
-class ToolRunner:
-    def __init__(
-        self,
-        error_msg="Ha ocurrido un error inesperado",
-    ):
-        self.ERROR_MSG = error_msg
-
-    def _run_functions(
-        self, functions_called, user_id: int, chat_memory: ChatMemory, rag_functions
-    ) -> None:
-        print(f"{len(functions_called)} functions need to be called!")
-
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for tool in functions_called:
-                function_name = tool.function.name
-                function_args = tool.function.arguments
-                print(f"function_name: {function_name}")
-                print(
-                    f"function_args: {function_args[:100]}{'...' if len(function_args) > 100 else ''}"
-                )
+    async def _async_stream_ai_output(self, params: dict):
+        return await self.__async_client.chat.completions.create(**params, stream=True)
 
-                if function_name not in rag_functions:
-                    raise FunctionDoesNotExist(
-                        f"{function_name} not available in {rag_functions.keys()}"
-                    )
-
-                function_to_call = rag_functions[function_name]
-                if function_args:
-                    function_args = json.loads(function_args)
-                    futures.append(executor.submit(function_to_call, **function_args))
-                else:
-                    futures.append(executor.submit(function_to_call))
-
-            self.run_futures(futures, functions_called, user_id, chat_memory)
-
-    def run_futures(self, futures, tools_called, user_id: int, chat_memory: ChatMemory):
-        for future, tool in zip(futures, tools_called):
-            try:
-                function_out = future.result()
-                print(f"{tool.function.name}: {function_out}")  # type: ignore
-            except Exception as exc:
-                print(f"{tool.function.name}: {exc}")
-                function_out = self.ERROR_MSG
-
-            chat_memory._set_tool_output(
-                tool.id, function_out, user_id, tool.function.name
-            )
 
-    async def _async_run_functions(
-        self, functions_called, user_id: int, chat_memory: ChatMemory, rag_functions
-    ) -> None:
-        print(f"{len(functions_called)} function need to be called!")
-        tasks = []
-        for tool in functions_called:
-            function_name = tool.function.name
-            function_args = tool.function.arguments
-            print(f"function_name: {function_name}")
-            print(
-                f"function_args: {function_args[:100]}{'...' if len(function_args) > 100 else ''}"
-            )
+class ToolRunner(BaseToolRunner):
+    """Runs the tool calls of a Chat Completions message."""
 
-            if function_name not in rag_functions:
-                raise FunctionDoesNotExist(
-                    f"{function_name} not available in {rag_functions.keys()}"
-                )
-
-            function_to_call = rag_functions[function_name]  # type: ignore
-            if function_args:
-                function_args = json.loads(function_args)
-                tasks.append(function_to_call(**function_args))
-            else:
-                tasks.append(function_to_call())
+    def _prepare_call(self, tool, rag_functions) -> tuple[str, Any, dict]:
+        function_name = tool.function.name
+        function_args = tool.function.arguments
+        print(f"function_name: {function_name}")
+        print(
+            f"function_args: {function_args[:100]}{'...' if len(function_args) > 100 else ''}"
+        )
 
-        await self.run_coroutines(functions_called, tasks, user_id, chat_memory)
-
-    async def run_coroutines(
-        self, tools_called, tasks, user_id: int, chat_memory: ChatMemory
-    ):
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        if function_name not in rag_functions:
+            raise FunctionDoesNotExist(
+                f"{function_name} not available in {rag_functions.keys()}"
+            )
 
-        for tool, function_out in zip(tools_called, results):
-            if isinstance(function_out, Exception):
-                print(f"{tool.function.name}: {function_out}")
-                function_out = self.ERROR_MSG  # type: ignore
-            else:
-                print(f"{tool.function.name}: {function_out}")  # type: ignore
+        function_args = json.loads(function_args) if function_args else {}
+        return function_name, rag_functions[function_name], function_args
 
-            chat_memory._set_tool_output(
-                tool.id, function_out, user_id, tool.function.name
-            )
+    def _set_tool_output(self, chat_memory: ChatMemory, tool, output: str, user_id: int) -> None:
+        chat_memory._set_tool_output(tool.id, output, user_id, tool.function.name)
 
 
 class Agent:
@@ -368,6 +338,10 @@ class Agent:
         model=ModelType.AGENT_XS.value,
         prompt=SYSTEM_PROMPT,
         proxy_url: Optional[str] = None,
+        tool_settings: Optional[dict] = None,
+        compaction: bool = False,
+        summary_model=ModelType.AGENT_XS.value,
+        turn_timeout: Optional[float] = None,
     ):
         self.name = name
         self.model = model
@@ -381,7 +355,99 @@ class Agent:
             base_url="https://apigateway.avangenio.net",
             proxy_url=proxy,
         )  # type: ignore
-        self._tool_runner = ToolRunner()
+        self._tool_runner = ToolRunner(tool_settings=tool_settings)
+        self.context_window = ContextWindow()
+        # Seconds a user turn may spend calling tools (AGENT_TURN_TIMEOUT, 0 = no limit)
+        self.turn_timeout = (
+            float(os.getenv("AGENT_TURN_TIMEOUT") or 300)
+            if turn_timeout is None
+            else turn_timeout
+        )
+        self.last_tokens_saved = 0
+        self.last_ttft: Optional[float] = None
+        self.summary_model = summary_model
+        self._compactor = (
+            ConversationCompactor(
+                self.context_window, self._summarize, self._async_summarize
+            )
+            if compaction
+            else None
+        )
+
+    def _fit_context(self, user_id: int) -> int:
+        saved = self.chat_memory.reduce_context(
+            user_id, self.model, self.context_window
+        )
+        self.last_tokens_saved = saved
+        if saved:
+            print(f"Context reduced for {user_id}: {saved} tokens saved")
+        return saved
+
+    def _summary_params(self, transcript: str) -> dict:
+        return {
+            "model": self.summary_model,
+            "messages": [
+                {"role": MessageType.SYSTEM.value, "content": SUMMARY_INSTRUCTIONS},
+                {"role": MessageType.USER.value, "content": transcript},
+            ],
+        }
+
+    def _summarize(self, transcript: str) -> str:
+        ai_output = self._ai_client._gen_ai_output(self._summary_params(transcript))
+        return ai_output.choices[0].message.content
+
+    async def _async_summarize(self, transcript: str) -> str:
+        ai_output = await self._ai_client._async_gen_ai_output(
+            self._summary_params(transcript)
+        )
+        return ai_output.choices[0].message.content
+
+    def _turn_deadline(self, turn_timeout: Optional[float]) -> Optional[float]:
+        timeout = self.turn_timeout if turn_timeout is None else turn_timeout
+        return time.monotonic() + timeout if timeout else None
+
+    @staticmethod
+    def _is_final(user_id: int, deadline: Optional[float]) -> bool:
+        """True once the turn deadline has passed: the model must answer without tools."""
+        if deadline is None or time.monotonic() < deadline:
+            return False
+        print(f"Turn deadline reached for {user_id}, asking for a final answer")
+        return True
+
+    def _turn_params(
+        self,
+        user_id: int,
+        rag_prompt: list[dict],
+        effort=EffortType.LOW.value,
+        final: bool = False,
+    ) -> dict:
+        params = {
+            "model": self.model,  # type: ignore
+            "messages": self.chat_memory.get_messages(user_id),  # type: ignore
+            "tools": rag_prompt,  # type: ignore
+        }
+        if final and rag_prompt:
+            params["tool_choice"] = "none"
+        if self.model == ModelType.GPT_5.value:  # type: ignore
+            params["text"] = {"verbosity": VerbosityType.LOW.value}
+            params["reasoning"] = {"effort": effort}
+        return params
+
+    def _end_turn(self, user_id: int, commit: bool = True) -> str:
+        self.chat_memory._purge_tool_msgs(user_id)
+        ai_msg = self.chat_memory._get_ai_msg(user_id)
+        # print(f"{self.name}: {ai_msg}")
+
+        self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, user_id)
+        if commit:
+            self.chat_memory.commit(user_id)
+        return ai_msg
+
+    async def _async_end_turn(self, user_id: int) -> str:
+        ai_msg = self._end_turn(user_id, commit=False)
+        # SQLite I/O of the chat store stays off the event loop
+        await asyncio.to_thread(self.chat_memory.commit, user_id)
+        return ai_msg
 
     def process_msg(
         self,
@@ -390,51 +456,52 @@ class Agent:
         rag_functions: dict = {},
         rag_prompt: list[dict] = [],
         tool_execution_callback=None,
+        turn_timeout: Optional[float] = None,
     ) -> str | None:
         print(f"Running {self.model} with {len(rag_prompt)} tools")
         self.chat_memory.add_msg(message, MessageType.USER.value, user_id)
+        self._fit_context(user_id)
+        deadline = self._turn_deadline(turn_timeout)
         counter = 1
 
-        while True:
-            print(f"{counter}° iteration")
-
-            params = {
-                "model": self.model,  # type: ignore
-                "messages": self.chat_memory.get_messages(user_id),  # type: ignore
-                "tools": rag_prompt,  # type: ignore
-            }
-            if self.model == ModelType.GPT_5.value:  # type: ignore
-                params["text"] = {"verbosity": VerbosityType.LOW.value}
-                params["reasoning"] = {"effort": EffortType.LOW.value}
+        finished = False
+        try:
+            while True:
+                print(f"{counter}° iteration")
 
-            # print(self.chat_memory.get_messages(user_id, with_prompt=False))
-            ai_output = self._ai_client._gen_ai_output(params)
-            self.chat_memory._set_ai_output(ai_output, user_id)
+                final = self._is_final(user_id, deadline)
+                params = self._turn_params(user_id, rag_prompt, final=final)
+                # print(self.chat_memory.get_messages(user_id, with_prompt=False))
+                ai_output = self._ai_client._gen_ai_output(params)
+                self.chat_memory._set_ai_output(ai_output, user_id)
 
-            if not ai_output.choices[0].message.tool_calls:
-                break
+                if final or not ai_output.choices[0].message.tool_calls:
+                    break
 
-            # Call the callback with the assistant's message before tool execution
-            if tool_execution_callback and ai_output.choices[0].message.content:
-                tool_execution_callback(ai_output.choices[0].message.content)
+                # Call the callback with the assistant's message before tool execution
+                if tool_execution_callback and ai_output.choices[0].message.content:
+                    tool_execution_callback(ai_output.choices[0].message.content)
 
-            self.chat_memory._set_tool_calls(user_id)
+                self.chat_memory._set_tool_calls(user_id)
 
-            self._tool_runner._run_functions(
-                ai_output.choices[0].message.tool_calls,
-                user_id,
-                self.chat_memory,
-                rag_functions,
-            )
+                self._tool_runner._run_tools(
+                    ai_output.choices[0].message.tool_calls,
+                    user_id,
+                    self.chat_memory,
+                    rag_functions,
+                    deadline,
+                )
 
-            counter += 1
+                counter += 1
 
-        self.chat_memory._purge_tool_msgs(user_id)
-        ai_msg = self.chat_memory._get_ai_msg(user_id)
-        # print(f"{self.name}: {ai_msg}")
+            ai_msg = self._end_turn(user_id)
+            finished = True
+        finally:
+            if not finished:  # a request or a tool failed mid-turn
+                self.chat_memory._purge_tool_msgs(user_id)
 
-        self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, user_id)
-        self.chat_memory.reduce_context(user_id)
+        if self._compactor:
+            self._compactor.schedule(self.chat_memory, user_id, self.model)
         return ai_msg
 
     def verify_context_size(self, chat_id):
@@ -450,51 +517,191 @@ class Agent:
         rag_functions: dict = {},
         rag_prompt: list[dict] = [],
         tool_execution_callback=None,
+        turn_timeout: Optional[float] = None,
     ) -> str | None:
         print(f"Running {self.name} with {len(rag_prompt)} tools")
         self.chat_memory.add_msg(message, MessageType.USER.value, user_id)
+        self._fit_context(user_id)
 
+        deadline = self._turn_deadline(turn_timeout)
         counter = 1
-        while True:
-            print(f"{counter}° iteration")
-
-            params = {
-                "model": self.model,  # type: ignore
-                "messages": self.chat_memory.get_messages(user_id),  # type: ignore
-                "tools": rag_prompt,  # type: ignore
-            }
-            if self.model == ModelType.GPT_5.value:  # type: ignore
-                params["text"] = {"verbosity": VerbosityType.LOW.value}
-                params["reasoning"] = {"effort": EffortType.MINIMAL.value}
-
-            ai_output = await self._ai_client._async_gen_ai_output(params)
-            self.chat_memory._set_ai_output(ai_output, user_id)
-
-            if not ai_output.choices[0].message.tool_calls:
-                break
-
-            # Call the callback with the assistant's message before tool execution
-            if tool_execution_callback and ai_output.choices[0].message.content:
-                tool_execution_callback(ai_output.choices[0].message.content)
-
-            self.chat_memory._set_tool_calls(user_id)
-
-            await self._tool_runner._async_run_functions(
-                ai_output.choices[0].message.tool_calls,
-                user_id,
-                self.chat_memory,
-                rag_functions,
-            )
+        finished = False
+        try:
+            while True:
+                print(f"{counter}° iteration")
+
+                final = self._is_final(user_id, deadline)
+                params = self._turn_params(
+                    user_id, rag_prompt, effort=EffortType.MINIMAL.value, final=final
+                )
 
-            counter += 1
+                ai_output = await self._ai_client._async_gen_ai_output(params)
+                self.chat_memory._set_ai_output(ai_output, user_id)
 
-        self.chat_memory._purge_tool_msgs(user_id)
-        ai_msg = self.chat_memory._get_ai_msg(user_id)
-        # print(f"{self.name}: {ai_msg}")
+                if final or not ai_output.choices[0].message.tool_calls:
+                    break
 
-        self.chat_memory.add_msg(ai_msg, MessageType.ASSISTANT.value, user_id)
-        self.chat_memory.reduce_context(user_id)
+                # Call the callback with the assistant's message before tool execution
+                if tool_execution_callback and ai_output.choices[0].message.content:
+                    tool_execution_callback(ai_output.choices[0].message.content)
+
+                self.chat_memory._set_tool_calls(user_id)
+
+                await self._tool_runner._async_run_tools(
+                    ai_output.choices[0].message.tool_calls,
+                    user_id,
+                    self.chat_memory,
+                    rag_functions,
+                    deadline,
+                )
+
+                counter += 1
+
+            ai_msg = await self._async_end_turn(user_id)
+            finished = True
+        finally:
+            if not finished:  # a request or a tool failed mid-turn
+                self.chat_memory._purge_tool_msgs(user_id)
+
+        if self._compactor:
+            self._compactor.schedule_async(self.chat_memory, user_id, self.model)
         return ai_msg
 
 
+    def stream_msg(
+        self,
+        message: str,
+        user_id: int,
+        rag_functions: dict = {},
+        rag_prompt: list[dict] = [],
+        tool_execution_callback=None,
+        turn_timeout: Optional[float] = None,
+    ) -> Iterator[str]:
+        """
+        Like process_msg, but yields the text of the answer as it is generated.
+
+        Tool calls are assembled from the streamed deltas and run inside the
+        loop. The time to first token of the turn is left in `self.last_ttft`.
+        """
+        print(f"Running {self.model} with {len(rag_prompt)} tools (stream)")
+        self.chat_memory.add_msg(message, MessageType.USER.value, user_id)
+        self._fit_context(user_id)
+        timer = StreamTimer()
+        self.last_ttft = None
+        finished = False
+        deadline = self._turn_deadline(turn_timeout)
+        counter = 1
+
+        try:
+            while True:
+                print(f"{counter}° iteration")
+
+                final = self._is_final(user_id, deadline)
+                params = self._turn_params(user_id, rag_prompt, final=final)
+                accumulator = ChatStreamAccumulator()
+                with self._ai_client._stream_ai_output(params) as stream:
+                    for chunk in stream:
+                        delta = accumulator.add(chunk)
+                        if delta:
+                            timer.mark()
+                            yield delta
+
+                ai_output = accumulator.result()
+                self.chat_memory._set_ai_output(ai_output, user_id)
+
+                if final or not ai_output.choices[0].message.tool_calls:
+                    break
+
+                if tool_execution_callback and ai_output.choices[0].message.content:
+                    tool_execution_callback(ai_output.choices[0].message.content)
+
+                self.chat_memory._set_tool_calls(user_id)
+
+                self._tool_runner._run_tools(
+                    ai_output.choices[0].message.tool_calls,
+                    user_id,
+                    self.chat_memory,
+                    rag_functions,
+                    deadline,
+                )
+
+                counter += 1
+
+            self.last_ttft = timer.ttft
+            print(f"Time to first token: {timer.ttft}")
+            self._end_turn(user_id)
+            finished = True
+            if self._compactor:
+                self._compactor.schedule(self.chat_memory, user_id, self.model)
+        finally:
+            if not finished:  # consumer stopped early or the stream failed
+                self.chat_memory._purge_tool_msgs(user_id)
+
+    async def async_stream_msg(
+        self,
+        message: str,
+        user_id: int,
+        rag_functions: dict = {},
+        rag_prompt: list[dict] = [],
+        tool_execution_callback=None,
+        turn_timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Async version of stream_msg."""
+        print(f"Running {self.name} with {len(rag_prompt)} tools (stream)")
+        self.chat_memory.add_msg(message, MessageType.USER.value, user_id)
+        self._fit_context(user_id)
+        timer = StreamTimer()
+        self.last_ttft = None
+        finished = False
+        deadline = self._turn_deadline(turn_timeout)
+        counter = 1
+
+        try:
+            while True:
+                print(f"{counter}° iteration")
+
+                final = self._is_final(user_id, deadline)
+                params = self._turn_params(
+                    user_id, rag_prompt, effort=EffortType.MINIMAL.value, final=final
+                )
+                accumulator = ChatStreamAccumulator()
+                stream = await self._ai_client._async_stream_ai_output(params)
+                async with stream:
+                    async for chunk in stream:
+                        delta = accumulator.add(chunk)
+                        if delta:
+                            timer.mark()
+                            yield delta
+
+                ai_output = accumulator.result()
+                self.chat_memory._set_ai_output(ai_output, user_id)
+
+                if final or not ai_output.choices[0].message.tool_calls:
+                    break
+
+                if tool_execution_callback and ai_output.choices[0].message.content:
+                    tool_execution_callback(ai_output.choices[0].message.content)
+
+                self.chat_memory._set_tool_calls(user_id)
+
+                await self._tool_runner._async_run_tools(
+                    ai_output.choices[0].message.tool_calls,
+                    user_id,
+                    self.chat_memory,
+                    rag_functions,
+                    deadline,
+                )
+
+                counter += 1
+
+            self.last_ttft = timer.ttft
+            print(f"Time to first token: {timer.ttft}")
+            await self._async_end_turn(user_id)
+            finished = True
+            if self._compactor:
+                self._compactor.schedule_async(self.chat_memory, user_id, self.model)
+        finally:
+            if not finished:
+                self.chat_memory._purge_tool_msgs(user_id)
+
 # agent = Agent()  # Commented out to avoid initialization errors during import
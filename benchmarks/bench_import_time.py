@@ -0,0 +1,89 @@
+"""
+Benchmark: cold-start import time of console_chat.
+
+Runs `import console_chat` plus the agent selected by AGENT_VERSION in a
+fresh interpreter with `python -X importtime`, several times, and reports the
+median total import time and the modules that cost the most (self time).
+With --max-ms it exits with status 1 when a median goes over the budget, so
+it can gate startup regressions in CI.
+
+    python benchmarks/bench_import_time.py [--runs 5] [--top 10] [--max-ms 1500]
+"""
+
+import argparse
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+AGENT_VERSIONS = ["OPENAI", "AVANGENIO"]
+CODE = "import console_chat; console_chat.load_agent('{version}')"
+
+
+def import_times(version: str) -> dict[str, tuple[int, int, bool]]:
+    """
+    (self, cumulative, top level) per module imported in one cold start, in
+    microseconds; top-level imports add up to the total import time.
+    """
+    env = dict(os.environ, AGENT_VERSION=version)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODE.format(version=version)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        top_level = len(module) - len(module.lstrip()) == 1
+        times[module.strip()] = (int(self_us), int(cumulative_us), top_level)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=0, help="fail over this median")
+    args = parser.parse_args()
+
+    failed = False
+    for version in AGENT_VERSIONS:
+        try:
+            runs = [import_times(version) for _ in range(args.runs)]
+        except RuntimeError as exc:
+            print(f"AGENT_VERSION={version}: import failed: {exc}")
+            failed = True
+            continue
+
+        totals = [
+            sum(cumulative for _, cumulative, top_level in times.values() if top_level)
+            for times in runs
+        ]
+        median_ms = statistics.median(totals) / 1000
+        print(f"AGENT_VERSION={version}: {median_ms:.0f} ms median over {args.runs} runs")
+
+        self_times = {
+            module: statistics.median(times.get(module, (0, 0, False))[0] for times in runs)
+            for module in runs[0]
+        }
+        for module, self_us in sorted(self_times.items(), key=lambda m: -m[1])[: args.top]:
+            print(f"  {self_us / 1000:>8.1f} ms  {module}")
+
+        if args.max_ms and median_ms > args.max_ms:
+            print(f"  over budget: {median_ms:.0f} ms > {args.max_ms:.0f} ms")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark: purge of ephemeral tool messages in ChatMemory.
+
+Compares the previous list-scan purge (`m not in tool_msgs` / `idx not in
+positions`) with the current slice-based purge at growing history sizes.
+
+    python benchmarks/bench_purge_tool_msgs.py
+"""
+
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from agent import ChatMemory  # noqa: E402
+from chat_store import DictChatStore  # noqa: E402
+
+SIZES = [1_000, 2_000, 5_000]
+REPEAT = 3
+
+
+def build_turn(n_messages: int):
+    history = [{"role": "system", "content": "prompt"}]
+    for i in range(n_messages // 2):
+        history.append({"role": "user", "content": f"pregunta {i}"})
+        history.append({"role": "assistant", "content": f"respuesta {i}"})
+
+    tool_msgs = [
+        {"type": "function_call_output", "call_id": f"call_{i}", "output": f"{i}" * 20}
+        for i in range(n_messages)
+    ]
+    return history, tool_msgs
+
+
+def legacy_equality_purge(history, tool_msgs):
+    messages = history + tool_msgs
+    return [m for m in messages if m not in tool_msgs]
+
+
+def legacy_position_purge(history, tool_msgs):
+    messages = history + tool_msgs
+    positions = list(range(len(history), len(messages)))
+    return [m for idx, m in enumerate(messages) if idx not in positions]
+
+
+def slice_purge(history, tool_msgs):
+    memory = ChatMemory(prompt="prompt", store=DictChatStore())
+    memory.set_messages(list(history), "bench")
+    for msg in tool_msgs:
+        memory._set_tool_output(msg["call_id"], msg["output"], "bench")
+    memory._purge_tool_msgs("bench")
+    return memory.get_messages("bench")
+
+
+def best_of(fn, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'messages':>9} {'equality (s)':>13} {'positions (s)':>14} {'slice (s)':>10}")
+    for size in SIZES:
+        history, tool_msgs = build_turn(size)
+        assert slice_purge(history, tool_msgs) == legacy_equality_purge(history, tool_msgs)
+        print(
+            f"{size:>9} "
+            f"{best_of(legacy_equality_purge, history, tool_msgs):>13.4f} "
+            f"{best_of(legacy_position_purge, history, tool_msgs):>14.4f} "
+            f"{best_of(slice_purge, history, tool_msgs):>10.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: size of SQL tool results in each output format.
+
+Encodes typical result sets (a wide partner list, accounting move lines and a
+small aggregate) as the tools return them, and reports characters and tokens
+per format. Tokens are counted with tiktoken when installed, else estimated
+at ~4 characters per token.
+
+    python benchmarks/bench_result_formats.py
+"""
+
+import datetime
+import pathlib
+import random
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from context_window import count_tokens  # noqa: E402
+from tools.result_format import FORMATS  # noqa: E402
+from tools.serialization import dumps  # noqa: E402
+from tools.sql_paging import page_response  # noqa: E402
+
+
+class _Page:
+    def __init__(self, columns, output_format):
+        self.columns = columns
+        self.output_format = output_format
+
+
+def partners(n: int = 100):
+    random.seed(1)
+    columns = ["id", "name", "email", "phone", "city", "country_id", "customer_rank", "active"]
+    cities = ["Madrid", "Barcelona", "Valencia", "Sevilla", "Bilbao"]
+    rows = [
+        (
+            i,
+            f"Cliente {i} S.L.",
+            f"contacto{i}@cliente{i}.es",
+            f"+34 6{random.randint(10_000_000, 99_999_999)}",
+            random.choice(cities),
+            68,
+            random.randint(0, 5),
+            True,
+        )
+        for i in range(1, n + 1)
+    ]
+    return columns, rows
+
+
+def move_lines(n: int = 100):
+    random.seed(2)
+    columns = ["id", "move_id", "account_id", "date", "debit", "credit", "balance"]
+    rows = []
+    for i in range(1, n + 1):
+        debit = Decimal(random.randint(0, 500_000)) / 100
+        rows.append(
+            (
+                i,
+                1000 + i // 3,
+                random.choice([430, 572, 700, 477]),
+                str(datetime.date(2024, 1, 1) + datetime.timedelta(days=i)),
+                str(debit),
+                "0.00",
+                str(debit),
+            )
+        )
+    return columns, rows
+
+
+def aggregate():
+    columns = ["state", "count", "amount_total"]
+    rows = [("draft", 12, "1520.40"), ("posted", 348, "98311.75"), ("cancel", 5, "410.00")]
+    return columns, rows
+
+
+def main() -> None:
+    datasets = {
+        "partners 100x8": partners(),
+        "move_lines 100x7": move_lines(),
+        "aggregate 3x3": aggregate(),
+    }
+
+    totals = {fmt: 0 for fmt in FORMATS}
+    print(f"{'dataset':<18}" + "".join(f"{fmt:>16}" for fmt in FORMATS))
+    for name, (columns, rows) in datasets.items():
+        cells = []
+        for fmt in FORMATS:
+            output = dumps(page_response(_Page(columns, fmt), rows, None, False, 1000))
+            tokens = count_tokens(output)
+            totals[fmt] += tokens
+            cells.append(f"{tokens:>7} ({len(output):>6})")
+        print(f"{name:<18}" + "".join(f"{cell:>16}" for cell in cells))
+
+    print(f"{'total tokens':<18}" + "".join(f"{totals[fmt]:>16}" for fmt in FORMATS))
+    baseline = totals["json"]
+    print(
+        "vs json: "
+        + ", ".join(f"{fmt} {100 * (1 - totals[fmt] / baseline):.0f}% less" for fmt in FORMATS if fmt != "json")
+    )
+    print(f"cheapest: {min(totals, key=totals.get)}")
+
+
+if __name__ == "__main__":
+    main()
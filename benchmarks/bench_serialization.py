@@ -0,0 +1,62 @@
+"""
+Micro-benchmark: serialization of SQL tool responses.
+
+Compares `json.dumps(..., default=str)` with `tools.serialization.dumps`
+(orjson when installed, else the stdlib fallback) on a page of rows with
+the types returned by the database drivers (Decimal, datetime, date, UUID).
+
+    python benchmarks/bench_serialization.py
+"""
+
+import datetime
+import json
+import pathlib
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from tools import serialization  # noqa: E402
+
+ROWS = [100, 1_000]
+REPEAT = 200
+
+
+def build_response(n_rows: int) -> dict:
+    rows = [
+        {
+            "id": i,
+            "uuid": uuid.UUID(int=i),
+            "name": f"Cliente {i} S.L.",
+            "date": datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 365),
+            "write_date": datetime.datetime(2024, 1, 1, 12, 30) + datetime.timedelta(minutes=i),
+            "amount_total": Decimal(i * 137) / 100,
+            "active": i % 2 == 0,
+        }
+        for i in range(n_rows)
+    ]
+    return {"status": "success", "results": rows, "row_count": n_rows, "next_page_token": None}
+
+
+def timed(fn, payload) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(payload)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main() -> None:
+    backend = "orjson" if serialization.orjson is not None else "json (fallback)"
+    print(f"backend: {backend}, {REPEAT} runs each")
+    print(f"{'rows':>6} {'json default=str':>18} {'dumps':>10} {'speedup':>8}")
+    for n_rows in ROWS:
+        payload = build_response(n_rows)
+        legacy = timed(lambda p: json.dumps(p, default=str), payload)
+        current = timed(serialization.dumps, payload)
+        print(f"{n_rows:>6} {legacy:>15.3f} ms {current:>7.3f} ms {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Chat Store Module
+Storage backends for ChatMemory: an in-memory LRU hot tier backed by an
+on-disk SQLite cold tier, with lazy loading and idle-user eviction.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Iterator, Optional
+
+
+class ChatStore(MutableMapping):
+    """
+    Interface of a chat history backend: a mapping user_id -> list of messages.
+
+    Lists returned by the store are mutated in place by ChatMemory; `persist`
+    is called when a turn ends so the backend can save them.
+    """
+
+    on_evict: Optional[Callable] = None
+    on_load: Optional[Callable] = None
+
+    def persist(self, user_id) -> None:
+        pass
+
+    def pin(self, user_id) -> None:
+        pass
+
+    def unpin(self, user_id) -> None:
+        pass
+
+    def evict_idle(self) -> int:
+        return 0
+
+
+class DictChatStore(dict, ChatStore):
+    """Process-memory only store (previous ChatMemory behaviour)."""
+
+
+class SQLiteColdStore:
+    """Cold tier: one row per user with the serialized history."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chats ("
+                "user_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def load(self, user_id) -> Optional[list]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT messages FROM chats WHERE user_id = ?", (str(user_id),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def exists(self, user_id) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM chats WHERE user_id = ?", (str(user_id),)
+            ).fetchone()
+        return row is not None
+
+    def save(self, user_id, payload: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO chats (user_id, messages, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET messages = excluded.messages, "
+                "updated_at = excluded.updated_at",
+                (str(user_id), payload, time.time()),
+            )
+
+    def delete(self, user_id) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chats WHERE user_id = ?", (str(user_id),))
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT user_id FROM chats")]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredChatStore(ChatStore):
+    """
+    LRU hot tier in memory + optional SQLite cold tier.
+
+    A user's history is loaded from disk on first access. Conversations idle
+    for more than `max_idle` seconds, or beyond `max_chats` / `max_bytes` in
+    the hot tier, are saved to disk and dropped from memory. Without a cold
+    tier they are dropped as well, and the user starts a new conversation.
+
+    Disk writes of evictions run on a background thread, so reading a chat
+    from the event loop never waits for SQLite.
+    """
+
+    def __init__(
+        self,
+        cold: Optional[SQLiteColdStore] = None,
+        max_idle: float = 1800.0,
+        max_chats: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.cold = cold
+        self.max_idle = max_idle
+        self.max_chats = max_chats
+        self.max_bytes = max_bytes
+        self._hot: OrderedDict = OrderedDict()  # user_id -> messages
+        self._last_access: dict = {}
+        self._sizes: dict = {}
+        self._hot_bytes = 0
+        self._pinned: set = set()
+        self._lock = threading.RLock()
+        self._evict_wakeup = threading.Event()
+        self._evictor: Optional[threading.Thread] = None
+        self.stats = {"loads": 0, "evictions": 0, "persists": 0}
+
+    @classmethod
+    def from_env(cls) -> "TieredChatStore":
+        """
+        Configure from CHAT_STORE_PATH (SQLite file of the disk tier; unset or
+        empty keeps chats in memory only), CHAT_MAX_IDLE (seconds),
+        CHAT_MAX_HOT_CHATS and CHAT_MAX_HOT_BYTES.
+        """
+        path = os.getenv("CHAT_STORE_PATH")
+        if not path:
+            print(
+                "CHAT_STORE_PATH is not set: idle chats will be discarded "
+                "instead of saved to disk"
+            )
+        return cls(
+            cold=SQLiteColdStore(path) if path else None,
+            max_idle=float(os.getenv("CHAT_MAX_IDLE") or 1800),
+            max_chats=int(os.getenv("CHAT_MAX_HOT_CHATS") or 1000),
+            max_bytes=int(os.getenv("CHAT_MAX_HOT_BYTES") or 64 * 1024 * 1024),
+        )
+
+    def __contains__(self, user_id) -> bool:
+        with self._lock:
+            if user_id in self._hot:
+                return True
+        return self.cold is not None and self.cold.exists(user_id)
+
+    def __getitem__(self, user_id) -> list:
+        with self._lock:
+            if user_id not in self._hot:
+                messages = self.cold.load(user_id) if self.cold else None
+                if messages is None:
+                    raise KeyError(user_id)
+
+                self.stats["loads"] += 1
+                self._hot[user_id] = messages
+                if self.on_load:
+                    self.on_load(user_id, messages)
+
+            self._touch(user_id)
+            messages = self._hot[user_id]
+
+        self._schedule_eviction()
+        return messages
+
+    def __setitem__(self, user_id, messages: list) -> None:
+        with self._lock:
+            self._hot[user_id] = messages
+            self._touch(user_id)
+        self._schedule_eviction()
+
+    def __delitem__(self, user_id) -> None:
+        found = False
+        with self._lock:
+            if user_id in self._hot:
+                found = True
+                self._drop(user_id)
+
+        if self.cold is not None and self.cold.exists(user_id):
+            found = True
+            self.cold.delete(user_id)
+
+        if not found:
+            raise KeyError(user_id)
+
+    def __iter__(self) -> Iterator:
+        with self._lock:
+            keys = list(self._hot)
+        if self.cold is not None:
+            hot = {str(key) for key in keys}
+            keys += [key for key in self.cold.keys() if key not in hot]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def persist(self, user_id) -> None:
+        """Save a user's history to the cold tier (only plain dict messages)."""
+        with self._lock:
+            if user_id not in self._hot:
+                return
+            payload = json.dumps(
+                [msg for msg in self._hot[user_id] if isinstance(msg, dict)],
+                ensure_ascii=False,
+            )
+            self._hot_bytes += len(payload) - self._sizes.get(user_id, 0)
+            self._sizes[user_id] = len(payload)
+
+        if self.cold is not None:
+            self.cold.save(user_id, payload)
+            self.stats["persists"] += 1
+
+    def pin(self, user_id) -> None:
+        """Protect a chat from eviction while a turn is in progress."""
+        with self._lock:
+            self._pinned.add(user_id)
+
+    def unpin(self, user_id) -> None:
+        with self._lock:
+            self._pinned.discard(user_id)
+
+    def evict_idle(self) -> int:
+        """
+        Move idle and over-budget chats to the cold tier, or discard them if
+        there is none. A chat is saved before it leaves the hot tier, so it is
+        always readable from one of them; if it is used while being saved, it
+        stays in memory.
+        """
+        now = time.monotonic()
+        candidates = []
+        with self._lock:
+            n_chats, n_bytes = len(self._hot), self._hot_bytes
+            newest = next(reversed(self._hot), None)
+            # OrderedDict is kept in LRU order: oldest access first. The most
+            # recent chat and chats in the middle of a turn are never evicted
+            for user_id in self._hot:
+                idle = now - self._last_access[user_id] > self.max_idle
+                over_budget = n_chats > self.max_chats or n_bytes > self.max_bytes
+                if not idle and not over_budget:
+                    break
+                if user_id == newest or user_id in self._pinned:
+                    continue
+
+                messages = self._hot[user_id]
+                payload = None
+                if self.cold is not None:
+                    payload = json.dumps(
+                        [msg for msg in messages if isinstance(msg, dict)],
+                        ensure_ascii=False,
+                    )
+                candidates.append((user_id, messages, self._last_access[user_id], payload))
+                n_chats -= 1
+                n_bytes -= self._sizes.get(user_id, 0)
+
+        for user_id, _, _, payload in candidates:
+            if payload is not None:
+                self.cold.save(user_id, payload)
+
+        evicted = []
+        with self._lock:
+            for user_id, messages, last_access, _ in candidates:
+                if (
+                    self._hot.get(user_id) is messages
+                    and self._last_access[user_id] == last_access
+                    and user_id not in self._pinned
+                ):
+                    self._drop(user_id)
+                    evicted.append(user_id)
+
+        for user_id in evicted:
+            self.stats["evictions"] += 1
+            if self.on_evict:
+                self.on_evict(user_id)
+
+        return len(evicted)
+
+    def _schedule_eviction(self) -> None:
+        """Run evict_idle inline if it only touches memory, else in the background."""
+        if self.cold is None:
+            self.evict_idle()
+            return
+
+        with self._lock:
+            if self._evictor is None:
+                self._evictor = threading.Thread(
+                    target=self._evict_loop, name="chat-store-evict", daemon=True
+                )
+                self._evictor.start()
+        self._evict_wakeup.set()
+
+    def _evict_loop(self) -> None:
+        while True:
+            self._evict_wakeup.wait()
+            self._evict_wakeup.clear()
+            try:
+                self.evict_idle()
+            except Exception as e:
+                print(f"Chat eviction failed: {e}")
+
+    def _touch(self, user_id) -> None:
+        self._hot.move_to_end(user_id)
+        self._last_access[user_id] = time.monotonic()
+
+    def _drop(self, user_id) -> None:
+        del self._hot[user_id]
+        self._last_access.pop(user_id, None)
+        self._pinned.discard(user_id)
+        self._hot_bytes -= self._sizes.pop(user_id, 0)
@@ -0,0 +1,143 @@
+"""
+Compaction Module
+Folds the oldest turns of long conversations into a running summary message.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from context_window import ContextWindow, split_turns
+
+SUMMARY_PREFIX = "Resumen de la conversación anterior:\n"
+
+SUMMARY_INSTRUCTIONS = (
+    "Resume la conversación entre un usuario y un asistente para que el asistente "
+    "pueda continuarla. Conserva datos concretos (nombres, cifras, tablas, consultas "
+    "y resultados), decisiones y preferencias del usuario. Integra el resumen previo "
+    "si existe. Máximo 200 palabras, en español."
+)
+
+
+class ConversationCompactor:
+    """
+    Incremental summarization of long conversations.
+
+    When a conversation goes over `threshold` of the model's token budget,
+    every turn except the newest `keep_turns` is folded, together with the
+    previous summary, into a single summary message placed right after the
+    prompt. It runs in the background after the reply has been returned, and
+    the result is discarded if the history changed in the meantime.
+    """
+
+    def __init__(
+        self,
+        context_window: ContextWindow,
+        summarize: Callable[[str], str],
+        async_summarize: Optional[Callable[[str], Awaitable[str]]] = None,
+        threshold: float = 0.6,
+        keep_turns: int = 4,
+    ):
+        self.context_window = context_window
+        self.threshold = threshold
+        self.keep_turns = keep_turns
+        self._summarize = summarize
+        self._async_summarize = async_summarize
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="compaction")
+        self._running: set = set()
+        self._tasks: set = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, chat_memory, user_id, model: str) -> bool:
+        """Compact in a background thread (sync agents)."""
+        plan = self._plan(chat_memory, user_id, model)
+        if plan is None:
+            return False
+
+        self._executor.submit(self._run, chat_memory, user_id, plan)
+        return True
+
+    def schedule_async(self, chat_memory, user_id, model: str) -> bool:
+        """Compact in a background task of the running loop (async agents)."""
+        plan = self._plan(chat_memory, user_id, model)
+        if plan is None:
+            return False
+
+        task = asyncio.get_running_loop().create_task(
+            self._arun(chat_memory, user_id, plan)
+        )
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def _plan(self, chat_memory, user_id, model: str) -> Optional[tuple[list, str]]:
+        messages = chat_memory.get_messages(user_id)
+        budget = self.context_window.budget_for(model)
+        if self.context_window.total_tokens(messages) <= budget * self.threshold:
+            return None
+
+        head, turns = split_turns(messages)
+        if len(turns) <= self.keep_turns:
+            return None
+
+        with self._lock:
+            if user_id in self._running:
+                return None
+            self._running.add(user_id)
+
+        old = head[1:] + [msg for turn in turns[: -self.keep_turns] for msg in turn]
+        return old, self._transcript(old)
+
+    def _run(self, chat_memory, user_id, plan: tuple[list, str]) -> None:
+        old, transcript = plan
+        try:
+            if self._apply(chat_memory, user_id, old, self._summarize(transcript)):
+                chat_memory.commit(user_id)
+        except Exception as exc:
+            print(f"Compaction failed for {user_id}: {exc}")
+        finally:
+            with self._lock:
+                self._running.discard(user_id)
+
+    async def _arun(self, chat_memory, user_id, plan: tuple[list, str]) -> None:
+        old, transcript = plan
+        try:
+            if self._async_summarize is not None:
+                summary = await self._async_summarize(transcript)
+            else:
+                summary = await asyncio.to_thread(self._summarize, transcript)
+            if self._apply(chat_memory, user_id, old, summary):
+                # SQLite I/O of the chat store stays off the event loop
+                await asyncio.to_thread(chat_memory.commit, user_id)
+        except Exception as exc:
+            print(f"Compaction failed for {user_id}: {exc}")
+        finally:
+            with self._lock:
+                self._running.discard(user_id)
+
+    def _apply(self, chat_memory, user_id, old: list, summary: str) -> bool:
+        """Replace `old` with the summary; False if the history changed meanwhile."""
+        summary_msg = {
+            "role": chat_memory.init_msg["role"],
+            "content": f"{SUMMARY_PREFIX}{summary.strip()}",
+        }
+        if chat_memory._replace_history_prefix(user_id, old, [summary_msg]):
+            print(f"Compacted {len(old)} messages of {user_id} into a summary")
+            return True
+        print(f"Compaction of {user_id} skipped: history changed")
+        return False
+
+    @staticmethod
+    def _transcript(messages: list) -> str:
+        lines = []
+        for msg in messages:
+            if not isinstance(msg, dict):
+                continue
+            content = str(msg.get("content", ""))
+            if content.startswith(SUMMARY_PREFIX):
+                lines.append(f"Resumen previo: {content[len(SUMMARY_PREFIX):]}")
+            else:
+                lines.append(f"{msg.get('role')}: {content}")
+        return "\n".join(lines)
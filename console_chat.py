@@ -1,19 +1,30 @@
+import importlib
 import sys
 import os
 from typing import Optional
-from agent_v2 import Agent as AvangenioAgent
-from agent import Agent as OpenAIAgent
-from tools import AVAILABLE_FUNCTIONS as rag_functions
+from tools import AVAILABLE_FUNCTIONS as rag_functions, TOOL_SETTINGS, start_catalog
 
 
-try:
-    if os.getenv("AGENT_VERSION") == "OPENAI":
-        from json_tools import tools as rag_prompt
+def load_agent(agent_version: str) -> tuple[type, list]:
+    """
+    Agent class and tool definitions for AGENT_VERSION. Only the selected
+    agent module (and its provider client) is imported.
+    """
+    if agent_version == "OPENAI":
+        from agent import Agent
+
+        tools_module = "json_tools"
     else:
-        from json_tools_v2 import tools as rag_prompt
-except ImportError:
-    print("Warning: RAG prompt tools not available")
-    rag_prompt = []
+        from agent_v2 import Agent
+
+        tools_module = "json_tools_v2"
+
+    try:
+        rag_prompt = importlib.import_module(tools_module).tools
+    except ImportError:
+        print("Warning: RAG prompt tools not available")
+        rag_prompt = []
+    return Agent, rag_prompt
 
 
 class ConsoleChat:
@@ -22,12 +33,21 @@ class ConsoleChat:
     def __init__(
         self,
         agent_name: str = "Assistant",
+        stream: bool = True,
     ):
+        self.stream = stream
         agent_version = os.getenv("AGENT_VERSION").upper()
+        agent_class, self.rag_prompt = load_agent(agent_version)
 
         if agent_version == "OPENAI":
             openai_model = os.getenv("OPENAI_MODEL")
-            self.agent = OpenAIAgent(name=agent_name, model=openai_model)
+            self.agent = agent_class(
+                name=agent_name,
+                model=openai_model,
+                tool_settings=TOOL_SETTINGS,
+                chain_responses=os.getenv("OPENAI_CHAIN_RESPONSES", "").lower()
+                == "true",
+            )
             print(f"Using OpenAI Agent with model: {openai_model}")
         else:
             avangenio_model = os.getenv("AVANGENIO_MODEL")
@@ -35,14 +55,22 @@ class ConsoleChat:
             proxy_url = os.getenv("HTTP_PROXY")
             if proxy_url:
                 print(f"Proxy detectado: {proxy_url[:50]}...")
-                self.agent = AvangenioAgent(
-                    name=agent_name, model=avangenio_model, proxy_url=proxy_url
+                self.agent = agent_class(
+                    name=agent_name,
+                    model=avangenio_model,
+                    proxy_url=proxy_url,
+                    tool_settings=TOOL_SETTINGS,
                 )
             else:
-                self.agent = AvangenioAgent(name=agent_name, model=avangenio_model)
+                self.agent = agent_class(
+                    name=agent_name, model=avangenio_model, tool_settings=TOOL_SETTINGS
+                )
 
             print(f"Using Avangenio Agent with model: {avangenio_model}")
 
+        # Schema catalog: cached on disk, refreshed in the background
+        start_catalog()
+
         self.user_id = 1  # Using a fixed channel ID for console chat
         self.running = True
 
@@ -147,18 +175,21 @@ class ConsoleChat:
             # Show thinking indicator
             self.print_colored(f"\n{self.agent.name} está pensando...", "system")
 
-            response = self.agent.process_msg(
-                message,
-                self.user_id,
-                rag_functions=rag_functions,
-                rag_prompt=rag_prompt,
-                tool_execution_callback=self.tool_execution_callback,
-            )
-
-            if response:
-                self.print_colored(f"\n{self.agent.name}: ", "agent", end="")
-                self.print_colored(response, "agent")
+            if self.stream:
+                response = self.stream_response(message)
             else:
+                response = self.agent.process_msg(
+                    message,
+                    self.user_id,
+                    rag_functions=rag_functions,
+                    rag_prompt=self.rag_prompt,
+                    tool_execution_callback=self.tool_execution_callback,
+                )
+                if response:
+                    self.print_colored(f"\n{self.agent.name}: ", "agent", end="")
+                    self.print_colored(response, "agent")
+
+            if not response:
                 self.print_colored(
                     f"\n{self.agent.name}: Lo siento, no pude procesar tu mensaje.",
                     "error",
@@ -168,6 +199,32 @@ class ConsoleChat:
             self.print_colored(f"\nError al procesar el mensaje: {str(e)}", "error")
             self.print_colored("Por favor, intenta de nuevo.", "error")
 
+    def stream_response(self, message: str) -> str:
+        """
+        Render the agent's answer live as the tokens arrive.
+
+        Returns:
+            The full answer text
+        """
+        chunks = []
+        for delta in self.agent.stream_msg(
+            message,
+            self.user_id,
+            rag_functions=rag_functions,
+            rag_prompt=self.rag_prompt,
+            tool_execution_callback=self.tool_execution_callback,
+        ):
+            if not chunks:
+                self.print_colored(f"\n{self.agent.name}: ", "agent", end="")
+            chunks.append(delta)
+            print(f"{self.COLORS['agent']}{delta}{self.COLORS['reset']}", end="", flush=True)
+
+        if chunks:
+            print()
+        if self.agent.last_ttft is not None:
+            self.print_colored(f"(primer token en {self.agent.last_ttft:.2f}s)", "system")
+        return "".join(chunks)
+
     def run(self) -> None:
         """Run the main conversation loop."""
         self.print_welcome()
@@ -0,0 +1,164 @@
+"""
+Context Window Module
+Keeps the input of each LLM call within a token budget per model.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from enumerations import MessageType, ModelType
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken is optional
+    _ENCODING = None
+
+
+# Token budget for the whole input (prompt + history) of each model
+CONTEXT_BUDGETS = {
+    ModelType.GPT_4_1.value: 32_000,
+    ModelType.GPT_4_1_mini.value: 32_000,
+    ModelType.GPT_4_1_nano.value: 16_000,
+    ModelType.GPT_5.value: 32_000,
+    ModelType.GPT_5_mini.value: 32_000,
+    ModelType.GPT_5_nano.value: 16_000,
+    ModelType.AGENT_XS.value: 8_000,
+    ModelType.AGENT_SM.value: 16_000,
+    ModelType.AGENT_MD.value: 32_000,
+    ModelType.AGENT_LG.value: 64_000,
+    ModelType.AGENT_XL.value: 64_000,
+}
+DEFAULT_BUDGET = 16_000
+_MAX_CACHED_MESSAGES = 20_000
+_MAX_CACHED_BYTES = 32 * 1024 * 1024
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of a text with tiktoken when installed, else ~4 chars per token."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _message_text(msg) -> str:
+    if isinstance(msg, dict):
+        return json.dumps(msg, ensure_ascii=False, default=str)
+    if hasattr(msg, "model_dump_json"):  # OpenAI SDK output items
+        return msg.model_dump_json()
+    return str(msg)
+
+
+class ContextWindow:
+    """
+    Token-budgeted view of a conversation.
+
+    Keeps the system prompt plus the newest turns that fit in the budget of
+    the model. A turn starts at a user message and includes every tool call
+    and tool output that follows it, so calls are never split from their
+    outputs. The current (last) turn is always kept.
+    """
+
+    def __init__(self, budgets: Optional[dict] = None, default_budget: Optional[int] = None):
+        self.budgets = dict(CONTEXT_BUDGETS, **(budgets or {}))
+        self.default_budget = default_budget or int(
+            os.getenv("CONTEXT_TOKEN_BUDGET") or DEFAULT_BUDGET
+        )
+        # LRU of id(message) -> (message, tokens, bytes). Messages are never
+        # modified once added to a history, so a message is measured once; the
+        # entry holds the message so its id cannot be reused while cached, and
+        # the cache is capped in bytes so it only briefly outlives evicted chats
+        self._tokens: OrderedDict[int, tuple] = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def budget_for(self, model: str) -> int:
+        return self.budgets.get(model, self.default_budget)
+
+    def message_tokens(self, msg) -> int:
+        """Tokens of a message; each message object is only tokenized once."""
+        return self._measure(msg)[0]
+
+    def message_bytes(self, msg) -> int:
+        """Serialized size of a message in bytes, cached like the tokens."""
+        return self._measure(msg)[1]
+
+    def _measure(self, msg) -> tuple[int, int]:
+        key = id(msg)
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached is not None and cached[0] is msg:
+                self._tokens.move_to_end(key)
+                return cached[1], cached[2]
+
+        text = _message_text(msg)
+        tokens = count_tokens(text) + 4  # per-message overhead
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            previous = self._tokens.pop(key, None)
+            if previous is not None:
+                self._cached_bytes -= previous[2]
+            self._tokens[key] = (msg, tokens, size)
+            self._cached_bytes += size
+            while (
+                len(self._tokens) > _MAX_CACHED_MESSAGES
+                or self._cached_bytes > _MAX_CACHED_BYTES
+            ):
+                self._cached_bytes -= self._tokens.popitem(last=False)[1][2]
+        return tokens, size
+
+    def total_tokens(self, messages: list) -> int:
+        return sum(self.message_tokens(msg) for msg in messages)
+
+    def fit(self, messages: list, model: str) -> tuple[list, int]:
+        """
+        Return (messages that fit the budget of `model`, tokens saved).
+
+        The original list is returned unchanged when nothing has to be dropped.
+        """
+        head, turns = split_turns(messages)
+        budget = self.budget_for(model)
+
+        used = sum(self.message_tokens(msg) for msg in head)
+        kept = 0
+        for turn in reversed(turns):
+            turn_tokens = sum(self.message_tokens(msg) for msg in turn)
+            if kept and used + turn_tokens > budget:
+                break
+            used += turn_tokens
+            kept += 1
+
+        if kept == len(turns):
+            return messages, 0
+
+        dropped = turns[: len(turns) - kept]
+        saved = sum(self.message_tokens(msg) for turn in dropped for msg in turn)
+        fitted = head + [msg for turn in turns[len(turns) - kept :] for msg in turn]
+        return fitted, saved
+
+
+def _is_user_msg(msg) -> bool:
+    return isinstance(msg, dict) and msg.get("role") == MessageType.USER.value
+
+
+def split_turns(messages: list) -> tuple[list, list[list]]:
+    """
+    Split a history into (head, turns).
+
+    The head is the prompt plus anything before the first user message
+    (e.g. a conversation summary); each turn starts at a user message.
+    """
+    head: list = []
+    turns: list[list] = []
+    for msg in messages:
+        if _is_user_msg(msg):
+            turns.append([msg])
+        elif turns:
+            turns[-1].append(msg)
+        else:
+            head.append(msg)
+    return head, turns
@@ -24,6 +24,27 @@ tools = [
             "parameters": {},
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_tables",
+            "description": "Busca en el esquema de la base de datos las tablas (y sus columnas) relevantes para una consulta. Úsala antes de escribir SQL",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Palabras clave en inglés, como los nombres de tablas de Odoo (p. ej. 'invoice partner payment')",
+                    },
+                    "top_k": {
+                        "type": "integer",
+                        "description": "Número máximo de tablas a devolver (por defecto 8, máximo 25)",
+                    },
+                },
+                "required": ["query"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -36,6 +57,19 @@ tools = [
                         "type": "string",
                         "description": "Consulta SQL que se va a ejecutar en la base de datos",
                     },
+                    "page_token": {
+                        "type": "string",
+                        "description": "Token next_page_token de una respuesta anterior para obtener la siguiente página (opcional)",
+                    },
+                    "use_cache": {
+                        "type": "boolean",
+                        "description": "Usar resultados en caché si existen (por defecto true). Usa false si el usuario pide datos actualizados",
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "enum": ["csv", "tsv", "columns", "json"],
+                        "description": "Formato de las filas (por defecto csv, el más compacto). Usa json solo si necesitas un objeto por fila",
+                    },
                 },
                 "required": ["input_query"],
             },
@@ -53,11 +87,49 @@ tools = [
                         "type": "string",
                         "description": "Consulta SQL (SELECT ...) que se ejecutará en SQL Server",
                     },
+                    "page_token": {
+                        "type": "string",
+                        "description": "Token next_page_token de una respuesta anterior para obtener la siguiente página (opcional)",
+                    },
+                    "use_cache": {
+                        "type": "boolean",
+                        "description": "Usar resultados en caché si existen (por defecto true). Usa false si el usuario pide datos actualizados",
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "enum": ["csv", "tsv", "columns", "json"],
+                        "description": "Formato de las filas (por defecto csv, el más compacto). Usa json solo si necesitas un objeto por fila",
+                    },
                 },
                 "required": ["input_query"],
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "read_tool_output",
+            "description": "Lee un fragmento de la salida completa de una herramienta que se recortó por su tamaño. Úsala solo si necesitas los datos omitidos",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "handle": {
+                        "type": "string",
+                        "description": "Handle indicado en la nota de la salida recortada",
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Posición en caracteres desde la que leer (la indicada en la nota o next_offset)",
+                    },
+                    "length": {
+                        "type": "integer",
+                        "description": "Número de caracteres a leer (por defecto y máximo 8000)",
+                    },
+                },
+                "required": ["handle"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
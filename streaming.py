@@ -0,0 +1,123 @@
+"""
+Streaming Module
+Helpers to consume streamed model output: text deltas, the final response
+and the time to first token.
+"""
+
+import time
+from typing import Any, Optional
+
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+
+
+class StreamError(Exception):
+    pass
+
+
+class StreamTimer:
+    """Time to first token of a streamed turn (tool rounds included)."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ttft: Optional[float] = None
+
+    def mark(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started
+
+
+def read_response_event(event) -> tuple[Optional[str], Optional[Any]]:
+    """
+    Responses API stream event -> (text delta, final response).
+
+    Raises StreamError when the response failed.
+    """
+    if event.type == "response.output_text.delta":
+        return event.delta, None
+    if event.type in ("response.completed", "response.incomplete"):
+        return None, event.response
+    if event.type == "response.failed":
+        error = getattr(event.response, "error", None)
+        raise StreamError(f"Response failed: {error}")
+    if event.type == "error":
+        raise StreamError(f"Stream error: {event.message}")
+    return None, None
+
+
+class ChatStreamAccumulator:
+    """
+    Rebuilds a chat completion from its streamed chunks.
+
+    Tool calls arrive split in deltas keyed by `index`: the first delta of a
+    call carries its id and name, the rest only pieces of the arguments.
+    """
+
+    def __init__(self):
+        self.id = ""
+        self.model = ""
+        self.created = 0
+        self.finish_reason: Optional[str] = None
+        self._content: list[str] = []
+        self._tool_calls: dict[int, dict] = {}
+
+    def add(self, chunk) -> Optional[str]:
+        """Absorb a chunk; returns its text delta, if any."""
+        self.id = chunk.id or self.id
+        self.model = chunk.model or self.model
+        self.created = chunk.created or self.created
+        if not chunk.choices:  # e.g. the final usage chunk
+            return None
+
+        choice = chunk.choices[0]
+        self.finish_reason = choice.finish_reason or self.finish_reason
+        delta = choice.delta
+
+        for call in delta.tool_calls or []:
+            entry = self._tool_calls.setdefault(
+                call.index, {"id": "", "name": "", "arguments": []}
+            )
+            entry["id"] = call.id or entry["id"]
+            if call.function is not None:
+                entry["name"] = call.function.name or entry["name"]
+                if call.function.arguments:
+                    entry["arguments"].append(call.function.arguments)
+
+        if delta.content:
+            self._content.append(delta.content)
+            return delta.content
+        return None
+
+    def result(self) -> ChatCompletion:
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=entry["id"],
+                type="function",
+                function=Function(
+                    name=entry["name"], arguments="".join(entry["arguments"])
+                ),
+            )
+            for _, entry in sorted(self._tool_calls.items())
+        ]
+        message = ChatCompletionMessage(
+            role="assistant",
+            content="".join(self._content),
+            tool_calls=tool_calls or None,
+        )
+        return ChatCompletion.model_construct(
+            id=self.id,
+            object="chat.completion",
+            created=self.created,
+            model=self.model,
+            choices=[
+                Choice.model_construct(
+                    index=0,
+                    message=message,
+                    finish_reason=self.finish_reason or "stop",
+                )
+            ],
+        )
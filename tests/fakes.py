@@ -0,0 +1,35 @@
+"""Fakes of the OpenAI Responses API shared by the agent tests."""
+
+import json
+from types import SimpleNamespace
+
+
+def function_call(name: str, arguments: dict, call_id: str):
+    return SimpleNamespace(
+        type="function_call", name=name, arguments=json.dumps(arguments), call_id=call_id
+    )
+
+
+def message(text: str):
+    return SimpleNamespace(type="message", content=[SimpleNamespace(text=text)])
+
+
+class FakeResponses:
+    """
+    Stands in for AIClient: each request pops the next scripted output (a
+    list of output items, or an exception to raise) and records its params.
+    """
+
+    def __init__(self, *outputs):
+        self.outputs = list(outputs)
+        self.requests: list[dict] = []
+
+    def _gen_ai_output(self, params: dict):
+        self.requests.append(dict(params, input=list(params["input"])))
+        output = self.outputs.pop(0)
+        if isinstance(output, Exception):
+            raise output
+        return SimpleNamespace(output=output, id=f"resp_{len(self.requests)}")
+
+    async def _async_gen_ai_output(self, params: dict):
+        return self._gen_ai_output(params)
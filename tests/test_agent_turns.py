@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+import agent as agent_module
+from chat_store import TieredChatStore
+from fakes import FakeResponses, function_call, message
+
+
+@pytest.fixture
+def store():
+    return TieredChatStore()
+
+
+@pytest.fixture
+def make_agent(store):
+    def make(*outputs):
+        bot = agent_module.Agent(api_key="test", turn_timeout=0)
+        bot.chat_memory = agent_module.ChatMemory(prompt="sys", store=store)
+        bot._ai_client = FakeResponses(*outputs)
+        return bot
+
+    return make
+
+
+def lookup(city: str) -> str:
+    return f"sunny in {city}"
+
+
+def roles(bot, user_id=1):
+    return [
+        msg.get("role") if isinstance(msg, dict) else msg.type
+        for msg in bot.chat_memory.get_messages(user_id)
+    ]
+
+
+def test_failed_turn_does_not_leak_tool_messages(make_agent, store):
+    bot = make_agent(
+        [function_call("lookup", {"city": "Lima"}, "c1")],
+        RuntimeError("API down"),
+        [message("a2")],
+    )
+
+    with pytest.raises(RuntimeError):
+        bot.process_msg("q1", 1, rag_functions={"lookup": lookup})
+
+    assert roles(bot) == ["developer", "user"]
+    assert bot.chat_memory.get_tool_msgs(1) == []
+    assert 1 not in store._pinned
+
+    assert bot.process_msg("q2", 1) == "a2"
+    contents = [msg["content"] for msg in bot.chat_memory.get_messages(1)]
+    assert contents == ["sys", "q1", "q2", "a2"]
+
+
+def test_failed_async_turn_does_not_leak_tool_messages(make_agent, store):
+    bot = make_agent(
+        [function_call("lookup", {"city": "Quito"}, "c1")],
+        RuntimeError("API down"),
+        [message("a2")],
+    )
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(bot.async_process_msg("q1", 1, rag_functions={"lookup": lookup}))
+
+    assert roles(bot) == ["developer", "user"]
+    assert 1 not in store._pinned
+    assert asyncio.run(bot.async_process_msg("q2", 1)) == "a2"
+    assert roles(bot) == ["developer", "user", "user", "assistant"]
+
+
+def test_tool_messages_are_purged_at_the_end_of_a_turn(make_agent, store):
+    bot = make_agent(
+        [function_call("lookup", {"city": "Lima"}, "c1")],
+        [message("sunny")],
+    )
+
+    assert bot.process_msg("q1", 1, rag_functions={"lookup": lookup}) == "sunny"
+
+    second_request = bot._ai_client.requests[1]["input"]
+    assert second_request[-1]["output"] == "sunny in Lima"
+    assert roles(bot) == ["developer", "user", "assistant"]
+    assert 1 not in store._pinned
@@ -0,0 +1,85 @@
+import json
+import threading
+
+from chat_store import TieredChatStore
+
+
+class MemoryColdStore:
+    """Cold tier kept in a dict that records which thread wrote each chat."""
+
+    def __init__(self):
+        self.rows = {}
+        self.writers = []
+
+    def load(self, user_id):
+        return list(self.rows[str(user_id)]) if str(user_id) in self.rows else None
+
+    def exists(self, user_id):
+        return str(user_id) in self.rows
+
+    def save(self, user_id, payload):
+        self.writers.append(threading.current_thread())
+        self.rows[str(user_id)] = json.loads(payload)
+
+    def delete(self, user_id):
+        self.rows.pop(str(user_id), None)
+
+    def keys(self):
+        return list(self.rows)
+
+
+def history(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_idle_chats_are_dropped_without_cold_tier():
+    store = TieredChatStore(max_idle=0)
+    evicted = []
+    store.on_evict = evicted.append
+
+    store["alice"] = history("hola")
+    store["bob"] = history("hey")
+
+    assert evicted == ["alice"]
+    assert "alice" not in store
+    assert store["bob"] == history("hey")
+
+
+def test_hot_chat_budget_is_enforced_without_cold_tier():
+    store = TieredChatStore(max_chats=2)
+
+    for user_id in ("a", "b", "c", "d"):
+        store[user_id] = history(user_id)
+
+    assert list(store) == ["c", "d"]
+    assert store.stats["evictions"] == 2
+
+
+def test_pinned_chat_survives_eviction():
+    store = TieredChatStore(max_idle=0)
+    store["alice"] = history("hola")
+    store.pin("alice")
+
+    store["bob"] = history("hey")
+    assert "alice" in store
+
+    store.unpin("alice")
+    store["carol"] = history("buenas")
+    assert "alice" not in store
+
+
+def test_evicted_chat_is_saved_off_the_caller_thread_and_reloaded():
+    cold = MemoryColdStore()
+    store = TieredChatStore(cold=cold, max_idle=0)
+    evicted = threading.Event()
+    store.on_evict = lambda user_id: evicted.set()
+
+    store["alice"] = history("hola")
+    store["bob"] = history("hey")
+
+    assert evicted.wait(timeout=5)
+    assert cold.writers and threading.current_thread() not in cold.writers
+    assert cold.rows["alice"] == history("hola")
+
+    assert store["alice"] == history("hola")
+    assert store.stats["loads"] == 1
@@ -0,0 +1,61 @@
+import context_window
+from context_window import ContextWindow
+
+
+def user(text):
+    return {"role": "user", "content": text}
+
+
+def assistant(text):
+    return {"role": "assistant", "content": text}
+
+
+def test_each_message_is_serialized_once(monkeypatch):
+    serialized = []
+    message_text = context_window._message_text
+
+    def spy(msg):
+        serialized.append(msg)
+        return message_text(msg)
+
+    monkeypatch.setattr(context_window, "_message_text", spy)
+    window = ContextWindow()
+    history = [user("hola"), assistant("buenas"), user("¿qué tal?")]
+
+    first = window.total_tokens(history)
+    second = window.total_tokens(history)
+
+    assert first == second
+    assert len(serialized) == 3
+
+
+def test_equal_length_messages_are_measured_separately():
+    window = ContextWindow()
+    ascii_text, accented = user("n" * 40), user("ñ" * 40)
+
+    assert window.message_bytes(ascii_text) == window.message_bytes(accented) - 40
+    # A copy is a different object: measured on its own, with the same result
+    assert window.message_tokens(dict(accented)) == window.message_tokens(accented)
+
+
+def test_cache_is_capped_in_bytes(monkeypatch):
+    monkeypatch.setattr(context_window, "_MAX_CACHED_BYTES", 1000)
+    window = ContextWindow()
+
+    for i in range(50):
+        window.message_tokens(user(f"{i} " + "x" * 100))
+
+    assert window._cached_bytes <= 1000
+    assert len(window._tokens) < 10
+
+
+def test_fit_drops_whole_old_turns_and_keeps_the_last_one():
+    window = ContextWindow(budgets={"tiny": 60})
+    prompt = {"role": "developer", "content": "sys"}
+    old = [user("old " * 20), assistant("reply " * 20)]
+    last = [user("now " * 40)]
+
+    fitted, saved = window.fit([prompt, *old, *last], "tiny")
+
+    assert fitted == [prompt, *last]
+    assert saved == window.total_tokens(old)
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+from tools.db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.alive = True  # False once the server dropped it without telling us
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDatabase:
+    """Opens numbered FakeConnections."""
+
+    def __init__(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection(len(self.opened) + 1)
+        self.opened.append(conn)
+        return conn
+
+    def ping(self, conn):
+        if not conn.alive:
+            raise ConnectionError("server went away")
+
+    def pool(self, **options):
+        return ConnectionPool(
+            self.connect, ping=self.ping, is_closed=lambda conn: conn.closed, **options
+        )
+
+
+def test_released_connection_is_reused():
+    db = FakeDatabase()
+    pool = db.pool(min_size=0, max_size=2)
+
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+
+    stats = pool.stats()
+    assert (stats["created"], stats["checkouts"], stats["in_use"]) == (1, 2, 1)
+
+
+def test_min_size_connections_are_opened_up_front():
+    db = FakeDatabase()
+    pool = db.pool(min_size=2, max_size=4)
+
+    assert len(db.opened) == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_full_pool_times_out():
+    pool = FakeDatabase().pool(min_size=0, max_size=1, timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_gets_the_connection_another_thread_returns():
+    pool = FakeDatabase().pool(min_size=0, max_size=1, timeout=2)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+
+    assert pool.acquire() is conn
+    stats = pool.stats()
+    assert stats["waits"] == 1 and stats["max_wait_time"] > 0
+
+
+def test_broken_connections_are_not_returned_to_the_pool():
+    db = FakeDatabase()
+    pool = db.pool(min_size=0, max_size=2)
+
+    conn = pool.acquire()
+    conn.closed = True
+    pool.release(conn)
+    assert pool.stats()["discarded"] == 1
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.closed = True
+            raise RuntimeError("query failed")
+
+    assert pool.stats()["size"] == 0
+    assert pool.acquire() is db.opened[-1] is not conn
+
+
+def test_failed_reset_discards_the_connection():
+    def reset(conn):
+        raise RuntimeError("rollback failed")
+
+    db = FakeDatabase()
+    pool = ConnectionPool(db.connect, min_size=0, reset=reset)
+
+    conn = pool.acquire()
+    pool.release(conn)
+    assert conn.closed
+    assert pool.stats()["discarded"] == 1
+
+
+def test_connection_failing_ping_is_replaced():
+    db = FakeDatabase()
+    pool = db.pool(min_size=0, max_size=1, ping_after=0)
+
+    stale = pool.acquire()
+    pool.release(stale)
+    stale.alive = False
+    time.sleep(0.01)
+
+    fresh = pool.acquire()
+
+    assert fresh is not stale and stale.closed
+    assert pool.stats()["recycled"] == 1
+
+
+def test_idle_connections_above_min_size_are_recycled():
+    db = FakeDatabase()
+    pool = db.pool(min_size=1, max_size=3)
+    pool.max_idle = 0.01
+    conns = [pool.acquire() for _ in range(3)]
+    for conn in conns:
+        pool.release(conn)
+    time.sleep(0.02)
+
+    assert pool.recycle_idle() == 2
+    assert pool.stats()["size"] == 1
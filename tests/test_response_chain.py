@@ -0,0 +1,82 @@
+import httpx
+from openai import NotFoundError
+
+import agent as agent_module
+from chat_store import TieredChatStore
+from fakes import FakeResponses, function_call, message
+
+
+def chained_agent(*outputs):
+    bot = agent_module.Agent(api_key="test", chain_responses=True, turn_timeout=0)
+    bot.chat_memory = agent_module.ChatMemory(prompt="sys", store=TieredChatStore())
+    bot._ai_client = FakeResponses(*outputs)
+    return bot
+
+
+def expired_response():
+    request = httpx.Request("POST", "https://api.openai.com/v1/responses")
+    return NotFoundError(
+        "Previous response not found",
+        response=httpx.Response(404, request=request),
+        body=None,
+    )
+
+
+def test_next_turn_sends_only_the_new_message():
+    bot = chained_agent([message("a1")], [message("a2")])
+
+    bot.process_msg("q1", 1)
+    bot.process_msg("q2", 1)
+
+    first, second = bot._ai_client.requests
+    assert "previous_response_id" not in first
+    assert [msg["content"] for msg in first["input"]] == ["sys", "q1"]
+    assert second["previous_response_id"] == "resp_1"
+    assert second["input"] == [{"role": "user", "content": "q2"}]
+    assert second["store"] is True
+
+    savings = bot.input_savings()
+    assert (savings["chained"], savings["items_sent"], savings["items_full"]) == (1, 3, 6)
+    assert savings["bytes_saved"] > 0
+
+
+def test_tool_round_trip_sends_only_tool_outputs():
+    bot = chained_agent(
+        [function_call("lookup", {"city": "Lima"}, "c1")],
+        [message("sunny")],
+    )
+
+    assert bot.process_msg("q1", 1, rag_functions={"lookup": lambda city: "22C"}) == "sunny"
+
+    follow_up = bot._ai_client.requests[1]
+    assert follow_up["previous_response_id"] == "resp_1"
+    assert [(item["call_id"], item["output"]) for item in follow_up["input"]] == [
+        ("c1", "22C")
+    ]
+
+
+def test_expired_previous_response_replays_the_full_history():
+    bot = chained_agent([message("a1")], expired_response(), [message("a2")])
+
+    bot.process_msg("q1", 1)
+    assert bot.process_msg("q2", 1) == "a2"
+
+    chained, replay = bot._ai_client.requests[1:]
+    assert chained["previous_response_id"] == "resp_1"
+    assert "previous_response_id" not in replay
+    assert [msg["content"] for msg in replay["input"]] == ["sys", "q1", "a1", "q2"]
+    assert bot.input_savings()["fallbacks"] == 1
+
+
+def test_rewritten_history_breaks_the_chain():
+    bot = chained_agent([message("a1")], [message("a2")])
+    bot.process_msg("q1", 1)
+    assert bot.chat_memory.get_chain(1) == ("resp_1", 3)
+
+    bot.chat_memory.set_messages([{"role": "developer", "content": "sys"}], 1)
+    assert bot.chat_memory.get_chain(1) is None
+
+    bot.process_msg("q2", 1)
+    replay = bot._ai_client.requests[1]
+    assert "previous_response_id" not in replay
+    assert [msg["content"] for msg in replay["input"]] == ["sys", "q2"]
@@ -0,0 +1,93 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+from enum import Enum
+
+import pytest
+
+from tools import serialization
+from tools.serialization import dumps, register_adapter, to_text
+
+
+class Status(Enum):
+    ACTIVE = "active"
+
+
+ROW = {
+    "amount": Decimal("12345678901234567890.12"),
+    "created": datetime.datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+    "day": datetime.date(2024, 1, 2),
+    "at": datetime.time(8, 30),
+    "elapsed": datetime.timedelta(hours=1, seconds=5),
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "blob": memoryview(b"\x00\xff"),
+    "status": Status.ACTIVE,
+    "tags": frozenset(["vip"]),
+    "name": "Muñoz",
+}
+
+EXPECTED = {
+    "amount": "12345678901234567890.12",
+    "created": "2024-01-02T03:04:05.123456+00:00",
+    "day": "2024-01-02",
+    "at": "08:30:00",
+    "elapsed": "1:00:05",
+    "id": "12345678-1234-5678-1234-567812345678",
+    "blob": "AP8=",
+    "status": "active",
+    "tags": ["vip"],
+    "name": "Muñoz",
+}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_database_types_serialize_the_same_with_both_backends(backend):
+    text = dumps(ROW)
+
+    assert json.loads(text) == EXPECTED
+    assert "Muñoz" in text  # UTF-8, not \u escapes
+    assert ", " not in text  # compact separators
+
+
+def test_adapters_apply_to_subclasses(backend):
+    class Money(Decimal):
+        pass
+
+    assert json.loads(dumps([Money("0.10")])) == ["0.10"]
+
+
+def test_registered_adapter_is_used(backend, monkeypatch):
+    class Point:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    # setitem first so monkeypatch removes the adapter after the test
+    monkeypatch.setitem(serialization._ADAPTERS, Point, None)
+    register_adapter(Point, lambda p: [p.x, p.y])
+
+    assert dumps({"p": Point(1, 2)}) == '{"p":[1,2]}'
+
+
+def test_integers_over_64_bits_are_kept(backend):
+    assert dumps({"n": 2**70}) == '{"n":1180591620717411303424}'
+
+
+def test_unknown_types_fail_in_dumps_but_not_in_to_text(backend):
+    class Opaque:
+        def __str__(self):
+            return "<opaque>"
+
+    with pytest.raises(TypeError):
+        dumps({"value": Opaque()})
+    assert to_text(Opaque()) == "<opaque>"
+    assert to_text("already text") == "already text"
+    assert to_text({1: Decimal("1.5")}) == '{"1":"1.5"}'
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from tools import pg_tool
+from tools.sql_guard import ensure_limit, timeout_rejection
+
+
+@pytest.mark.parametrize(
+    "sql, limited",
+    [
+        ("SELECT * FROM t;", "SELECT * FROM t\nLIMIT 101"),
+        ("SELECT * FROM t -- every row", "SELECT * FROM t\nLIMIT 101"),
+        ("SELECT 'limit' FROM t", "SELECT 'limit' FROM t\nLIMIT 101"),
+        (
+            "SELECT * FROM (SELECT * FROM t LIMIT 5) x",
+            "SELECT * FROM (SELECT * FROM t LIMIT 5) x\nLIMIT 101",
+        ),
+        ("SELECT * FROM t LIMIT 5", "SELECT * FROM t LIMIT 5"),
+        ("SELECT * FROM t OFFSET 10", "SELECT * FROM t OFFSET 10"),
+        ("SELECT * FROM t FOR UPDATE", "SELECT * FROM t FOR UPDATE"),
+        ("SELECT 1; SELECT 2", "SELECT 1; SELECT 2"),
+    ],
+)
+def test_postgres_limit_is_added_only_when_safe(sql, limited):
+    assert ensure_limit(sql, 101, "postgres") == limited
+
+
+@pytest.mark.parametrize(
+    "sql, limited",
+    [
+        ("SELECT a FROM t", "SELECT TOP (101) a FROM t"),
+        ("SELECT DISTINCT a FROM t", "SELECT DISTINCT TOP (101) a FROM t"),
+        ("SELECT TOP 5 a FROM t", "SELECT TOP 5 a FROM t"),
+        ("SELECT a FROM t UNION SELECT b FROM u", "SELECT a FROM t UNION SELECT b FROM u"),
+        ("WITH c AS (SELECT 1 AS a) SELECT a FROM c", "WITH c AS (SELECT 1 AS a) SELECT a FROM c"),
+    ],
+)
+def test_sqlserver_top_is_added_only_when_safe(sql, limited):
+    assert ensure_limit(sql, 101, "sqlserver") == limited
+
+
+class PlanConnection:
+    """psycopg2-like connection whose EXPLAIN returns a fixed plan."""
+
+    def __init__(self, cost, rows):
+        self.plan = [{"Plan": {"Total Cost": cost, "Plan Rows": rows}}]
+        self.executed = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+    def fetchone(self):
+        return (json.dumps(self.plan),)
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    monkeypatch.setitem(pg_tool._guard, "max_cost", 1000.0)
+    monkeypatch.setitem(pg_tool._guard, "timeout", 2.5)
+    return pg_tool._guard
+
+
+def test_expensive_query_is_rejected_before_it_runs(guard):
+    conn = PlanConnection(cost=50_000, rows=2_000_000)
+
+    rejection = pg_tool._preflight(conn, "SELECT * FROM a, b")
+
+    assert rejection["error_type"] == "cost_limit"
+    assert rejection["estimated_rows"] == 2_000_000
+    assert conn.executed == [
+        "SET LOCAL statement_timeout = 2500",
+        "EXPLAIN (FORMAT JSON) SELECT * FROM a, b",
+    ]
+
+
+def test_cheap_query_passes_and_disabled_guard_skips_explain(guard):
+    assert pg_tool._preflight(PlanConnection(cost=10, rows=5), "SELECT 1") is None
+
+    guard["max_cost"] = 0
+    conn = PlanConnection(cost=50_000, rows=1)
+    assert pg_tool._preflight(conn, "SELECT 1") is None
+    assert not any(sql.startswith("EXPLAIN") for sql in conn.executed)
+
+
+def test_timeout_rejection_reports_the_limit():
+    rejection = timeout_rejection(2.5)
+    assert rejection["error_type"] == "timeout"
+    assert "2.5s" in rejection["message"]
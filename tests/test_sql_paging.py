@@ -0,0 +1,111 @@
+import time
+
+from tools.sql_paging import CursorSession, CursorSessions, page_response
+
+
+class FakeCursor:
+    """DB-API cursor over a fixed list of rows that logs each fetchmany size."""
+
+    description = [("id",), ("name",)]
+
+    def __init__(self, n_rows, fail_close=False):
+        self.rows = [(i, f"name_{i}") for i in range(n_rows)]
+        self.fetch_sizes = []
+        self.fail_close = fail_close
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        if self.fail_close:
+            raise RuntimeError("connection lost")
+
+
+class Releases(list):
+    """Stands in for pool.release: records (conn, discard)."""
+
+    def __call__(self, conn, discard=False):
+        self.append((conn, discard))
+
+
+def session_over(n_rows, max_rows=1000, **cursor_options):
+    releases = Releases()
+    cursor = FakeCursor(n_rows, **cursor_options)
+    return CursorSession("conn", cursor, releases, max_rows), cursor, releases
+
+
+def test_pages_are_fetched_with_one_row_of_lookahead():
+    session, cursor, _ = session_over(7)
+
+    pages = [session.fetch_page(3) for _ in range(3)]
+
+    assert [(len(rows), more, cut) for rows, more, cut in pages] == [
+        (3, True, False),
+        (3, True, False),
+        (1, False, False),
+    ]
+    assert [row[0] for rows, _, _ in pages for row in rows] == list(range(7))
+    assert max(cursor.fetch_sizes) == 4
+    assert session.columns == ["id", "name"]
+
+
+def test_exact_multiple_of_page_size_has_no_empty_last_page():
+    session, _, _ = session_over(6)
+
+    assert session.fetch_page(3)[1] is True
+    rows, has_more, _ = session.fetch_page(3)
+    assert len(rows) == 3 and not has_more
+
+
+def test_max_rows_truncates_instead_of_offering_another_page():
+    session, _, _ = session_over(10, max_rows=5)
+
+    assert session.fetch_page(3)[1:] == (True, False)
+    rows, has_more, truncated = session.fetch_page(3)
+    assert (len(rows), has_more, truncated) == (2, False, True)
+
+
+def test_closing_returns_the_connection_and_discards_it_if_the_cursor_fails():
+    session, _, releases = session_over(1)
+    session.close()
+    broken, _, broken_releases = session_over(1, fail_close=True)
+    broken.close()
+
+    assert releases == [("conn", False)]
+    assert broken_releases == [("conn", True)]
+
+
+def test_oldest_session_is_closed_over_max_sessions():
+    sessions = CursorSessions(max_sessions=2)
+    opened = [session_over(5) for _ in range(3)]
+    tokens = [sessions.add(session) for session, _, _ in opened]
+
+    assert opened[0][2] == [("conn", False)]
+    assert sessions.take(tokens[0]) is None
+    assert sessions.take(tokens[2]) is opened[2][0]
+    assert sessions.take(tokens[2]) is None  # taken sessions are exclusive
+
+
+def test_idle_sessions_expire():
+    sessions = CursorSessions(ttl=0.01)
+    session, _, releases = session_over(5)
+    token = sessions.add(session)
+    time.sleep(0.02)
+
+    assert sessions.purge_expired() == 1
+    assert releases == [("conn", False)]
+    assert sessions.take(token) is None
+
+
+def test_page_response_points_to_the_next_page_or_the_truncation():
+    session, _, _ = session_over(0)
+    session.columns = ["id"]
+
+    more = page_response(session, [(1,)], "tok", False, 100)
+    cut = page_response(session, [(1,)], None, True, 100)
+
+    assert more["next_page_token"] == "tok" and "page_token" in more["message"]
+    assert cut["truncated"] is True and cut["next_page_token"] is None
+    assert more["row_count"] == cut["row_count"] == 1
@@ -0,0 +1,72 @@
+from tools.sql_validation import SqlReferences, find_issues
+
+TABLES = {
+    "res_partner": ["id", "name", "active"],
+    "res_users": ["id", "partner_id", "login"],
+}
+
+
+class FakeCatalog:
+    def tables(self, source):
+        return [{"table_name": name} for name in TABLES]
+
+    def get_table(self, source, name):
+        name = name.split(".")[-1]
+        if name not in TABLES:
+            return None
+        return {"table_name": name, "columns": [{"name": c} for c in TABLES[name]]}
+
+
+def issues(sql):
+    return [(issue["type"], issue["name"]) for issue in find_issues(sql, "postgres", FakeCatalog())]
+
+
+def test_distinct_from_is_not_a_from_clause():
+    sql = "SELECT p.name FROM res_partner p WHERE p.active IS DISTINCT FROM false"
+    assert SqlReferences(sql).tables == ["res_partner"]
+    assert issues(sql) == []
+    assert issues("SELECT p.name FROM res_partner p WHERE p.active IS NOT DISTINCT FROM true") == []
+
+
+def test_subquery_alias_shadows_outer_alias():
+    sql = (
+        "SELECT p.name FROM res_partner p "
+        "WHERE p.id IN (SELECT p.partner_id FROM res_users p)"
+    )
+    assert issues(sql) == []
+
+
+def test_subquery_alias_is_checked_against_its_own_table():
+    sql = (
+        "SELECT p.nam FROM res_partner p "
+        "WHERE p.id IN (SELECT p.partner_i FROM res_users p)"
+    )
+    assert issues(sql) == [("unknown_column", "p.nam"), ("unknown_column", "p.partner_i")]
+
+
+def test_correlated_subquery_sees_outer_alias():
+    sql = (
+        "SELECT p.name FROM res_partner p "
+        "WHERE EXISTS (SELECT 1 FROM res_users u WHERE u.partner_id = p.id AND p.nope = 1)"
+    )
+    assert issues(sql) == [("unknown_column", "p.nope")]
+
+
+def test_ambiguous_alias_is_not_rejected():
+    sql = "SELECT x.login FROM res_partner x JOIN res_users x ON x.id = x.id"
+    assert SqlReferences(sql).columns[0] == ("x", "login", None)
+    assert issues(sql) == []
+
+
+def test_union_branches_have_their_own_aliases():
+    sql = "SELECT x.name FROM res_partner x UNION SELECT x.login FROM res_users x"
+    assert issues(sql) == []
+
+
+def test_derived_table_alias_is_not_checked():
+    sql = "SELECT d.n FROM (SELECT p.name AS n FROM res_partner p) d"
+    assert issues(sql) == []
+
+
+def test_unknown_table():
+    assert issues("SELECT * FROM res_partnr") == [("unknown_table", "res_partnr")]
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from tool_runtime import ToolExecutor, ToolTimeoutError
+
+
+@pytest.fixture
+def executor():
+    executor = ToolExecutor(
+        max_workers=2,
+        tool_settings={
+            "send_email": {"max_concurrency": 1, "timeout": 5},
+            "find_tables": {"idempotent": True, "timeout": 5},
+        },
+    )
+    yield executor
+    executor.shutdown(wait=False)
+
+
+def stalled(started, release, sent):
+    """Sync tool that only returns once `release` is set."""
+
+    def tool(to):
+        started.set()
+        release.wait(2)
+        sent.append(to)
+        return "sent"
+
+    return tool
+
+
+def test_running_side_effect_tool_may_still_complete(executor):
+    started, release, sent = threading.Event(), threading.Event(), []
+    future = executor.submit("send_email", stalled(started, release, sent), {"to": "a"})
+    assert started.wait(2)
+
+    with pytest.raises(ToolTimeoutError) as info:
+        executor.result("send_email", future, time.monotonic() + 0.05)
+    release.set()
+
+    assert info.value.may_complete
+    assert "Do not retry" in json.loads(info.value.to_output())["message"]
+    assert executor.stats()["send_email"]["timed_out"] == 1
+
+
+def test_queued_side_effect_call_never_runs_after_its_deadline(executor):
+    started, release, sent = threading.Event(), threading.Event(), []
+    tool = stalled(started, release, sent)
+    executor.submit("send_email", tool, {"to": "first"})
+    assert started.wait(2)
+
+    late = executor.submit("send_email", tool, {"to": "late"}, time.monotonic() + 0.05)
+    time.sleep(0.1)
+    release.set()
+
+    with pytest.raises(ToolTimeoutError) as info:
+        late.result(2)
+    assert not info.value.may_complete
+    assert sent == ["first"]
+
+
+def test_shared_call_is_not_abandoned_by_one_caller(executor):
+    started, release, sent = threading.Event(), threading.Event(), []
+    tool = stalled(started, release, sent)
+    future = executor.submit("find_tables", tool, {"to": "orders"})
+    assert started.wait(2)
+
+    with pytest.raises(ToolTimeoutError) as info:
+        executor.result("find_tables", future, time.monotonic() + 0.05)
+    assert not info.value.may_complete
+
+    release.set()
+    assert executor.submit("find_tables", tool, {"to": "orders"}).result(2) == "sent"
+
+
+def test_coroutine_tool_is_cancelled_at_its_deadline(executor):
+    cancelled = []
+
+    async def slow_lookup():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        with pytest.raises(ToolTimeoutError) as info:
+            await executor.run("lookup", slow_lookup, {}, time.monotonic() + 0.05)
+        return info.value
+
+    error = asyncio.run(main())
+    assert not error.may_complete
+    assert cancelled == [True]
+
+
+def test_deadline_comes_from_the_tool_timeout_capped_by_the_turn(executor):
+    now = time.monotonic()
+    assert executor.deadline_for("send_email") - now == pytest.approx(5, abs=1)
+    assert executor.deadline_for("send_email", now + 1) == now + 1
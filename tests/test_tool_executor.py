@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+from tool_runtime import ToolExecutor
+
+
+def first_page(kwargs):
+    return not kwargs.get("page_token")
+
+
+@pytest.fixture
+def executor():
+    executor = ToolExecutor(
+        max_workers=4,
+        tool_settings={
+            "query": {"idempotent": True, "idempotent_if": first_page},
+            "email": {},
+        },
+    )
+    yield executor
+    executor.shutdown()
+
+
+class BlockingTool:
+    """Sync tool that records its calls and waits until released."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        self.release.wait(2)
+        return f"rows:{len(self.calls)}"
+
+
+def test_identical_idempotent_calls_share_one_execution(executor):
+    tool = BlockingTool()
+    first = executor.submit("query", tool, {"input_query": "SELECT 1"})
+    second = executor.submit("query", tool, {"input_query": "SELECT 1"})
+    tool.release.set()
+
+    assert first is second
+    assert first.result(2) == "rows:1"
+    assert len(tool.calls) == 1
+    assert executor.stats()["query"]["shared"] == 1
+
+
+def test_page_token_calls_are_never_shared(executor):
+    tool = BlockingTool()
+    kwargs = {"page_token": "t1"}
+    first = executor.submit("query", tool, kwargs)
+    second = executor.submit("query", tool, dict(kwargs))
+    tool.release.set()
+
+    assert first is not second
+    for future in (first, second):
+        future.result(2)
+    assert len(tool.calls) == 2
+
+
+def test_non_idempotent_calls_are_never_shared(executor):
+    tool = BlockingTool()
+    futures = [executor.submit("email", tool, {"to": "a@b.c"}) for _ in range(2)]
+    tool.release.set()
+
+    assert futures[0] is not futures[1]
+    for future in futures:
+        future.result(2)
+    assert len(tool.calls) == 2
+
+
+def test_async_single_flight_respects_idempotent_if(executor):
+    calls = []
+
+    async def query(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.05)
+        return "rows"
+
+    async def main():
+        shared = [
+            executor.run("query", query, {"input_query": "SELECT 1"}) for _ in range(3)
+        ]
+        paged = [executor.run("query", query, {"page_token": "t1"}) for _ in range(2)]
+        return await asyncio.gather(*shared, *paged)
+
+    assert asyncio.run(main()) == ["rows"] * 5
+    assert calls.count({"input_query": "SELECT 1"}) == 1
+    assert calls.count({"page_token": "t1"}) == 2
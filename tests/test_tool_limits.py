@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+from tool_runtime import ToolExecutor
+
+
+class ConcurrencyProbe:
+    """Tool that tracks how many of its calls run at once, per file."""
+
+    def __init__(self, hold=0.05):
+        self.hold = hold
+        self.active = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+
+    def _enter(self, path):
+        with self.lock:
+            self.active[path] = self.active.get(path, 0) + 1
+            total = sum(self.active.values())
+            self.peak[path] = max(self.peak.get(path, 0), self.active[path])
+            self.peak["*"] = max(self.peak.get("*", 0), total)
+
+    def _leave(self, path):
+        with self.lock:
+            self.active[path] -= 1
+
+    def __call__(self, path="report.xlsx"):
+        self._enter(path)
+        time.sleep(self.hold)
+        self._leave(path)
+        return path
+
+    async def coroutine(self, path="report.xlsx"):
+        self._enter(path)
+        await asyncio.sleep(self.hold)
+        self._leave(path)
+        return path
+
+
+def test_max_concurrency_caps_sync_calls_across_callers():
+    executor = ToolExecutor(max_workers=8, tool_settings={"xlsx": {"max_concurrency": 2}})
+    probe = ConcurrencyProbe()
+    try:
+        futures = [executor.submit("xlsx", probe, {}) for _ in range(6)]
+        assert [future.result(5) for future in futures] == ["report.xlsx"] * 6
+        assert probe.peak["*"] == 2
+        assert executor._gates == {}  # limit state is dropped once idle
+    finally:
+        executor.shutdown()
+
+
+def test_concurrency_key_limits_each_file_separately():
+    executor = ToolExecutor(
+        max_workers=8,
+        tool_settings={"xlsx": {"max_concurrency": 1, "concurrency_key": "path"}},
+    )
+    probe = ConcurrencyProbe()
+    try:
+        paths = ["a.xlsx", "b.xlsx"] * 3
+        futures = [executor.submit("xlsx", probe, {"path": path}) for path in paths]
+        assert [future.result(5) for future in futures] == paths
+        assert probe.peak["a.xlsx"] == probe.peak["b.xlsx"] == 1
+        assert probe.peak["*"] == 2
+    finally:
+        executor.shutdown()
+
+
+def test_waiting_calls_do_not_hold_pool_workers():
+    executor = ToolExecutor(max_workers=2, tool_settings={"xlsx": {"max_concurrency": 1}})
+    probe = ConcurrencyProbe(hold=0.5)
+    try:
+        queued = [executor.submit("xlsx", probe, {}) for _ in range(4)]
+        start = time.monotonic()
+        assert executor.submit("clock", lambda: "now", {}).result(5) == "now"
+        # One xlsx call runs and the rest wait outside the pool, so the
+        # second worker is free for other tools
+        assert time.monotonic() - start < 0.4
+        for future in queued:
+            future.result(5)
+        assert executor.stats()["xlsx"]["max_queue_depth"] >= 3
+    finally:
+        executor.shutdown()
+
+
+def test_max_concurrency_applies_to_coroutine_tools():
+    executor = ToolExecutor(
+        max_workers=1,
+        tool_settings={"xlsx": {"max_concurrency": 1, "concurrency_key": "path"}},
+    )
+    probe = ConcurrencyProbe()
+
+    async def main():
+        paths = ["a.xlsx", "a.xlsx", "b.xlsx"]
+        return await asyncio.gather(
+            *(executor.run("xlsx", probe.coroutine, {"path": path}) for path in paths)
+        )
+
+    try:
+        assert asyncio.run(main()) == ["a.xlsx", "a.xlsx", "b.xlsx"]
+        assert probe.peak["a.xlsx"] == 1
+        assert probe.peak["*"] == 2
+    finally:
+        executor.shutdown()
@@ -0,0 +1,92 @@
+import json
+import re
+
+from tool_runtime import ToolExecutor, truncate_output
+from tools.tool_output import ToolOutputStore, read_tool_output
+
+
+def rows(n):
+    return "\n".join(f"{i},customer_{i},{i * 10}" for i in range(n))
+
+
+def handle_of(output):
+    return re.search(r'handle="([^"]+)"', output).group(1)
+
+
+def test_small_outputs_pass_through_untouched():
+    executor = ToolExecutor(max_workers=1, tool_settings={"query": {"max_output_bytes": 1000}})
+    try:
+        assert json.loads(executor.limit_output("query", {"rows": 3})) == {"rows": 3}
+        assert executor.limit_output("query", "ok") == "ok"
+    finally:
+        executor.shutdown()
+
+
+def test_oversized_output_keeps_head_and_tail_and_stores_the_rest():
+    executor = ToolExecutor(
+        max_workers=1,
+        tool_settings={"query": {"max_output_bytes": 3000, "max_output_tokens": 0}},
+    )
+    executor.submit("query", rows, {"n": 1}).result(2)  # registers stats for "query"
+    text = rows(2000)
+    try:
+        output = executor.limit_output("query", text)
+    finally:
+        executor.shutdown()
+
+    assert output.startswith(text[:2000])
+    assert output.endswith(text[-1000:])
+    assert "output truncated" in output
+    assert executor.stats()["query"]["truncated"] == 1
+
+    page = json.loads(read_tool_output(handle_of(output), offset=2000, length=50))
+    assert page["content"] == text[2000:2050]
+    assert page["total_length"] == len(text)
+
+
+def test_token_limit_applies_when_bytes_are_unlimited():
+    executor = ToolExecutor(
+        max_workers=1,
+        tool_settings={"query": {"max_output_tokens": 200, "max_output_bytes": 0}},
+    )
+    text = rows(2000)
+    try:
+        output = executor.limit_output("query", text)
+    finally:
+        executor.shutdown()
+
+    assert len(output) < len(text) // 10
+    assert "read_tool_output" in output
+
+
+def test_byte_limit_counts_multibyte_characters():
+    executor = ToolExecutor(
+        max_workers=1,
+        tool_settings={"notes": {"max_output_bytes": 300, "max_output_tokens": 0}},
+    )
+    text = "año ñandú " * 200
+    try:
+        output = executor.limit_output("notes", text)
+    finally:
+        executor.shutdown()
+
+    kept = output.split("\n\n[...")[0] + output.split("...]\n\n")[1]
+    assert len(kept.encode("utf-8")) <= 300
+
+
+def test_output_too_large_for_the_store_asks_for_a_narrower_request():
+    store = ToolOutputStore(max_bytes=100)
+    assert store.put("x" * 101) is None
+
+    output = truncate_output("x" * 300, 30, None)
+    assert "Narrow the request" in output
+    assert output.startswith("x" * 20) and output.endswith("x" * 10)
+
+
+def test_store_evicts_least_recently_used_outputs():
+    store = ToolOutputStore(max_bytes=10)
+    first = store.put("aaaaaa")
+    second = store.put("bbbbbb")
+
+    assert store.get(first) is None
+    assert store.get(second) == "bbbbbb"
@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+import pytest
+
+from tool_runtime import BaseToolRunner, ToolExecutor
+
+
+class RecordingRunner(BaseToolRunner):
+    """Tool calls are (name, kwargs) tuples; outputs are appended to a list."""
+
+    def _prepare_call(self, tool, rag_functions):
+        name, kwargs = tool
+        return name, rag_functions[name], kwargs
+
+    def _set_tool_output(self, chat_memory, tool, output, user_id):
+        chat_memory.append((tool[0], output))
+
+
+def counting():
+    calls = []
+
+    def tool(**kwargs):
+        calls.append(kwargs)
+        return f"out:{kwargs.get('q')}"
+
+    tool.calls = calls
+    return tool
+
+
+def run(runner, tools_called, functions, use_async=False):
+    outputs = []
+    if use_async:
+        asyncio.run(runner._async_run_tools(tools_called, 1, outputs, functions))
+    else:
+        runner._run_tools(tools_called, 1, outputs, functions)
+    return [output for _, output in outputs]
+
+
+def test_identical_calls_in_one_response_run_once():
+    tool = counting()
+    runner = RecordingRunner()
+    calls = [
+        ("runner_dup", {"q": "a"}),
+        ("runner_dup", {"q": "a"}),
+        ("runner_dup", {"q": "b"}),
+    ]
+
+    assert run(runner, calls, {"runner_dup": tool}) == ["out:a", "out:a", "out:b"]
+    assert tool.calls == [{"q": "a"}, {"q": "b"}]
+
+
+def test_memoized_output_is_reused_across_responses():
+    tool = counting()
+    runner = RecordingRunner(
+        tool_settings={"runner_memo": {"idempotent": True, "cache_ttl": 60}}
+    )
+
+    calls = [("runner_memo", {"q": "a"})]
+    for use_async in (False, True):
+        assert run(runner, calls, {"runner_memo": tool}, use_async) == ["out:a"]
+    assert tool.calls == [{"q": "a"}]
+
+
+def test_tool_errors_become_the_error_message():
+    def broken(q):
+        raise RuntimeError("boom")
+
+    runner = RecordingRunner(error_msg="failed")
+    calls = [("runner_broken", {"q": "a"})]
+    assert run(runner, calls, {"runner_broken": broken}) == ["failed"]
+    assert run(runner, calls, {"runner_broken": broken}, use_async=True) == ["failed"]
+
+
+def test_outputs_keep_call_order_when_calls_finish_out_of_order():
+    async def slow(q):
+        await asyncio.sleep(0.05)
+        return "slow"
+
+    def fast(q):
+        return "fast"
+
+    runner = RecordingRunner()
+    calls = [("runner_slow", {"q": 1}), ("runner_fast", {"q": 2})]
+    functions = {"runner_slow": slow, "runner_fast": fast}
+    assert run(runner, calls, functions, use_async=True) == ["slow", "fast"]
+
+
+def first_page(kwargs):
+    return not kwargs.get("page_token")
+
+
+def test_page_token_calls_are_not_deduplicated_or_cached():
+    tool = counting()
+    settings = {"idempotent": True, "idempotent_if": first_page, "cache_ttl": 60}
+    runner = RecordingRunner(tool_settings={"runner_paged": settings})
+    page = ("runner_paged", {"q": "p", "page_token": "t1"})
+    first = ("runner_paged", {"q": "f"})
+
+    for use_async in (False, True):
+        assert run(runner, [page, page, first], {"runner_paged": tool}, use_async) == [
+            "out:p",
+            "out:p",
+            "out:f",
+        ]
+
+    assert tool.calls.count(page[1]) == 4
+    assert tool.calls.count(first[1]) == 1  # served from cache the second time
+
+
+def batched(outputs=None):
+    """Tool with a `batch` entry point; `outputs` overrides what the batch returns."""
+    invocations = []
+
+    def lookup(city):
+        return f"sunny:{city}"
+
+    def lookup_batch(calls):
+        invocations.append([kwargs["city"] for kwargs in calls])
+        if isinstance(outputs, Exception):
+            raise outputs
+        return outputs if outputs is not None else [lookup(**kwargs) for kwargs in calls]
+
+    lookup.batch = lookup_batch
+    lookup.invocations = invocations
+    return lookup
+
+
+def test_parallel_calls_to_a_batch_tool_are_folded():
+    tool = batched()
+    runner = RecordingRunner()
+    calls = [
+        ("runner_weather", {"city": "Lima"}),
+        ("runner_weather", {"city": "Quito"}),
+        ("runner_weather", {"city": "Lima"}),
+        ("runner_weather", {"city": "Cusco"}),
+    ]
+
+    assert run(runner, calls, {"runner_weather": tool}) == [
+        "sunny:Lima",
+        "sunny:Quito",
+        "sunny:Lima",
+        "sunny:Cusco",
+    ]
+    assert tool.invocations == [["Lima", "Quito", "Cusco"]]
+
+
+def test_single_call_skips_the_batch_entry_point():
+    tool = batched()
+    runner = RecordingRunner()
+    calls = [("runner_weather_one", {"city": "Lima"})]
+
+    assert run(runner, calls, {"runner_weather_one": tool}, use_async=True) == [
+        "sunny:Lima"
+    ]
+    assert tool.invocations == []
+
+
+def test_batch_errors_are_reported_for_every_call():
+    calls = [
+        ("runner_weather_bad", {"city": "Lima"}),
+        ("runner_weather_bad", {"city": "Quito"}),
+    ]
+    runner = RecordingRunner(error_msg="failed")
+
+    for outputs in (["only one"], "not a list", RuntimeError("down")):
+        functions = {"runner_weather_bad": batched(outputs)}
+        for use_async in (False, True):
+            assert run(runner, calls, functions, use_async) == ["failed", "failed"]
+
+
+def test_batch_deadline_scales_with_the_number_of_calls():
+    executor = ToolExecutor(max_workers=1, tool_settings={"lookup": {"timeout": 10}})
+    try:
+        now = time.monotonic()
+        assert executor.deadline_for("lookup", calls=3) - now == pytest.approx(30, abs=1)
+        # The turn deadline still caps the whole batch
+        assert executor.deadline_for("lookup", now + 5, calls=3) == now + 5
+    finally:
+        executor.shutdown()
@@ -0,0 +1,752 @@
+"""
+Tool Runtime Module
+Runs agent tools on a long-lived, shared executor with per-tool concurrency,
+time and output size limits.
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+from context_window import count_tokens
+from tools.serialization import to_text
+from tools.tool_cache import tool_cache
+from tools.tool_output import get_output_store
+
+_TRUNCATION_NOTE = (
+    "\n\n[... output truncated: {omitted} of {total} characters omitted. "
+    'Read the full output with read_tool_output(handle="{handle}", offset={offset}) ...]\n\n'
+)
+_NOTE_NO_HANDLE = (
+    "\n\n[... output truncated: {omitted} of {total} characters omitted. "
+    "Narrow the request to get a smaller result ...]\n\n"
+)
+
+
+def call_key(name: str, kwargs: dict) -> str:
+    """Identity of a tool call: tool name plus its arguments in canonical JSON."""
+    return f"{name}:{json.dumps(kwargs, sort_keys=True, separators=(',', ':'), default=str)}"
+
+
+def truncate_output(text: str, max_chars: int, handle: Optional[str]) -> str:
+    """
+    Keeps the head (2/3) and tail (1/3) of `text` within `max_chars` and puts
+    a note between them saying how much was cut and where to read it.
+    """
+    head_chars = max_chars * 2 // 3
+    tail_chars = max_chars - head_chars
+    omitted = len(text) - head_chars - tail_chars
+    template = _TRUNCATION_NOTE if handle else _NOTE_NO_HANDLE
+    note = template.format(
+        omitted=omitted, total=len(text), handle=handle, offset=head_chars
+    )
+    tail = text[len(text) - tail_chars :] if tail_chars else ""
+    return text[:head_chars] + note + tail
+
+
+class ToolTimeoutError(TimeoutError):
+    """
+    A tool call did not finish before its deadline. `may_complete` is set when
+    a tool with side effects was already running: it cannot be stopped, so
+    it may still complete and must not be retried.
+    """
+
+    def __init__(self, name: str, may_complete: bool = False):
+        super().__init__(f"{name} did not finish before its deadline")
+        self.name = name
+        self.may_complete = may_complete
+
+    def to_output(self) -> str:
+        """Error returned to the model in place of the tool output."""
+        if self.may_complete:
+            message = (
+                f"The tool {self.name} did not finish in time but may still complete. "
+                "Do not retry it; tell the user its outcome is unknown."
+            )
+        else:
+            message = (
+                f"The tool {self.name} did not finish in time. "
+                "Retry with a narrower request or answer without this result."
+            )
+        return to_text({"status": "error", "error_type": "timeout", "message": message})
+
+
+class _Gate:
+    """Sync calls running and waiting under one `max_concurrency` limit."""
+
+    __slots__ = ("running", "waiting")
+
+    def __init__(self):
+        self.running = 0
+        self.waiting: deque = deque()
+
+
+class ToolExecutor:
+    """
+    Shared executor for tool calls.
+
+    Sync tools run on one bounded thread pool that lives as long as the
+    process; coroutine tools are awaited on the caller's loop. Tools declared
+    with `max_concurrency` in the tool settings never run more than that many
+    calls at once across all users; with `concurrency_key` the limit applies
+    per value of that argument (e.g. one `manipulate_xlsx` per file). A sync
+    call over its limit waits outside the pool, so it never holds a worker
+    while it waits, and limit state is dropped once a key has no calls left.
+
+    Outputs over `max_output_tokens` / `max_output_bytes` (per tool, or
+    TOOL_MAX_OUTPUT_TOKENS / TOOL_MAX_OUTPUT_BYTES by default; 0 disables the
+    limit) are cut by `limit_output` before they reach the model.
+
+    Each call gets a deadline from the tool's `timeout` (TOOL_TIMEOUT seconds
+    by default, 0 = none), capped by the deadline of the user turn. Coroutine
+    tools are cancelled when it passes; a sync tool already running on the
+    thread pool cannot be interrupted, so it is abandoned and its result is
+    discarded. Either way the caller gets a ToolTimeoutError. A sync call of
+    a non-idempotent tool whose deadline passes before it gets a slot is
+    never run.
+
+    Tools marked `idempotent` are single-flight: a call identical (same
+    `call_key`) to one still running joins it instead of running again, so
+    concurrent users share one execution and its result. A shared call is
+    only cancelled when every caller has given up on it. `idempotent_if`
+    (kwargs -> bool) excludes calls that change state, such as reading the
+    next page of a cursor: those always run on their own.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, tool_settings: Optional[dict] = None):
+        self.max_workers = max_workers or int(os.getenv("TOOL_MAX_WORKERS") or 16)
+        self.max_output_tokens = int(os.getenv("TOOL_MAX_OUTPUT_TOKENS") or 4000)
+        self.max_output_bytes = int(os.getenv("TOOL_MAX_OUTPUT_BYTES") or 0)
+        self.default_timeout = float(os.getenv("TOOL_TIMEOUT") or 60)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="tool"
+        )
+        self._settings: dict[str, dict] = {}
+        self._gates: dict[tuple, _Gate] = {}
+        self._async_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._stats: dict[str, dict] = {}
+        self._flights: dict[str, Future] = {}
+        self._shared_calls: weakref.WeakSet = weakref.WeakSet()
+        self._async_flights: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.configure(tool_settings or {})
+
+    def configure(self, tool_settings: dict) -> None:
+        """Register (or update) per-tool settings such as `max_concurrency`."""
+        with self._lock:
+            for name, settings in tool_settings.items():
+                self._settings[name] = dict(settings)
+
+    def get_settings(self, name: str) -> dict:
+        return self._settings.get(name, {})
+
+    def deadline_for(
+        self, name: str, turn_deadline: Optional[float] = None, calls: int = 1
+    ) -> Optional[float]:
+        """
+        Deadline (time.monotonic()) of a call to `name` starting now; a batch
+        of `calls` runs them one after another, so it gets a timeout per call.
+        """
+        timeout = self._settings.get(name, {}).get("timeout", self.default_timeout)
+        deadline = time.monotonic() + timeout * calls if timeout else None
+        if turn_deadline is not None:
+            deadline = turn_deadline if deadline is None else min(deadline, turn_deadline)
+        return deadline
+
+    def is_idempotent(self, name: str, kwargs: dict) -> bool:
+        """Whether this call may be shared with identical calls or served from cache."""
+        settings = self._settings.get(name, {})
+        if not settings.get("idempotent"):
+            return False
+        idempotent_if = settings.get("idempotent_if")
+        return idempotent_if is None or bool(idempotent_if(kwargs))
+
+    def submit(
+        self,
+        name: str,
+        function_to_call: Callable,
+        kwargs: dict,
+        deadline: Optional[float] = None,
+    ) -> Future:
+        """Submit a sync tool call to the shared thread pool."""
+        key = call_key(name, kwargs) if self.is_idempotent(name, kwargs) else None
+        limit_key = self._limit_key(name, kwargs)
+        with self._lock:
+            if key is not None and key in self._flights:
+                self._tool_stats(name)["shared"] += 1
+                return self._flights[key]
+
+            self._count_submit(name)
+            future = Future()
+            call = (
+                future, name, function_to_call, kwargs, time.monotonic(), deadline, limit_key
+            )
+            if limit_key is None or self._enter_gate(limit_key, call):
+                self._pool.submit(self._invoke, *call)
+            if key is not None:
+                self._flights[key] = future
+                self._shared_calls.add(future)
+
+        future.add_done_callback(
+            lambda f: self._on_call_done(name, key, f)
+        )
+        return future
+
+    def result(self, name: str, future: Future, deadline: Optional[float] = None):
+        """Wait for a call made with `submit`, at most until `deadline`."""
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            if future.done():  # the tool itself raised TimeoutError
+                raise
+            self._on_timeout(name)
+            raise self._timeout_error(name, future) from None
+
+    async def run(
+        self,
+        name: str,
+        function_to_call: Callable,
+        kwargs: dict,
+        deadline: Optional[float] = None,
+    ):
+        """Run a tool call from async code without blocking the event loop."""
+        future = None
+        if inspect.iscoroutinefunction(function_to_call):
+            if self.is_idempotent(name, kwargs):
+                call = self._join_flight(name, function_to_call, kwargs)
+            else:
+                call = self._run_coroutine(name, function_to_call, kwargs)
+        else:
+            future = self.submit(name, function_to_call, kwargs, deadline)
+            call = self._wait(name, future)
+        if deadline is None:
+            return await call
+
+        try:
+            return await asyncio.wait_for(call, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            if time.monotonic() < deadline:  # the tool itself raised TimeoutError
+                raise
+            self._on_timeout(name)
+            if future is None:  # coroutine tools are cancelled
+                raise ToolTimeoutError(name) from None
+            raise self._timeout_error(name, future) from None
+
+    async def _wait(self, name: str, future: Future):
+        waiter = asyncio.wrap_future(future)
+        if future in self._shared_calls:
+            # Cancelling this caller must not cancel the shared call
+            waiter = asyncio.shield(waiter)
+        result = await waiter
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _timeout_error(self, name: str, future: Future) -> ToolTimeoutError:
+        """Give up on a sync call; it is cancelled only if it had not started."""
+        if future in self._shared_calls:  # other callers may share it
+            return ToolTimeoutError(name)
+        return ToolTimeoutError(name, may_complete=not future.cancel())
+
+    async def _join_flight(self, name: str, function_to_call: Callable, kwargs: dict):
+        key = call_key(name, kwargs)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._async_flights.setdefault(loop, {})
+            flight = flights.get(key)
+            if flight is None:
+                task = loop.create_task(
+                    self._run_coroutine(name, function_to_call, kwargs)
+                )
+                flight = flights[key] = [task, 0]
+                task.add_done_callback(lambda _: flights.pop(key, None))
+            else:
+                self._tool_stats(name)["shared"] += 1
+            flight[1] += 1
+
+        task = flight[0]
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                task.cancel()  # every caller gave up on it
+
+    async def _run_coroutine(self, name: str, function_to_call: Callable, kwargs: dict):
+        self._on_submit(name)
+        submitted = time.monotonic()
+        limit_key = self._limit_key(name, kwargs)
+        if limit_key is None:
+            self._on_start(name, submitted)
+            return await self._finish(name, function_to_call(**kwargs))
+
+        semaphores, entry = self._use_async_semaphore(limit_key, name)
+        started = False
+        try:
+            async with entry[0]:
+                started = True
+                self._on_start(name, submitted)
+                return await self._finish(name, function_to_call(**kwargs))
+        except asyncio.CancelledError:
+            if not started:  # cancelled while waiting for a free slot
+                self._on_cancelled(name)
+            raise
+        finally:
+            self._release_async_semaphore(semaphores, limit_key, entry)
+
+    def limit_output(self, name: str, output: Any) -> str:
+        """
+        Tool output as text, cut to the tool's size limit. The full output is
+        kept in the tool output store so the model can page through it with
+        read_tool_output.
+        """
+        text = to_text(output)
+        settings = self._settings.get(name, {})
+        max_tokens = settings.get("max_output_tokens", self.max_output_tokens)
+        max_bytes = settings.get("max_output_bytes", self.max_output_bytes)
+
+        max_chars = len(text)
+        if max_bytes:
+            size = len(text.encode("utf-8"))
+            if size > max_bytes:
+                max_chars = min(max_chars, len(text) * max_bytes // size)
+        if max_tokens and len(text) > max_tokens:  # a token is at least one character
+            tokens = count_tokens(text)
+            if tokens > max_tokens:
+                max_chars = min(max_chars, len(text) * max_tokens // tokens)
+        if max_chars >= len(text):
+            return text
+
+        with self._lock:
+            if name in self._stats:
+                self._stats[name]["truncated"] += 1
+        return truncate_output(text, max_chars, get_output_store().put(text))
+
+    def stats(self) -> dict:
+        """Per-tool queue, wait time, single-flight, timeout and truncation counters."""
+        with self._lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+        for values in stats.values():
+            values["avg_wait_time"] = (
+                values["wait_time"] / values["started"] if values["started"] else 0.0
+            )
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def _invoke(
+        self,
+        future: Future,
+        name: str,
+        function_to_call: Callable,
+        kwargs: dict,
+        submitted: float,
+        deadline: Optional[float],
+        limit_key: Optional[tuple],
+    ):
+        try:
+            if not future.set_running_or_notify_cancel():
+                return
+            if (
+                deadline is not None
+                and time.monotonic() >= deadline
+                and not self.is_idempotent(name, kwargs)
+            ):
+                # Its caller has given up: running it now would only add a
+                # side effect nobody is waiting for
+                self._on_cancelled(name)
+                result, error = None, ToolTimeoutError(name)
+            else:
+                self._on_start(name, submitted)
+                try:
+                    result, error = function_to_call(**kwargs), None
+                except BaseException as exc:
+                    result, error = None, exc
+                self._on_finish(name)
+        finally:
+            if limit_key is not None:
+                self._leave_gate(limit_key)
+
+        # The slot is free before callers see the result
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    async def _finish(self, name: str, coro):
+        try:
+            return await coro
+        finally:
+            self._on_finish(name)
+
+    def _limit_key(self, name: str, kwargs: dict) -> Optional[tuple]:
+        settings = self._settings.get(name)
+        if not settings or not settings.get("max_concurrency"):
+            return None
+
+        key_arg = settings.get("concurrency_key")
+        return (name, kwargs.get(key_arg) if key_arg else None)
+
+    def _enter_gate(self, limit_key: tuple, call: tuple) -> bool:
+        """Take a slot for `call`, or queue it until one is free (caller holds self._lock)."""
+        gate = self._gates.get(limit_key)
+        if gate is None:
+            gate = self._gates[limit_key] = _Gate()
+        if gate.running < self._settings[limit_key[0]]["max_concurrency"]:
+            gate.running += 1
+            return True
+        gate.waiting.append(call)
+        return False
+
+    def _leave_gate(self, limit_key: tuple) -> None:
+        """Hand the slot to the next waiting call, or free it."""
+        with self._lock:
+            gate = self._gates[limit_key]
+            while gate.waiting:
+                call = gate.waiting.popleft()
+                if not call[0].cancelled():
+                    self._pool.submit(self._invoke, *call)
+                    return
+            gate.running -= 1
+            if gate.running == 0:
+                del self._gates[limit_key]
+
+    def _use_async_semaphore(self, key: tuple, name: str) -> tuple[dict, list]:
+        """[semaphore, users] for `key` on the running loop, with one more user."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._async_semaphores.setdefault(loop, {})
+            entry = semaphores.get(key)
+            if entry is None:
+                entry = semaphores[key] = [
+                    asyncio.Semaphore(self._settings[name]["max_concurrency"]),
+                    0,
+                ]
+            entry[1] += 1
+        return semaphores, entry
+
+    def _release_async_semaphore(self, semaphores: dict, key: tuple, entry: list) -> None:
+        with self._lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del semaphores[key]
+
+    def _tool_stats(self, name: str) -> dict:
+        # Callers hold self._lock
+        return self._stats.setdefault(
+            name,
+            {
+                "submitted": 0,
+                "started": 0,
+                "queued": 0,
+                "running": 0,
+                "max_queue_depth": 0,
+                "wait_time": 0.0,
+                "max_wait_time": 0.0,
+                "shared": 0,
+                "timed_out": 0,
+                "truncated": 0,
+            },
+        )
+
+    def _count_submit(self, name: str) -> None:
+        stats = self._tool_stats(name)
+        stats["submitted"] += 1
+        stats["queued"] += 1
+        stats["max_queue_depth"] = max(stats["max_queue_depth"], stats["queued"])
+
+    def _on_submit(self, name: str) -> None:
+        with self._lock:
+            self._count_submit(name)
+
+    def _on_start(self, name: str, submitted: float) -> None:
+        waited = time.monotonic() - submitted
+        with self._lock:
+            stats = self._stats[name]
+            stats["started"] += 1
+            stats["queued"] -= 1
+            stats["running"] += 1
+            stats["wait_time"] += waited
+            stats["max_wait_time"] = max(stats["max_wait_time"], waited)
+
+    def _on_finish(self, name: str) -> None:
+        with self._lock:
+            self._stats[name]["running"] -= 1
+
+    def _on_cancelled(self, name: str) -> None:
+        with self._lock:
+            self._stats[name]["queued"] -= 1
+
+    def _on_call_done(self, name: str, key: Optional[str], future: Future) -> None:
+        if future.cancelled():
+            self._on_cancelled(name)
+        if key is not None:
+            with self._lock:
+                if self._flights.get(key) is future:
+                    del self._flights[key]
+
+    def _on_timeout(self, name: str) -> None:
+        with self._lock:
+            self._stats[name]["timed_out"] += 1
+
+
+class BaseToolRunner:
+    """
+    Runs the tool calls of one model response on the shared ToolExecutor.
+
+    Identical calls share one invocation, fresh memoized outputs of cacheable
+    tools are reused, parallel calls to a tool with a `batch` entry point are
+    folded into one invocation, and every output is cut to the tool's size
+    limit. Subclasses adapt it to one provider's tool call format with
+    `_prepare_call` and `_set_tool_output`.
+    """
+
+    def __init__(
+        self,
+        error_msg="Ha ocurrido un error inesperado",
+        tool_settings: Optional[dict] = None,
+    ):
+        self.ERROR_MSG = error_msg
+        # Shared across agents so per-tool limits apply to every user
+        self._executor = get_tool_executor()
+        if tool_settings:
+            self._executor.configure(tool_settings)
+        # Memoized outputs of cacheable tools, also shared across agents
+        self._cache = tool_cache
+
+    def _prepare_call(self, tool, rag_functions) -> tuple[str, Callable, dict]:
+        """(tool name, function to call, kwargs) of a tool call of the model."""
+        raise NotImplementedError
+
+    def _set_tool_output(self, chat_memory, tool, output: str, user_id: int) -> None:
+        """Add the output of a tool call to the chat history."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return self._executor.stats()
+
+    def cache_stats(self) -> dict:
+        return self._cache.stats()
+
+    def _run_tools(
+        self,
+        tools_called,
+        user_id: int,
+        chat_memory,
+        rag_functions,
+        deadline: Optional[float] = None,
+    ) -> None:
+        """
+        Runs every tool call of a model response as one concurrent batch;
+        outputs are written back in call order.
+        """
+        print(f"{len(tools_called)} tools need to be called!")
+
+        invocations, keys, outputs = self._plan_calls(tools_called, rag_functions)
+        futures = []
+        deadlines = []
+        for name, function_to_call, function_args, call_keys in invocations:
+            invocation_deadline = self._executor.deadline_for(
+                name, deadline, len(call_keys)
+            )
+            futures.append(
+                self._executor.submit(
+                    name, function_to_call, function_args, invocation_deadline
+                )
+            )
+            deadlines.append(invocation_deadline)
+
+        results = [
+            self._future_result(invocation[0], future, invocation_deadline)
+            for invocation, future, invocation_deadline in zip(
+                invocations, futures, deadlines
+            )
+        ]
+        self._set_outputs(
+            invocations, results, outputs, keys, tools_called, user_id, chat_memory
+        )
+
+    async def _async_run_tools(
+        self,
+        tools_called,
+        user_id: int,
+        chat_memory,
+        rag_functions,
+        deadline: Optional[float] = None,
+    ) -> None:
+        print(f"{len(tools_called)} tools need to be called!")
+
+        invocations, keys, outputs = self._plan_calls(tools_called, rag_functions)
+        results = await asyncio.gather(
+            *(
+                self._executor.run(
+                    name,
+                    function_to_call,
+                    function_args,
+                    self._executor.deadline_for(name, deadline, len(call_keys)),
+                )
+                for name, function_to_call, function_args, call_keys in invocations
+            ),
+            return_exceptions=True,
+        )
+        self._set_outputs(
+            invocations, results, outputs, keys, tools_called, user_id, chat_memory
+        )
+
+    def _plan_calls(self, tools_called, rag_functions) -> tuple[list, list, dict]:
+        """
+        Invocations needed for the calls of a model response, as
+        (name, function, kwargs, call keys), the call key of each call and the
+        outputs already known.
+        """
+        calls = {}
+        keys = []
+        outputs = {}
+        for tool in tools_called:
+            name, function_to_call, function_args = self._prepare_call(tool, rag_functions)
+            key = call_key(name, function_args)
+            if self._changes_state(name, function_args):
+                # Each call moves shared state forward (e.g. the next page of
+                # a cursor), so identical calls must each run
+                key = f"{key}#{len(keys)}"
+            if key in calls or key in outputs:
+                print(f"{name}: duplicate call, sharing the first output")
+            else:
+                cached = self._cached_output(name, key, function_args)
+                if cached is not None:
+                    outputs[key] = cached
+                else:
+                    calls[key] = (name, function_to_call, function_args)
+            keys.append(key)
+
+        groups = {}
+        for key, (name, function_to_call, _) in calls.items():
+            batched = getattr(function_to_call, "batch", None) is not None
+            groups.setdefault(("batch", name) if batched else key, []).append(key)
+
+        invocations = []
+        for group in groups.values():
+            name, function_to_call, function_args = calls[group[0]]
+            if len(group) == 1:
+                invocations.append((name, function_to_call, function_args, group))
+                continue
+
+            print(f"{name}: {len(group)} calls folded into one batch")
+            invocations.append(
+                (
+                    name,
+                    function_to_call.batch,
+                    {"calls": [calls[key][2] for key in group]},
+                    group,
+                )
+            )
+
+        return invocations, keys, outputs
+
+    def _future_result(self, name: str, future: Future, deadline: Optional[float]):
+        try:
+            return self._executor.result(name, future, deadline)
+        except Exception as exc:
+            return exc
+
+    def _set_outputs(
+        self,
+        invocations,
+        results,
+        outputs: dict,
+        keys: list,
+        tools_called,
+        user_id: int,
+        chat_memory,
+    ) -> None:
+        for (name, _, function_args, call_keys), function_out in zip(invocations, results):
+            if len(call_keys) == 1:
+                calls = [(call_keys[0], function_args, function_out)]
+            else:
+                calls = zip(
+                    call_keys,
+                    function_args["calls"],
+                    self._split_batch(function_out, len(call_keys)),
+                )
+            for key, call_args, call_out in calls:
+                self._remember(name, key, call_args, call_out)
+                outputs[key] = self._result_output(name, call_out)
+
+        for tool, key in zip(tools_called, keys):
+            self._set_tool_output(chat_memory, tool, outputs[key], user_id)
+
+    @staticmethod
+    def _split_batch(function_out, batch_size: int) -> list:
+        """Per-call results of a batched invocation (its error for every call)."""
+        if isinstance(function_out, Exception):
+            return [function_out] * batch_size
+        if not isinstance(function_out, (list, tuple)) or len(function_out) != batch_size:
+            return [ValueError(f"batch did not return {batch_size} outputs")] * batch_size
+        return list(function_out)
+
+    def _result_output(self, name: str, function_out) -> str:
+        if isinstance(function_out, ToolTimeoutError):
+            print(f"{name}: {function_out}")
+            return function_out.to_output()
+        if isinstance(function_out, Exception):
+            print(f"{name}: {function_out}")
+            return self.ERROR_MSG
+        function_out = self._executor.limit_output(name, function_out)
+        print(f"{name}: {function_out[:100]}")
+        return function_out
+
+    def _changes_state(self, name: str, kwargs: dict) -> bool:
+        """A call of an idempotent tool excluded by its `idempotent_if`."""
+        settings = self._executor.get_settings(name)
+        return bool(settings.get("idempotent")) and not self._executor.is_idempotent(
+            name, kwargs
+        )
+
+    def _cache_ttl(self, name: str, kwargs: dict) -> float:
+        if not self._executor.is_idempotent(name, kwargs):
+            return 0
+        return self._executor.get_settings(name).get("cache_ttl", 0)
+
+    def _cached_output(self, name: str, key: str, kwargs: dict) -> Optional[str]:
+        """Output of an identical earlier call to a cacheable tool, if still fresh."""
+        if not self._cache_ttl(name, kwargs):
+            return None
+        function_out = self._cache.get((name, key))
+        if function_out is None:
+            return None
+        print(f"{name}: served from cache")
+        return self._result_output(name, function_out)
+
+    def _remember(self, name: str, key: str, function_args: dict, function_out) -> None:
+        ttl = self._cache_ttl(name, function_args)
+        if not ttl or isinstance(function_out, Exception):
+            return
+        function_out = to_text(function_out)
+        cache_if = self._executor.get_settings(name).get("cache_if")
+        if cache_if is None or cache_if(function_args, function_out):
+            self._cache.set((name, key), function_out, ttl)
+
+
+_executor: Optional[ToolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_tool_executor() -> ToolExecutor:
+    """Process-wide ToolExecutor shared by every agent (TOOL_MAX_WORKERS)."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ToolExecutor()
+    return _executor
+
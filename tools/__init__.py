@@ -4,58 +4,141 @@ Tools package for AI Agents Library.
 Este paquete contiene todas las herramientas disponibles para los agentes de IA.
 """
 
-# Importaciones básicas
-from .datetime_tool import get_current_datetime, async_get_current_datetime
-from .weather_tool import get_current_weather, async_get_current_weather
-
-# Importaciones opcionales con manejo de errores
-try:
-    from .email_tool import send_email
-except ImportError:
-    send_email = None
-
-try:
-    from .excel_tool import manipulate_xlsx
-except ImportError:
-    manipulate_xlsx = None
-
-try:
-    from .pg_tool import execute_query
-except ImportError:
-    execute_query = None
-
-try:
-    from .sql_server_tool import execute_sql_server_query
-except ImportError:
-    execute_sql_server_query = None
+import importlib
 
-# Lista de todas las herramientas disponibles
-__all__ = [
-    'get_current_datetime',
-    'async_get_current_datetime',
-    'get_current_weather', 
-    'async_get_current_weather',
-    'send_email',
-    'manipulate_xlsx',
-    'execute_query',
-    'execute_sql_server_query'
-]
+from dotenv import load_dotenv
 
-# Diccionario de funciones disponibles
-AVAILABLE_FUNCTIONS = {
-    'get_current_datetime': get_current_datetime,
-    'get_current_weather': get_current_weather,
+from .registry import ToolSpec
+
+load_dotenv()
+
+# Módulo de cada nombre exportado: se importa al primer acceso (tools.X o
+# `from tools import X`), no al importar el paquete
+_EXPORTS = {
+    'get_current_datetime': '.datetime_tool',
+    'async_get_current_datetime': '.datetime_tool',
+    'get_current_weather': '.weather_tool',
+    'async_get_current_weather': '.weather_tool',
+    'get_current_weather_batch': '.weather_tool',
+    'find_tables': '.schema_index',
+    'async_find_tables': '.schema_index',
+    'read_tool_output': '.tool_output',
+    'async_read_tool_output': '.tool_output',
+    'get_catalog': '.catalog',
+    'start_catalog': '.catalog',
+    'send_email': '.email_tool',
+    'async_send_email': '.email_tool',
+    'manipulate_xlsx': '.excel_tool',
+    'async_manipulate_xlsx': '.excel_tool',
+    'execute_query': '.pg_tool',
+    'async_execute_query': '.pg_tool',
+    'execute_sql_server_query': '.sql_server_tool',
+    'async_execute_sql_server_query': '.sql_server_tool',
 }
 
-# Agregar funciones opcionales si están disponibles
-if send_email:
-    AVAILABLE_FUNCTIONS['send_email'] = send_email
+# Módulos con dependencias opcionales: sin ellas sus nombres valen None
+_OPTIONAL = {'.email_tool', '.excel_tool', '.pg_tool', '.sql_server_tool'}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    try:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    except ImportError:
+        if _EXPORTS[name] not in _OPTIONAL:
+            raise
+        value = None
+    globals()[name] = value
+    return value
+
+
+# Lista de todas las herramientas disponibles
+__all__ = ['ToolSpec', 'TOOLS', 'AVAILABLE_FUNCTIONS', 'TOOL_SETTINGS', *_EXPORTS]
+
+
+def _first_page(kwargs: dict) -> bool:
+    # Con page_token la llamada avanza un cursor compartido: no es idempotente
+    return not kwargs.get('page_token')
 
-if manipulate_xlsx:
-    AVAILABLE_FUNCTIONS['manipulate_xlsx'] = manipulate_xlsx
 
-if execute_query:
-    AVAILABLE_FUNCTIONS['execute_query'] = execute_query
+# Registro de herramientas con sus metadatos (ver ToolSpec). Cada módulo se
+# importa la primera vez que se llama a una de sus funciones.
+# `max_concurrency` limita las llamadas simultáneas de todos los usuarios;
+# `concurrency_key` aplica el límite por valor de ese argumento (p. ej. por archivo).
+# `max_output_tokens` / `max_output_bytes` recortan la salida (0 = sin límite).
+# `timeout`: segundos antes de cancelar la llamada (por defecto TOOL_TIMEOUT).
+# `idempotent`: llamadas idénticas simultáneas comparten una sola ejecución;
+# `idempotent_if` excluye las llamadas que cambian estado.
+# `cache_ttl`: segundos que se reutiliza el resultado de una llamada idéntica;
+# nunca en herramientas con efectos secundarios (correo, escritura de Excel).
+# Las consultas SQL no lo usan: ya las cachea query_cache (DB_CACHE_TTL /
+# MSSQL_CACHE_TTL), que el catálogo invalida al cambiar el esquema.
+# `batch`: las llamadas en paralelo de una respuesta se agrupan en una sola
+# llamada a `<función>_batch`, que las ejecuta en serie: sus límites se aplican
+# al lote completo y su `timeout` se multiplica por el número de llamadas. Solo
+# para herramientas rápidas; las consultas SQL no se agrupan, porque en paralelo
+# tardan lo que la más lenta (no la suma), cada una con su propio timeout y
+# compartiendo ejecución con consultas idénticas de otros usuarios.
+_SPECS = {
+    'get_current_datetime': ToolSpec('get_current_datetime', module='.datetime_tool'),
+    'get_current_weather': ToolSpec(
+        'get_current_weather',
+        module='.weather_tool',
+        batch=True,
+        idempotent=True,
+        cache_ttl=600,
+    ),
+    'find_tables': ToolSpec('find_tables', module='.schema_index', idempotent=True),
+    # Ya devuelve fragmentos acotados de una salida recortada
+    'read_tool_output': ToolSpec(
+        'read_tool_output',
+        module='.tool_output',
+        idempotent=True,
+        max_output_tokens=0,
+        max_output_bytes=0,
+    ),
+    'send_email': ToolSpec(
+        'send_email',
+        module='.email_tool',
+        requires=('aiosmtplib',),
+        max_concurrency=2,
+        timeout=30,
+    ),
+    'manipulate_xlsx': ToolSpec(
+        'manipulate_xlsx',
+        module='.excel_tool',
+        requires=('openpyxl',),
+        max_concurrency=1,
+        concurrency_key='filename',
+        timeout=30,
+    ),
+    'execute_query': ToolSpec(
+        'execute_query',
+        module='.pg_tool',
+        requires=('psycopg2',),
+        idempotent=True,
+        idempotent_if=_first_page,
+        max_concurrency=4,
+        timeout=60,
+    ),
+    'execute_sql_server_query': ToolSpec(
+        'execute_sql_server_query',
+        module='.sql_server_tool',
+        requires=('pyodbc',),
+        idempotent=True,
+        idempotent_if=_first_page,
+        max_concurrency=4,
+        timeout=60,
+    ),
+}
+
+# Solo las herramientas cuyas dependencias están instaladas
+TOOLS = {name: spec for name, spec in _SPECS.items() if spec.available()}
+
+# Diccionario de funciones disponibles
+AVAILABLE_FUNCTIONS = {name: spec.function for name, spec in TOOLS.items()}
 
-if execute_sql_server_query:
-    AVAILABLE_FUNCTIONS['execute_sql_server_query'] = execute_sql_server_query
+# Ajustes por herramienta para el runtime (ToolExecutor / ToolRunner)
+TOOL_SETTINGS = {name: spec.settings() for name, spec in TOOLS.items()}
@@ -0,0 +1,366 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+
+from .query_cache import query_cache
+from .schema_index import set_schema_tables
+from .serialization import dumps
+
+load_dotenv()
+
+_PG_COLUMNS = """
+SELECT c.table_schema, c.table_name, c.column_name, c.data_type
+FROM information_schema.columns c
+WHERE c.table_schema NOT IN ('pg_catalog', 'information_schema')
+ORDER BY c.table_schema, c.table_name, c.ordinal_position
+"""
+
+_PG_TABLES = """
+SELECT n.nspname, c.relname, GREATEST(c.reltuples, 0)::bigint,
+       obj_description(c.oid, 'pg_class')
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind IN ('r', 'v', 'm', 'p', 'f')
+  AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+  AND n.nspname NOT LIKE 'pg_toast%'
+"""
+
+_MSSQL_COLUMNS = """
+SELECT c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE
+FROM INFORMATION_SCHEMA.COLUMNS c
+ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+_MSSQL_TABLES = """
+SELECT s.name, t.name, SUM(p.rows), CAST(ep.value AS NVARCHAR(4000))
+FROM sys.tables t
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+LEFT JOIN sys.extended_properties ep
+  ON ep.major_id = t.object_id AND ep.minor_id = 0 AND ep.name = 'MS_Description'
+GROUP BY s.name, t.name, CAST(ep.value AS NVARCHAR(4000))
+"""
+
+
+class CatalogSource:
+    """Base de datos a introspeccionar: nombre, clave de conexión y pool."""
+
+    def __init__(
+        self,
+        name: str,
+        database_key: Callable[[], str],
+        get_pool: Callable,
+        columns_sql: str,
+        tables_sql: str,
+        default_schema: str,
+    ):
+        self.name = name
+        self.database_key = database_key
+        self.get_pool = get_pool
+        self.columns_sql = columns_sql
+        self.tables_sql = tables_sql
+        self.default_schema = default_schema
+
+    def introspect(self) -> list[dict]:
+        """Tablas con columnas, tipos, filas estimadas y comentario."""
+        with self.get_pool().connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(self.columns_sql)
+                column_rows = cur.fetchall()
+                cur.execute(self.tables_sql)
+                table_rows = cur.fetchall()
+            finally:
+                cur.close()
+                conn.rollback()
+
+        tables: dict[tuple, dict] = {}
+        for schema, table, column, data_type in column_rows:
+            entry = tables.setdefault((schema, table), self._table(schema, table))
+            entry["columns"].append({"name": column, "type": data_type})
+
+        for schema, table, rows, comment in table_rows:
+            entry = tables.get((schema, table))
+            if entry is None:
+                continue
+            entry["row_estimate"] = max(int(rows or 0), 0)
+            if comment:
+                entry["comment"] = comment
+
+        return sorted(tables.values(), key=lambda t: t["table_name"])
+
+    def _table(self, schema: str, table: str) -> dict:
+        name = table if schema == self.default_schema else f"{schema}.{table}"
+        return {"table_name": name, "schema": schema, "database": self.name, "columns": []}
+
+
+def _postgres_source() -> Optional[CatalogSource]:
+    if not os.getenv("DB_NAME"):
+        return None
+    try:
+        from .pg_tool import _database_key, get_postgres_pool
+    except ImportError:
+        return None
+    return CatalogSource(
+        "postgres", _database_key, get_postgres_pool, _PG_COLUMNS, _PG_TABLES, "public"
+    )
+
+
+def _sqlserver_source() -> Optional[CatalogSource]:
+    if not os.getenv("MSSQL_DATABASE"):
+        return None
+    try:
+        from .sql_server_tool import _database_key, get_sqlserver_pool
+    except ImportError:
+        return None
+    return CatalogSource(
+        "sqlserver", _database_key, get_sqlserver_pool, _MSSQL_COLUMNS, _MSSQL_TABLES, "dbo"
+    )
+
+
+def fingerprint(tables: list[dict]) -> str:
+    """Huella del esquema: cambia si cambia alguna tabla, columna o tipo."""
+    digest = hashlib.sha256()
+    for table in tables:
+        digest.update(table["table_name"].encode())
+        for column in table.get("columns") or []:
+            digest.update(f"|{column['name']}:{column['type']}".encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class Catalog:
+    """Catálogo de las bases de datos, cacheado en un archivo JSON.
+
+    Al arrancar se lee el archivo de caché; solo se vuelve a introspeccionar
+    una base de datos si su entrada no existe, es de otra conexión o tiene más
+    de `max_age` segundos. Después se refresca en segundo plano cada
+    `refresh_interval` segundos. Cuando la huella del esquema cambia se avisa
+    a los listeners (índice de find_tables, caché de resultados...).
+    """
+
+    def __init__(
+        self,
+        sources: list[CatalogSource],
+        path: Optional[str] = None,
+        refresh_interval: float = 3600.0,
+        max_age: float = 86400.0,
+    ):
+        self.sources = {source.name: source for source in sources}
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self._entries: dict[str, dict] = {}
+        self._lookup: dict[str, dict[str, dict]] = {}
+        self._listeners: list[Callable] = []
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "Catalog":
+        """
+        Configura las fuentes con las variables de cada base de datos, y el
+        catálogo con CATALOG_CACHE_PATH (vacío desactiva el archivo),
+        CATALOG_REFRESH_INTERVAL y CATALOG_MAX_AGE (segundos).
+        """
+        sources = [s for s in (_postgres_source(), _sqlserver_source()) if s]
+        return cls(
+            sources,
+            path=os.getenv("CATALOG_CACHE_PATH", "catalog_cache.json"),
+            refresh_interval=float(os.getenv("CATALOG_REFRESH_INTERVAL") or 3600),
+            max_age=float(os.getenv("CATALOG_MAX_AGE") or 86400),
+        )
+
+    def add_listener(self, listener: Callable[["Catalog", list[str]], None]) -> None:
+        """`listener(catalog, changed_sources)` tras cargar o refrescar el catálogo."""
+        self._listeners.append(listener)
+
+    def start(self) -> None:
+        """Carga la caché y lanza el refresco en segundo plano (idempotente)."""
+        with self._lock:
+            if self._thread is not None or not self.sources:
+                return
+            loaded = self.load()
+            if loaded:
+                self._notify(loaded)
+            self._thread = threading.Thread(
+                target=self._run, name="catalog-refresh", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def tables(self, source: Optional[str] = None) -> list[dict]:
+        with self._lock:
+            return [
+                table
+                for name, entry in self._entries.items()
+                if source is None or name == source
+                for table in entry["tables"]
+            ]
+
+    def has_source(self, source: str) -> bool:
+        with self._lock:
+            return source in self._entries
+
+    def get_table(self, source: str, name: str) -> Optional[dict]:
+        """Busca una tabla por nombre (con o sin esquema, sin distinguir mayúsculas)."""
+        with self._lock:
+            return self._lookup.get(source, {}).get(name.lower())
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "tables": len(entry["tables"]),
+                    "fingerprint": entry["fingerprint"],
+                    "introspected_at": entry["introspected_at"],
+                }
+                for name, entry in self._entries.items()
+            }
+
+    def load(self) -> list[str]:
+        """Lee el archivo de caché; devuelve las fuentes cargadas."""
+        if not self.path or not os.path.exists(self.path):
+            return []
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                cached = json.load(f).get("sources", {})
+        except (OSError, ValueError) as e:
+            print(f"Catalog cache {self.path} ignored: {e}")
+            return []
+
+        loaded = []
+        for name, source in self.sources.items():
+            entry = cached.get(name)
+            if entry and entry.get("database") == self._database_hash(source):
+                self._set_entry(name, entry)
+                loaded.append(name)
+        return loaded
+
+    def refresh(self, force: bool = False) -> list[str]:
+        """Introspecciona las fuentes caducadas (o todas con `force`); devuelve las que cambiaron."""
+        changed = []
+        with self._refresh_lock:
+            for name, source in self.sources.items():
+                if not force and not self._is_stale(name):
+                    continue
+                try:
+                    tables = source.introspect()
+                except Exception as e:
+                    print(f"Catalog introspection of {name} failed: {e}")
+                    continue
+
+                entry = {
+                    "database": self._database_hash(source),
+                    "fingerprint": fingerprint(tables),
+                    "introspected_at": time.time(),
+                    "tables": tables,
+                }
+                with self._lock:
+                    previous = self._entries.get(name)
+                    self._set_entry(name, entry)
+                if previous is None or previous["fingerprint"] != entry["fingerprint"]:
+                    changed.append(name)
+                print(f"Catalog of {name} refreshed: {len(tables)} tables")
+
+            if changed or force:
+                self._save()
+        if changed:
+            self._notify(changed)
+        return changed
+
+    def _run(self) -> None:
+        self.refresh()
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh(force=True)
+
+    def _is_stale(self, name: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(name)
+        return entry is None or time.time() - entry["introspected_at"] > self.max_age
+
+    def _set_entry(self, name: str, entry: dict) -> None:
+        lookup = {}
+        for table in entry["tables"]:
+            lookup[table["table_name"].lower()] = table
+            lookup[f"{table['schema']}.{table['table_name'].split('.')[-1]}".lower()] = table
+        with self._lock:
+            self._entries[name] = entry
+            self._lookup[name] = lookup
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            payload = dumps({"version": 1, "sources": self._entries})
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Catalog cache could not be saved: {e}")
+
+    def _notify(self, changed: list[str]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(self, changed)
+            except Exception as e:
+                print(f"Catalog listener failed: {e}")
+
+    @staticmethod
+    def _database_hash(source: CatalogSource) -> str:
+        # La caché solo vale para la misma conexión (host, puerto, base de datos)
+        return hashlib.sha256(source.database_key().encode()).hexdigest()[:16]
+
+
+def _update_schema_index(catalog: Catalog, changed: list[str]) -> None:
+    tables = catalog.tables()
+    if tables:
+        set_schema_tables(tables)
+
+
+def _invalidate_results(catalog: Catalog, changed: list[str]) -> None:
+    for name in changed:
+        query_cache.invalidate(catalog.sources[name].database_key())
+
+
+_catalog: Optional[Catalog] = None
+_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Catálogo del proceso, conectado al índice de find_tables y a la caché de resultados."""
+    global _catalog
+    if _catalog is None:
+        with _lock:
+            if _catalog is None:
+                catalog = Catalog.from_env()
+                catalog.add_listener(_update_schema_index)
+                catalog.add_listener(_invalidate_results)
+                _catalog = catalog
+    return _catalog
+
+
+def start_catalog() -> Catalog:
+    """Arranca el catálogo: caché local + introspección/refresco en segundo plano."""
+    catalog = get_catalog()
+    catalog.start()
+    return catalog
+
+
+if __name__ == "__main__":
+    catalog = get_catalog()
+    catalog.load()
+    catalog.refresh(force=True)
+    print(json.dumps(catalog.info(), indent=2))
@@ -0,0 +1,285 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Pool de conexiones acotado y seguro entre hilos.
+
+    Reutiliza conexiones abiertas entre llamadas a las herramientas para no
+    pagar la conexión TCP + autenticación en cada consulta.
+
+    Args:
+        connect: Función sin argumentos que abre una conexión nueva (debe lanzar
+            una excepción si falla).
+        min_size: Conexiones que se abren al crear el pool y se mantienen
+            abiertas aunque estén ociosas.
+        max_size: Máximo de conexiones abiertas a la vez.
+        max_idle: Segundos que una conexión puede estar ociosa antes de reciclarse;
+            un hilo en segundo plano cierra las que lo superan y repone min_size.
+        timeout: Segundos máximos de espera por una conexión libre.
+        ping: Función que recibe una conexión y lanza si no está sana.
+        ping_after: Segundos de inactividad a partir de los cuales se hace ping
+            antes de entregar la conexión.
+        is_closed: Función que indica si una conexión ya está cerrada (chequeo barato).
+        reset: Función que deja la conexión limpia al devolverla al pool.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 5,
+        max_idle: float = 300.0,
+        timeout: float = 30.0,
+        ping: Optional[Callable[[Any], None]] = None,
+        ping_after: float = 30.0,
+        is_closed: Optional[Callable[[Any], bool]] = None,
+        reset: Optional[Callable[[Any], None]] = None,
+        name: str = "pool",
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+
+        self.name = name
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._connect = connect
+        self._ping = ping
+        self._is_closed = is_closed
+        self._reset = reset
+
+        self._idle: deque = deque()  # (conn, last_used)
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "max_wait_time": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "discarded": 0,
+        }
+
+        self.fill()
+        self._stop = threading.Event()
+        self._maintenance: Optional[threading.Thread] = None
+        if max_idle > 0:
+            self._maintenance = threading.Thread(
+                target=self._run_maintenance, name=f"{name}-maintenance", daemon=True
+            )
+            self._maintenance.start()
+
+    def acquire(self):
+        """Entrega una conexión sana, esperando si el pool está lleno."""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        wait_start = 0.0
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError(f"{self.name} is closed")
+
+                conn, last_used, must_open = None, 0.0, False
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    must_open = True
+                else:
+                    if not waited:
+                        waited = True
+                        wait_start = time.monotonic()
+                        self._stats["waits"] += 1
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        self._record_wait(wait_start)
+                        raise PoolTimeoutError(
+                            f"No connection available in {self.name} after {self.timeout}s"
+                        )
+                    self._cond.wait(remaining)
+                    continue
+
+            if must_open:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self._stats["created"] += 1
+            elif not self._is_usable(conn, last_used):
+                self._close_conn(conn)
+                self._forget("recycled")
+                continue
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+                if waited:
+                    self._record_wait(wait_start)
+            return conn
+
+    def release(self, conn, discard: bool = False) -> None:
+        """Devuelve una conexión al pool (o la cierra si `discard`)."""
+        if conn is None:
+            return
+
+        if not discard and self._reset:
+            try:
+                self._reset(conn)
+            except Exception:
+                discard = True
+
+        if discard or self._closed or self._conn_closed(conn):
+            self._close_conn(conn)
+            self._forget("discarded")
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except BaseException:
+            discard = self._conn_closed(conn)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def fill(self) -> int:
+        """Abre conexiones hasta tener `min_size`; devuelve cuántas abrió."""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return opened
+                self._size += 1
+
+            try:
+                conn = self._connect()
+            except Exception as e:
+                # Se reintenta en el siguiente ciclo de mantenimiento
+                self._forget()
+                print(f"{self.name}: could not pre-open a connection: {e}")
+                return opened
+
+            with self._cond:
+                self._stats["created"] += 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+            opened += 1
+
+    def recycle_idle(self) -> int:
+        """Cierra las conexiones ociosas que superan `max_idle` (respetando `min_size`)."""
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            keep: deque = deque()
+            for conn, last_used in self._idle:
+                if now - last_used > self.max_idle and self._size - len(stale) > self.min_size:
+                    stale.append(conn)
+                else:
+                    keep.append((conn, last_used))
+            self._idle = keep
+
+        for conn in stale:
+            self._close_conn(conn)
+            self._forget("recycled")
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["max_size"] = self.max_size
+            stats["min_size"] = self.min_size
+            stats["avg_wait_time"] = (
+                stats["wait_time"] / stats["waits"] if stats["waits"] else 0.0
+            )
+        return stats
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for conn, _ in idle:
+            self._close_conn(conn)
+
+    def _run_maintenance(self) -> None:
+        interval = max(1.0, min(self.max_idle / 2, 60.0))
+        while not self._stop.wait(interval):
+            try:
+                self.recycle_idle()
+                self.fill()
+            except Exception as e:
+                print(f"{self.name}: maintenance failed: {e}")
+
+    def _is_usable(self, conn, last_used: float) -> bool:
+        if self._conn_closed(conn):
+            return False
+
+        idle_for = time.monotonic() - last_used
+        if idle_for > self.max_idle and self._size > self.min_size:
+            return False
+
+        if self._ping and idle_for > self.ping_after:
+            try:
+                self._ping(conn)
+            except Exception:
+                return False
+
+        return True
+
+    def _conn_closed(self, conn) -> bool:
+        if not self._is_closed:
+            return False
+        try:
+            return bool(self._is_closed(conn))
+        except Exception:
+            return True
+
+    def _forget(self, reason: Optional[str] = None) -> None:
+        with self._cond:
+            self._size -= 1
+            if reason:
+                self._stats[reason] += 1
+            self._cond.notify()
+
+    def _record_wait(self, wait_start: float) -> None:
+        elapsed = time.monotonic() - wait_start
+        self._stats["wait_time"] += elapsed
+        self._stats["max_wait_time"] = max(self._stats["max_wait_time"], elapsed)
+
+    @staticmethod
+    def _close_conn(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
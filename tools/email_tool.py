@@ -1,6 +1,5 @@
 import asyncio
 import base64
-import json
 import os
 import smtplib
 from email.mime.application import MIMEApplication
@@ -11,6 +10,8 @@ from typing import Dict, List, Optional
 from aiosmtplib import SMTP
 from dotenv import load_dotenv
 
+from .serialization import dumps
+
 load_dotenv()
 
 
@@ -62,7 +63,7 @@ def send_email(
 
                 file_path = attachment["filename"]
                 if not os.path.exists(file_path):
-                    return json.dumps(
+                    return dumps(
                         {"status": "error", "message": f"File not found: {file_path}"}
                     )
                 with open(file_path, "rb") as f:
@@ -79,17 +80,17 @@ def send_email(
         # Send email
         server = get_gmail_connection()
         if isinstance(server, Exception):
-            return json.dumps(
+            return dumps(
                 {"status": "error", "message": f"SMTP connection error: {server}"}
             )
 
         server.send_message(msg)
         server.quit()
 
-        return json.dumps({"status": "success", "message": "Email sent successfully"})
+        return dumps({"status": "success", "message": "Email sent successfully"})
 
     except Exception as e:
-        return json.dumps(
+        return dumps(
             {"status": "error", "message": f"Failed to send email: {str(e)}"}
         )
 
@@ -122,7 +123,7 @@ async def async_send_email(
 
                 file_path = attachment["filename"]
                 if not os.path.exists(file_path):
-                    return json.dumps(
+                    return dumps(
                         {"status": "error", "message": f"File not found: {file_path}"}
                     )
                 with open(file_path, "rb") as f:
@@ -139,17 +140,17 @@ async def async_send_email(
         # Send email asynchronously
         smtp = await get_async_gmail_connection()
         if isinstance(smtp, Exception):
-            return json.dumps(
+            return dumps(
                 {"status": "error", "message": f"SMTP connection error: {smtp}"}
             )
 
         await smtp.send_message(msg)
         await smtp.quit()
 
-        return json.dumps({"status": "success", "message": "Email sent successfully"})
+        return dumps({"status": "success", "message": "Email sent successfully"})
 
     except Exception as e:
-        return json.dumps(
+        return dumps(
             {"status": "error", "message": f"Failed to send email: {str(e)}"}
         )
 
@@ -1,9 +1,11 @@
-import json
+import asyncio
 import os
 from typing import List, Optional
 
 from openpyxl import Workbook, load_workbook
 
+from .serialization import dumps
+
 
 def manipulate_xlsx(
     operation: str,
@@ -28,10 +30,10 @@ def manipulate_xlsx(
     try:
         if operation == "list_files":
             xlsx_files = [f for f in os.listdir() if f.endswith(".xlsx")]
-            return json.dumps({"status": "success", "files": xlsx_files})
+            return dumps({"status": "success", "files": xlsx_files})
 
         if not filename:
-            return json.dumps(
+            return dumps(
                 {
                     "status": "error",
                     "message": "Se requiere un nombre de archivo para esta operación",
@@ -42,7 +44,7 @@ def manipulate_xlsx(
 
         if operation == "read":
             if not os.path.exists(filepath):
-                return json.dumps(
+                return dumps(
                     {"status": "error", "message": f"Archivo no encontrado: {filename}"}
                 )
 
@@ -53,11 +55,11 @@ def manipulate_xlsx(
             for row in sheet.iter_rows(values_only=True):
                 result.append(list(row))
 
-            return json.dumps({"status": "success", "data": result})
+            return dumps({"status": "success", "data": result})
 
         elif operation in ["write", "append"]:
             if not data:
-                return json.dumps(
+                return dumps(
                     {
                         "status": "error",
                         "message": "Se requieren datos para esta operación",
@@ -70,7 +72,7 @@ def manipulate_xlsx(
                 sheet.title = sheet_name
             else:  # append
                 if not os.path.exists(filepath):
-                    return json.dumps(
+                    return dumps(
                         {
                             "status": "error",
                             "message": f"Archivo no encontrado para añadir datos: {filename}",
@@ -87,7 +89,7 @@ def manipulate_xlsx(
                 sheet.append(row)
 
             wb.save(filepath)
-            return json.dumps(
+            return dumps(
                 {
                     "status": "success",
                     "message": f"Archivo {filename} {'creado' if operation == 'write' else 'actualizado'} exitosamente",
@@ -95,12 +97,12 @@ def manipulate_xlsx(
             )
 
         else:
-            return json.dumps(
+            return dumps(
                 {"status": "error", "message": f"Operación no válida: {operation}"}
             )
 
     except Exception as e:
-        return json.dumps(
+        return dumps(
             {
                 "status": "error",
                 "message": f"Error al manipular archivo Excel: {str(e)}",
@@ -109,4 +111,4 @@ def manipulate_xlsx(
 
 
 async def async_manipulate_xlsx(*args, **kwargs) -> str:
-    return manipulate_xlsx(*args, **kwargs)
+    return await asyncio.to_thread(manipulate_xlsx, *args, **kwargs)
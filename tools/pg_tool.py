@@ -1,99 +1,307 @@
 import asyncio
 import json
 import os
+import threading
+import uuid
+from typing import Optional
 
 import psycopg2
+from psycopg2 import errors as pg_errors
 from dotenv import load_dotenv
 
+from .db_pool import ConnectionPool, PoolTimeoutError
+from .query_cache import query_cache
+from .result_format import format_error, resolve_format
+from .serialization import dumps
+from .sql_guard import cost_rejection, ensure_limit, guard_settings, timeout_rejection
+from .sql_paging import CursorSession, CursorSessions, page_response, paging_settings
+from .sql_validation import validate_query
+
 load_dotenv()
 
+_pool = None
+_sessions = None
+_pool_lock = threading.Lock()
+_paging = paging_settings("DB")
+_cache_ttl = float(os.getenv("DB_CACHE_TTL") or 60)
+_guard = guard_settings("DB", default_max_cost=1_000_000)
+
+
+def _connect():
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+    )
+
 
 def get_postgres_connection():
     """Establishes a connection to the PostgreSQL database."""
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
-        )
-        return conn
+        return _connect()
     except psycopg2.Error as e:
         # It's better to return the error than a string
         # to handle it more effectively in the calling function.
         return e
 
 
-async def async_execute_query(input_query: str) -> json:
-    return execute_query(input_query)
+def _ping(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+    conn.rollback()
+
 
+def get_postgres_pool() -> ConnectionPool:
+    """
+    Returns the process-wide PostgreSQL connection pool, creating it on first use.
 
-def execute_query(input_query: str) -> json:
+    Configured with DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_MAX_IDLE (seconds)
+    and DB_POOL_TIMEOUT (seconds to wait for a free connection).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    min_size=int(os.getenv("DB_POOL_MIN_SIZE") or 1),
+                    max_size=int(os.getenv("DB_POOL_MAX_SIZE") or 5),
+                    max_idle=float(os.getenv("DB_POOL_MAX_IDLE") or 300),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT") or 30),
+                    ping=_ping,
+                    is_closed=lambda conn: conn.closed,
+                    reset=lambda conn: conn.rollback(),
+                    name="postgres pool",
+                )
+    return _pool
+
+
+def get_pool_stats() -> dict:
+    """Checkouts, waits and wait time of the PostgreSQL pool, for monitoring."""
+    return get_postgres_pool().stats()
+
+
+def _get_sessions() -> CursorSessions:
+    global _sessions
+    if _sessions is None:
+        with _pool_lock:
+            if _sessions is None:
+                _sessions = CursorSessions(
+                    ttl=_paging["ttl"], max_sessions=_paging["max_sessions"]
+                )
+    return _sessions
+
+
+def _is_broken(exc: Exception) -> bool:
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def _database_key() -> str:
+    return f"postgres://{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+
+
+def get_cache_stats() -> dict:
+    """Hits, misses and size of the shared SQL result cache."""
+    return query_cache.stats()
+
+
+async def async_execute_query(
+    input_query: str = "",
+    page_token: Optional[str] = None,
+    use_cache: bool = True,
+    output_format: Optional[str] = None,
+) -> json:
+    return await asyncio.to_thread(
+        execute_query, input_query, page_token, use_cache, output_format
+    )
+
+
+def execute_query(
+    input_query: str = "",
+    page_token: Optional[str] = None,
+    use_cache: bool = True,
+    output_format: Optional[str] = None,
+) -> json:
     """
     Executes a read-only SQL query on a PostgreSQL database.
 
+    Rows are streamed through a server-side cursor: only the first page is
+    returned, together with a `next_page_token` when more rows are available.
+    The total number of rows is capped by DB_MAX_ROWS.
+
     Args:
         input_query (str): A raw SQL query string (e.g., 'SELECT COUNT(*) FROM users;').
         Only SELECT statements are allowed.
+        page_token (str, optional): Continuation token returned by a previous call;
+        when given, the next page of that query is returned and input_query is ignored.
+        use_cache (bool): Serve complete results from the TTL cache (DB_CACHE_TTL).
+        Pass False to force a fresh read.
+        output_format (str, optional): Layout of the rows: "csv" (default, set by
+        SQL_OUTPUT_FORMAT), "tsv", "columns" (column list + row arrays) or "json"
+        (one object per row). Pages of a page_token keep the format of the first call.
 
     Returns:
         str: A JSON string containing the query results or an error message.
     """
+    sessions = _get_sessions()
+    sessions.purge_expired()
+
+    if page_token:
+        return _next_page(sessions, page_token)
+
     if not input_query.strip().upper().startswith("SELECT"):
-        return json.dumps(
+        return dumps(
             {
                 "status": "error",
                 "message": "Operation not allowed. Only read-only queries (SELECT) are permitted.",
             }
         )
 
-    conn = None
+    fmt = resolve_format(output_format)
+    if fmt is None:
+        return dumps(format_error(output_format))
+
+    if use_cache:
+        cached = query_cache.get(_database_key(), input_query, fmt)
+        if cached is not None:
+            return cached
+
+    # Unknown tables/columns are rejected without a database round trip
+    rejection = validate_query(input_query, "postgres")
+    if rejection is not None:
+        return dumps(rejection)
+
+    pool = get_postgres_pool()
     try:
-        conn = get_postgres_connection()
+        conn = pool.acquire()
+    except (psycopg2.Error, PoolTimeoutError) as e:
+        return dumps(
+            {"status": "error", "message": f"Database connection error: {e}"}
+        )
 
-        if isinstance(conn, Exception):
-            return json.dumps(
-                {"status": "error", "message": f"Database connection error: {conn}"}
-            )
+    session = None
+    try:
+        query = input_query
+        if _guard["auto_limit"]:
+            # One row over the cap so truncation is still detected
+            query = ensure_limit(input_query, _paging["max_rows"] + 1, "postgres")
+
+        rejection = _preflight(conn, query)
+        if rejection is not None:
+            pool.release(conn)
+            return dumps(rejection)
+
+        # Named cursor = server-side cursor: rows stay in PostgreSQL until fetched
+        cur = conn.cursor(name=f"agent_{uuid.uuid4().hex}")
+        cur.itersize = _paging["page_size"]
+        session = CursorSession(conn, cur, pool.release, _paging["max_rows"], fmt)
+        cur.execute(query)
+
+        rows, has_more, truncated = session.fetch_page(_paging["page_size"])
+        token = None
+        if has_more:
+            token = sessions.add(session)
+        else:
+            session.close()
+
+        output = dumps(
+            page_response(session, rows, token, truncated, _paging["max_rows"])
+        )
+        if token is None:
+            # Only complete results: a page token points to a live cursor
+            query_cache.set(_database_key(), input_query, output, _cache_ttl, fmt)
+        return output
+
+    except pg_errors.QueryCanceled:
+        _close(session, pool, conn, False)
+        return dumps(timeout_rejection(_guard["timeout"]))
+
+    except psycopg2.Error as e:
+        _close(session, pool, conn, _is_broken(e))
+        return dumps({"status": "error", "message": f"Query execution error: {e}"})
+
+    except Exception as e:
+        _close(session, pool, conn, False)
+        return dumps(
+            {"status": "error", "message": f"An unexpected error occurred: {e}"}
+        )
 
-        with conn.cursor() as cur:
-            cur.execute(input_query)
-
-            if not cur.description:
-                return json.dumps(
-                    {
-                        "status": "success",
-                        "results": [],
-                        "row_count": 0,
-                        "message": "Query executed successfully, but it did not return any data.",
-                    }
-                )
 
-            columns = [desc[0] for desc in cur.description]
-            results = cur.fetchall()
+def _next_page(sessions: CursorSessions, page_token: str) -> json:
+    session = sessions.take(page_token)
+    if session is None:
+        return dumps(
+            {
+                "status": "error",
+                "message": "Invalid or expired page_token. Run the query again.",
+            }
+        )
 
-            formatted_results = [dict(zip(columns, row)) for row in results]
+    try:
+        rows, has_more, truncated = session.fetch_page(_paging["page_size"])
+        if has_more:
+            sessions.put_back(page_token, session)
+        else:
+            session.close()
 
-            return json.dumps(
-                {
-                    "status": "success",
-                    "results": formatted_results,
-                    "row_count": len(formatted_results),
-                }
+        return dumps(
+            page_response(
+                session,
+                rows,
+                page_token if has_more else None,
+                truncated,
+                _paging["max_rows"],
             )
+        )
+
+    except pg_errors.QueryCanceled:
+        session.close()
+        return dumps(timeout_rejection(_guard["timeout"]))
 
     except psycopg2.Error as e:
-        return json.dumps({"status": "error", "message": f"Query execution error: {e}"})
+        session.close(discard=_is_broken(e))
+        return dumps({"status": "error", "message": f"Query execution error: {e}"})
 
     except Exception as e:
-        return json.dumps(
+        session.close()
+        return dumps(
             {"status": "error", "message": f"An unexpected error occurred: {e}"}
         )
 
-    finally:
-        if conn and not isinstance(conn, Exception):
-            conn.close()
+
+def _preflight(conn, query: str) -> Optional[dict]:
+    """
+    Sets the statement timeout of the transaction (DB_STATEMENT_TIMEOUT) and
+    rejects the query if its EXPLAIN cost is over DB_MAX_QUERY_COST.
+    """
+    with conn.cursor() as cur:
+        if _guard["timeout"] > 0:
+            # SET LOCAL: also bounds the FETCHes of later pages, reset on rollback
+            cur.execute(
+                f"SET LOCAL statement_timeout = {int(_guard['timeout'] * 1000)}"
+            )
+        if _guard["max_cost"] <= 0:
+            return None
+
+        cur.execute(f"EXPLAIN (FORMAT JSON) {query}")
+        plan = cur.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    cost, rows = float(root["Total Cost"]), float(root["Plan Rows"])
+    if cost > _guard["max_cost"]:
+        return cost_rejection(cost, rows, _guard["max_cost"])
+    return None
+
+
+def _close(session, pool, conn, broken: bool) -> None:
+    if session is not None:
+        session.close(discard=broken)
+    else:
+        pool.release(conn, discard=broken)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+import os
+import re
+from typing import Optional
+
+from .ttl_cache import TTLCache
+
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\[[^\]]*\])")
+_SPACES = re.compile(r"\s+")
+_WORDS = re.compile(r"\b[A-Za-z_]+\b")
+# Solo se normaliza la capitalización de las palabras clave: los
+# identificadores pueden distinguir mayúsculas (collations de SQL Server)
+_KEYWORDS = {
+    "select", "distinct", "top", "from", "join", "inner", "left", "right", "full",
+    "outer", "cross", "on", "using", "where", "and", "or", "not", "in", "exists",
+    "between", "like", "ilike", "is", "null", "as", "group", "by", "having",
+    "order", "asc", "desc", "limit", "offset", "fetch", "next", "rows", "only",
+    "union", "all", "intersect", "except", "with", "case", "when", "then",
+    "else", "end", "true", "false", "count", "sum", "avg", "min", "max",
+}
+
+
+def _lower_keyword(match: re.Match) -> str:
+    word = match.group(0)
+    return word.lower() if word.lower() in _KEYWORDS else word
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normaliza espacios, palabras clave y `;` final; los identificadores y los
+    literales entre comillas se mantienen tal cual.
+    """
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    return "".join(
+        part if idx % 2 else _WORDS.sub(_lower_keyword, _SPACES.sub(" ", part))
+        for idx, part in enumerate(parts)
+    )
+
+
+class QueryCache(TTLCache):
+    """Caché LRU con TTL de resultados de consultas de solo lectura.
+
+    La clave es (base de datos, SQL normalizado, variante), donde la variante
+    distingue respuestas distintas de la misma consulta (p. ej. el formato de
+    salida); el valor es la respuesta ya serializada.
+    """
+
+    def get(self, database: str, sql: str, variant: str = "") -> Optional[str]:
+        return super().get((database, normalize_sql(sql), variant))
+
+    def set(
+        self, database: str, sql: str, value: str, ttl: float, variant: str = ""
+    ) -> None:
+        super().set((database, normalize_sql(sql), variant), value, ttl)
+
+    def invalidate(self, database: Optional[str] = None) -> None:
+        super().invalidate(database)
+
+
+query_cache = QueryCache(
+    max_bytes=int(os.getenv("QUERY_CACHE_MAX_BYTES") or 32 * 1024 * 1024)
+)
@@ -0,0 +1,108 @@
+import importlib
+import importlib.util
+from typing import Any, Callable, Optional, Union
+
+
+def lazy_function(module: str, name: str) -> Callable:
+    """
+    Función que importa `module` (relativo al paquete tools) la primera vez
+    que se llama y delega en su atributo `name`. Así los drivers de base de
+    datos, openpyxl o aiosmtplib solo se cargan si se usa la herramienta.
+    """
+    target = None
+
+    def resolve() -> Callable:
+        nonlocal target
+        if target is None:
+            target = getattr(importlib.import_module(module, __package__), name)
+        return target
+
+    def call(*args, **kwargs):
+        return resolve()(*args, **kwargs)
+
+    call.__name__ = call.__qualname__ = name
+    call.resolve = resolve
+    return call
+
+
+class ToolSpec:
+    """Herramienta registrada: su función y los metadatos que usa el runtime.
+
+    Args:
+        function: Función de la herramienta, o su nombre en `module`. Los
+            agentes asíncronos la ejecutan en el pool de hilos de ToolExecutor.
+        module: Módulo de tools que define la función; si se indica, no se
+            importa hasta la primera llamada.
+        batch: El módulo define `<función>_batch`, que recibe en una sola
+            llamada las llamadas en paralelo de una respuesta.
+        requires: Paquetes que deben estar instalados para registrar la herramienta.
+        idempotent: Sin efectos secundarios: llamadas idénticas devuelven lo
+            mismo, así que pueden compartir ejecución o servirse de caché.
+        idempotent_if: Función (kwargs) que dice si una llamada concreta es
+            idempotente; las que no (p. ej. pedir la página siguiente de un
+            cursor) se ejecutan siempre por separado y no se cachean.
+        cache_ttl: Segundos durante los que se reutiliza el resultado de una
+            llamada idéntica (0 = sin caché). Solo para herramientas idempotentes.
+        cache_if: Función (kwargs, salida) que decide si una salida se guarda en
+            caché (por defecto, todas las que no son una excepción).
+        max_concurrency: Máximo de llamadas simultáneas entre todos los usuarios.
+        concurrency_key: Argumento por cuyo valor se aplica max_concurrency.
+        timeout: Segundos antes de cancelar la llamada (0 = sin límite).
+        max_output_tokens: Recorte de la salida en tokens (0 = sin límite).
+        max_output_bytes: Recorte de la salida en bytes (0 = sin límite).
+    """
+
+    def __init__(
+        self,
+        function: Union[Callable, str],
+        module: Optional[str] = None,
+        batch: bool = False,
+        requires: tuple = (),
+        idempotent: bool = False,
+        idempotent_if: Optional[Callable[[dict], bool]] = None,
+        cache_ttl: float = 0,
+        cache_if: Optional[Callable[[dict, Any], bool]] = None,
+        max_concurrency: Optional[int] = None,
+        concurrency_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_output_tokens: Optional[int] = None,
+        max_output_bytes: Optional[int] = None,
+    ):
+        if cache_ttl and not idempotent:
+            raise ValueError("cache_ttl requires an idempotent tool")
+
+        if module is not None:
+            function = lazy_function(module, function)
+            if batch:
+                function.batch = lazy_function(module, f"{function.__name__}_batch")
+
+        self.function = function
+        self.requires = requires
+        self.idempotent = idempotent
+        self.idempotent_if = idempotent_if
+        self.cache_ttl = cache_ttl
+        self.cache_if = cache_if
+        self.max_concurrency = max_concurrency
+        self.concurrency_key = concurrency_key
+        self.timeout = timeout
+        self.max_output_tokens = max_output_tokens
+        self.max_output_bytes = max_output_bytes
+
+    def available(self) -> bool:
+        """Si están instalados los paquetes que necesita (sin importarlos)."""
+        return all(importlib.util.find_spec(package) is not None for package in self.requires)
+
+    def settings(self) -> dict:
+        """Ajustes para ToolExecutor/ToolRunner (solo los que difieren del valor por defecto)."""
+        settings = {
+            "idempotent": self.idempotent or None,
+            "idempotent_if": self.idempotent_if,
+            "cache_ttl": self.cache_ttl or None,
+            "cache_if": self.cache_if,
+            "max_concurrency": self.max_concurrency,
+            "concurrency_key": self.concurrency_key,
+            "timeout": self.timeout,
+            "max_output_tokens": self.max_output_tokens,
+            "max_output_bytes": self.max_output_bytes,
+        }
+        return {key: value for key, value in settings.items() if value is not None}
@@ -0,0 +1,58 @@
+import csv
+import io
+import os
+from typing import Optional
+
+from .serialization import adapt
+
+# csv / tsv: cabecera + una línea por fila; columns: cabecera + filas como
+# arrays; json: un objeto por fila (formato anterior, el más caro en tokens)
+FORMATS = ("csv", "tsv", "columns", "json")
+DEFAULT_FORMAT = (os.getenv("SQL_OUTPUT_FORMAT") or "csv").strip().lower()
+if DEFAULT_FORMAT not in FORMATS:
+    print(f"SQL_OUTPUT_FORMAT '{DEFAULT_FORMAT}' is not valid, using csv")
+    DEFAULT_FORMAT = "csv"
+
+
+def resolve_format(output_format: Optional[str]) -> Optional[str]:
+    """Formato pedido (o el por defecto); None si no es válido."""
+    fmt = (output_format or DEFAULT_FORMAT).strip().lower()
+    return fmt if fmt in FORMATS else None
+
+
+def format_error(output_format: str) -> dict:
+    return {
+        "status": "error",
+        "message": f"Invalid output_format '{output_format}'. Use one of: {', '.join(FORMATS)}.",
+    }
+
+
+def _text(value) -> str:
+    return "" if value is None else str(adapt(value))
+
+
+def encode_rows(columns: list[str], rows: list, output_format: str) -> dict:
+    """Campos de la respuesta con las filas en el formato indicado."""
+    if output_format == "json":
+        return {"results": [dict(zip(columns, row)) for row in rows]}
+
+    if output_format == "columns":
+        return {"columns": columns, "rows": [list(row) for row in rows]}
+
+    if output_format == "tsv":
+        # Tabuladores y saltos de línea dentro de un valor romperían la tabla
+        lines = ["\t".join(columns)]
+        for row in rows:
+            lines.append(
+                "\t".join(
+                    _text(v).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+                    for v in row
+                )
+            )
+        return {"format": "tsv", "results": "\n".join(lines)}
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows([_text(v) for v in row] for row in rows)
+    return {"format": "csv", "results": buffer.getvalue().rstrip("\n")}
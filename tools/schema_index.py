@@ -0,0 +1,199 @@
+import asyncio
+import json
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from .serialization import dumps
+
+_SNAPSHOT_PATH = Path(__file__).with_name("schema_snapshot.json")
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+_CAMEL = re.compile(r"([a-z0-9])([A-Z])")
+_MAX_TOP_K = 25
+_MAX_COLUMNS = 40
+_NAME_WEIGHT = 3  # los términos del nombre de la tabla cuentan más que los de columnas
+
+
+def _stem(token: str) -> str:
+    # Plural inglés simple: partners -> partner, users -> user
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Separa identificadores en términos (`res_partner`, `ResPartner` -> res, partner).
+
+    Los identificadores compuestos se conservan además completos para que una
+    coincidencia exacta con el nombre de una tabla puntúe más.
+    """
+    tokens = []
+    for word in _WORD.findall(text or ""):
+        parts = [p for p in _CAMEL.sub(r"\1_\2", word).lower().split("_") if p]
+        tokens.extend(_stem(p) for p in parts)
+        if len(parts) > 1:
+            tokens.append(word.lower())
+    return tokens
+
+
+class SchemaIndex:
+    """Índice BM25 en memoria sobre el esquema de la base de datos.
+
+    Cada tabla es un documento formado por su nombre, sus columnas y su
+    comentario. Permite al modelo buscar las tablas relevantes en lugar de
+    recibir el esquema completo en el prompt.
+    """
+
+    def __init__(self, tables: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.tables = tables
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._lengths: list[int] = []
+
+        for doc_id, table in enumerate(tables):
+            terms = Counter(self._document(table))
+            self._lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, []).append((doc_id, tf))
+
+        n_docs = len(tables)
+        self._avg_length = sum(self._lengths) / n_docs if n_docs else 0.0
+        self._idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self._postings.items()
+        }
+
+    @staticmethod
+    def _document(table: dict) -> list[str]:
+        terms = tokenize(table["table_name"]) * _NAME_WEIGHT
+        for column in table.get("columns") or []:
+            terms += tokenize(column["name"] if isinstance(column, dict) else column)
+        terms += tokenize(table.get("comment") or "")
+        return terms
+
+    def search(self, query: str, top_k: int = 8) -> list[tuple[dict, float]]:
+        """Devuelve hasta `top_k` pares (tabla, puntuación) ordenados por relevancia."""
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self._postings[term]:
+                norm = 1 - self.b + self.b * self._lengths[doc_id] / self._avg_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (
+                    tf + self.k1 * norm
+                )
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.tables[doc_id], score) for doc_id, score in ranked[:top_k]]
+
+
+_index: Optional[SchemaIndex] = None
+_lock = threading.Lock()
+
+
+def load_snapshot(path: Path = _SNAPSHOT_PATH) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["tables"]
+
+
+def get_schema_index() -> SchemaIndex:
+    """Índice del proceso; por defecto se construye con el snapshot del esquema."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = SchemaIndex(load_snapshot())
+    return _index
+
+
+def set_schema_tables(tables: list[dict]) -> None:
+    """Reemplaza el esquema indexado (p. ej. tras introspeccionar la base de datos)."""
+    global _index
+    index = SchemaIndex(tables)
+    with _lock:
+        _index = index
+
+
+def _describe(table: dict, score: float) -> dict:
+    result = {"table_name": table["table_name"], "score": round(score, 3)}
+    if table.get("database"):
+        result["database"] = table["database"]
+    if table.get("row_estimate") is not None:
+        result["row_estimate"] = table["row_estimate"]
+    columns = [
+        f"{c['name']} {c['type']}" if isinstance(c, dict) else c
+        for c in table.get("columns") or []
+    ]
+    if columns:
+        result["columns"] = columns[:_MAX_COLUMNS]
+        if len(columns) > _MAX_COLUMNS:
+            result["more_columns"] = len(columns) - _MAX_COLUMNS
+    if table.get("comment"):
+        result["comment"] = table["comment"]
+    return result
+
+
+def _ensure_catalog() -> None:
+    # El catálogo (si hay bases de datos configuradas) sustituye al snapshot
+    from .catalog import start_catalog
+
+    try:
+        start_catalog()
+    except Exception as e:
+        print(f"Catalog not available, using schema snapshot: {e}")
+
+
+def find_tables(query: str = "", top_k: int = 8) -> json:
+    """
+    Busca en el esquema de la base de datos las tablas relevantes para una consulta.
+
+    Args:
+        query (str): Palabras clave (en inglés, como los nombres de Odoo),
+        p. ej. "invoice customer partner".
+        top_k (int): Número máximo de tablas a devolver (1-25).
+
+    Returns:
+        str: JSON con las tablas encontradas, sus columnas si se conocen y su puntuación.
+    """
+    if not query or not query.strip():
+        return dumps(
+            {"status": "error", "message": "Indica palabras clave para buscar tablas."}
+        )
+
+    top_k = max(1, min(int(top_k or 8), _MAX_TOP_K))
+    _ensure_catalog()
+    try:
+        matches = get_schema_index().search(query, top_k)
+    except Exception as e:
+        return dumps(
+            {"status": "error", "message": f"Schema index error: {e}"}
+        )
+
+    if not matches:
+        return dumps(
+            {
+                "status": "success",
+                "tables": [],
+                "message": "No se encontraron tablas. Prueba con otras palabras clave en inglés.",
+            }
+        )
+
+    return dumps(
+        {
+            "status": "success",
+            "tables": [_describe(table, score) for table, score in matches],
+        }
+    )
+
+
+async def async_find_tables(query: str = "", top_k: int = 8) -> json:
+    return await asyncio.to_thread(find_tables, query, top_k)
+
+
+if __name__ == "__main__":
+    print(find_tables("partner bank account"))
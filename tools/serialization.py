@@ -0,0 +1,85 @@
+import base64
+import datetime
+import json
+import uuid
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la stdlib
+    orjson = None
+
+# Tipos que devuelven psycopg2/pyodbc y que json no sabe serializar.
+# Decimal se pasa a texto para no perder precisión (importes, cantidades).
+_ADAPTERS: dict[type, Callable[[Any], Any]] = {
+    Decimal: str,
+    datetime.datetime: lambda v: v.isoformat(),
+    datetime.date: lambda v: v.isoformat(),
+    datetime.time: lambda v: v.isoformat(),
+    datetime.timedelta: str,
+    uuid.UUID: str,
+    bytes: lambda v: base64.b64encode(v).decode("ascii"),
+    bytearray: lambda v: base64.b64encode(v).decode("ascii"),
+    memoryview: lambda v: base64.b64encode(v).decode("ascii"),  # bytea de psycopg2
+    Enum: lambda v: v.value,
+    set: list,
+    frozenset: list,
+}
+
+
+def register_adapter(type_: type, adapter: Callable[[Any], Any]) -> None:
+    """
+    Registra cómo serializar un tipo (y sus subclases): `adapter(valor)` debe
+    devolver un valor que JSON sí entienda.
+
+    Con orjson los tipos que soporta de forma nativa (datetime, date, time,
+    UUID, Enum) no pasan por los adaptadores; se serializan en ISO 8601 y
+    como texto, igual que con los adaptadores por defecto.
+    """
+    _ADAPTERS[type_] = adapter
+
+
+def adapt(value: Any) -> Any:
+    """Valor compatible con JSON para `value` (sin cambios si no hay adaptador)."""
+    for cls in type(value).__mro__:
+        adapter = _ADAPTERS.get(cls)
+        if adapter is not None:
+            return adapter(value)
+    return value
+
+
+def _default(value: Any) -> Any:
+    adapted = adapt(value)
+    if adapted is value:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return adapted
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serializa a JSON compacto (UTF-8 sin escapar) con orjson si está
+    instalado y si no con json, usando los adaptadores registrados.
+    """
+    if orjson is None:
+        return _stdlib_dumps(obj)
+    try:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    except orjson.JSONEncodeError:
+        # Casos que orjson no admite (enteros de más de 64 bits...)
+        return _stdlib_dumps(obj)
+
+
+def to_text(value: Any) -> str:
+    """Salida de una herramienta como texto: las cadenas tal cual, el resto en JSON."""
+    if isinstance(value, str):
+        return value
+    try:
+        return dumps(value)
+    except TypeError:
+        return str(value)
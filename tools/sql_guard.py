@@ -0,0 +1,90 @@
+import os
+
+from .sql_validation import scan_sql
+
+# Cláusulas de nivel superior que ya limitan (o impiden limitar) el resultado
+_PG_NO_LIMIT = {"limit", "fetch", "offset", "for"}
+_MSSQL_NO_TOP = {"top", "offset", "fetch", "for", "union", "intersect", "except"}
+
+
+def guard_settings(prefix: str, default_max_cost: float) -> dict:
+    """Límites de coste de una base de datos según las variables de entorno.
+
+    - {prefix}_MAX_QUERY_COST: coste máximo estimado por EXPLAIN (0 lo desactiva)
+    - {prefix}_STATEMENT_TIMEOUT: segundos máximos por sentencia (0 lo desactiva)
+    - {prefix}_AUTO_LIMIT: añadir LIMIT/TOP a las consultas que no lo tengan
+    """
+    return {
+        "max_cost": float(os.getenv(f"{prefix}_MAX_QUERY_COST") or default_max_cost),
+        "timeout": float(os.getenv(f"{prefix}_STATEMENT_TIMEOUT") or 30),
+        "auto_limit": os.getenv(f"{prefix}_AUTO_LIMIT", "true").lower() != "false",
+    }
+
+
+def ensure_limit(sql: str, limit: int, dialect: str) -> str:
+    """
+    Añade `LIMIT n` (postgres) o `TOP (n)` (sqlserver) si la consulta no limita
+    ya sus filas. La consulta se devuelve sin cambios si no es seguro hacerlo
+    (varias sentencias, FOR UPDATE/XML, UNION en SQL Server...).
+    """
+    tokens = scan_sql(sql)
+    if not tokens:
+        return sql
+
+    if tokens[-1][1] == ";":
+        tokens = tokens[:-1]
+    if not tokens or any(value == ";" for _, value, _, _ in tokens):
+        return sql
+    # Sin el `;` final ni comentarios al final, para poder añadir texto detrás
+    sql = sql[: tokens[-1][3]]
+
+    depth = 0
+    top_level = []
+    for kind, value, start, end in tokens:
+        if value == "(":
+            depth += 1
+        elif value == ")":
+            depth -= 1
+        elif depth == 0 and kind == "keyword":
+            top_level.append((value.lower(), end))
+    words = {word for word, _ in top_level}
+
+    if dialect == "postgres":
+        if words & _PG_NO_LIMIT:
+            return sql
+        return f"{sql}\nLIMIT {int(limit)}"
+
+    if words & _MSSQL_NO_TOP or not top_level or top_level[0][0] != "select":
+        return sql
+    insert_at = top_level[0][1]
+    if len(top_level) > 1 and top_level[1][0] in ("distinct", "all"):
+        insert_at = top_level[1][1]
+    return f"{sql[:insert_at]} TOP ({int(limit)}){sql[insert_at:]}"
+
+
+def cost_rejection(cost: float, rows: float, max_cost: float) -> dict:
+    return {
+        "status": "error",
+        "error_type": "cost_limit",
+        "message": (
+            f"Query rejected before execution: estimated cost {cost:,.0f} exceeds "
+            f"the limit of {max_cost:,.0f} (about {rows:,.0f} rows). Rewrite it with "
+            "selective WHERE filters, a join condition for every table, aggregation "
+            "(COUNT/SUM/GROUP BY) or fewer rows."
+        ),
+        "estimated_cost": cost,
+        "max_cost": max_cost,
+        "estimated_rows": rows,
+    }
+
+
+def timeout_rejection(timeout: float) -> dict:
+    return {
+        "status": "error",
+        "error_type": "timeout",
+        "message": (
+            f"Query cancelled after {timeout:g}s (statement timeout). Narrow it with "
+            "WHERE filters or aggregation, or query fewer rows."
+        ),
+        "timeout": timeout,
+    }
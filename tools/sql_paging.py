@@ -0,0 +1,160 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from .result_format import DEFAULT_FORMAT, encode_rows
+
+
+class CursorSession:
+    """Cursor abierto sobre una conexión prestada por el pool.
+
+    Lee el resultado por páginas con `fetchmany`, de modo que nunca se carga
+    en memoria más de una página (más una fila de adelanto).
+    """
+
+    def __init__(
+        self,
+        conn,
+        cursor,
+        release: Callable[..., None],
+        max_rows: int,
+        output_format: str = DEFAULT_FORMAT,
+    ):
+        self.conn = conn
+        self.cursor = cursor
+        self.columns: Optional[list[str]] = None
+        self.max_rows = max_rows
+        self.output_format = output_format
+        self.fetched = 0
+        self.last_used = time.monotonic()
+        self._release = release
+        self._pending: list = []
+        self._exhausted = False
+
+    def fetch_page(self, page_size: int) -> tuple[list, bool, bool]:
+        """Devuelve (filas, hay_más, truncado) de la siguiente página; las filas
+        son las tuplas del driver, en el orden de `self.columns`."""
+        self.last_used = time.monotonic()
+        size = min(page_size, self.max_rows - self.fetched)
+
+        rows = self._pending
+        self._pending = []
+        if not self._exhausted and len(rows) <= size:
+            # Una fila de más para saber si queda algo sin pedir otra página
+            fetched = self.cursor.fetchmany(size + 1 - len(rows))
+            if len(fetched) < size + 1 - len(rows):
+                self._exhausted = True
+            rows += fetched
+
+        if self.columns is None and self.cursor.description:
+            self.columns = [desc[0] for desc in self.cursor.description]
+
+        page, self._pending = rows[:size], rows[size:]
+        self.fetched += len(page)
+        has_more = bool(self._pending)
+        truncated = has_more and self.fetched >= self.max_rows
+
+        return page, has_more and not truncated, truncated
+
+    def close(self, discard: bool = False) -> None:
+        try:
+            self.cursor.close()
+        except Exception:
+            discard = True
+        self._release(self.conn, discard=discard)
+
+
+class CursorSessions:
+    """Registro de cursores abiertos indexados por token de continuación.
+
+    Cada sesión retiene una conexión del pool, por eso se limita el número de
+    sesiones y se cierran las que llevan más de `ttl` segundos sin usarse.
+    """
+
+    def __init__(self, ttl: float = 120.0, max_sessions: int = 2):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, CursorSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session: CursorSession) -> str:
+        token = secrets.token_urlsafe(12)
+        evicted = []
+        with self._lock:
+            self._sessions[token] = session
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+
+        for old in evicted:
+            old.close()
+        return token
+
+    def take(self, token: str) -> Optional[CursorSession]:
+        """Saca la sesión del registro mientras se usa (uso exclusivo por hilo)."""
+        with self._lock:
+            return self._sessions.pop(token, None)
+
+    def put_back(self, token: str, session: CursorSession) -> None:
+        with self._lock:
+            self._sessions[token] = session
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                token
+                for token, session in self._sessions.items()
+                if now - session.last_used > self.ttl
+            ]
+            sessions = [self._sessions.pop(token) for token in expired]
+
+        for session in sessions:
+            session.close()
+        return len(sessions)
+
+    def close_all(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+
+        for session in sessions:
+            session.close()
+
+
+def paging_settings(prefix: str) -> dict:
+    """Lee PAGE_SIZE, MAX_ROWS, CURSOR_TTL y MAX_OPEN_CURSORS con el prefijo dado."""
+    return {
+        "page_size": int(os.getenv(f"{prefix}_PAGE_SIZE") or 100),
+        "max_rows": int(os.getenv(f"{prefix}_MAX_ROWS") or 1000),
+        "ttl": float(os.getenv(f"{prefix}_CURSOR_TTL") or 120),
+        "max_sessions": int(os.getenv(f"{prefix}_MAX_OPEN_CURSORS") or 2),
+    }
+
+
+def page_response(
+    session: CursorSession,
+    rows: list,
+    next_page_token: Optional[str],
+    truncated: bool,
+    max_rows: int,
+) -> dict:
+    response = {"status": "success"}
+    response.update(
+        encode_rows(session.columns or [], rows, session.output_format)
+    )
+    response["row_count"] = len(rows)
+    response["next_page_token"] = next_page_token
+    if next_page_token:
+        response["message"] = (
+            "Hay más filas. Llama de nuevo a la herramienta con page_token para obtener la siguiente página."
+        )
+    elif truncated:
+        response["truncated"] = True
+        response["message"] = (
+            f"Resultado truncado en {max_rows} filas. Refina la consulta (WHERE, LIMIT, agregaciones)."
+        )
+    return response
+
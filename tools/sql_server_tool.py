@@ -1,12 +1,62 @@
+import asyncio
 import json
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 import pyodbc
 from dotenv import load_dotenv
 
+from .db_pool import ConnectionPool
+from .query_cache import query_cache
+from .result_format import format_error, resolve_format
+from .serialization import dumps
+from .sql_guard import cost_rejection, ensure_limit, guard_settings, timeout_rejection
+from .sql_paging import CursorSession, CursorSessions, page_response, paging_settings
+from .sql_validation import validate_query
+
 load_dotenv()
 
 
+_pool = None
+_executor = None
+_sessions = None
+_lock = threading.Lock()
+_paging = paging_settings("MSSQL")
+_cache_ttl = float(os.getenv("MSSQL_CACHE_TTL") or 60)
+_guard = guard_settings("MSSQL", default_max_cost=500)
+_PLAN_COST = re.compile(r'StatementSubTreeCost="([^"]+)"')
+_PLAN_ROWS = re.compile(r'StatementEstRows="([^"]+)"')
+
+
+def _connect():
+    driver = os.getenv("MSSQL_DRIVER", "ODBC Driver 18 for SQL Server")
+    server = os.getenv("MSSQL_SERVER")
+    database = os.getenv("MSSQL_DATABASE")
+    user = os.getenv("MSSQL_USER")
+    password = os.getenv("MSSQL_PASSWORD")
+    port = os.getenv("MSSQL_PORT") or "1433"
+
+    if not all([server, database, user, password]):
+        raise Exception(
+            "Faltan variables de entorno requeridas: MSSQL_SERVER, MSSQL_DATABASE, MSSQL_USER, MSSQL_PASSWORD"
+        )
+
+    # Encrypt and TrustServerCertificate options depend on your environment.
+    # For local/dev, TrustServerCertificate=yes is common. Adjust as needed.
+    conn_str = (
+        f"DRIVER={{{driver}}};"
+        f"SERVER={server},{port};"
+        f"DATABASE={database};"
+        f"UID={user};"
+        f"PWD={password};"
+        "Encrypt=yes;TrustServerCertificate=yes;"
+    )
+    return pyodbc.connect(conn_str)
+
+
 def get_sqlserver_connection():
     """Establece una conexión a SQL Server via ODBC.
 
@@ -19,96 +69,301 @@ def get_sqlserver_connection():
       - MSSQL_PORT=1433                               # opcional
     """
     try:
-        driver = os.getenv("MSSQL_DRIVER", "ODBC Driver 18 for SQL Server")
-        server = os.getenv("MSSQL_SERVER")
-        database = os.getenv("MSSQL_DATABASE")
-        user = os.getenv("MSSQL_USER")
-        password = os.getenv("MSSQL_PASSWORD")
-        port = os.getenv("MSSQL_PORT") or "1433"
-
-        if not all([server, database, user, password]):
-            return Exception(
-                "Faltan variables de entorno requeridas: MSSQL_SERVER, MSSQL_DATABASE, MSSQL_USER, MSSQL_PASSWORD"
-            )
-
-        # Encrypt and TrustServerCertificate options depend on your environment.
-        # For local/dev, TrustServerCertificate=yes is common. Adjust as needed.
-        conn_str = (
-            f"DRIVER={{{driver}}};"
-            f"SERVER={server},{port};"
-            f"DATABASE={database};"
-            f"UID={user};"
-            f"PWD={password};"
-            "Encrypt=yes;TrustServerCertificate=yes;"
-        )
-        conn = pyodbc.connect(conn_str)
-        return conn
-    except pyodbc.Error as e:
+        return _connect()
+    except Exception as e:
         return e
 
 
-async def async_execute_sql_server_query(input_query: str) -> json:
-    return execute_sql_server_query(input_query)
+def _ping(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT 1")
+        cur.fetchall()
+    finally:
+        cur.close()
+
+
+def get_sqlserver_pool() -> ConnectionPool:
+    """Pool de conexiones pyodbc compartido por el proceso.
+
+    Se configura con MSSQL_POOL_MIN_SIZE, MSSQL_POOL_MAX_SIZE,
+    MSSQL_POOL_MAX_IDLE (segundos) y MSSQL_POOL_TIMEOUT (segundos de espera).
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    min_size=int(os.getenv("MSSQL_POOL_MIN_SIZE") or 1),
+                    max_size=int(os.getenv("MSSQL_POOL_MAX_SIZE") or 5),
+                    max_idle=float(os.getenv("MSSQL_POOL_MAX_IDLE") or 300),
+                    timeout=float(os.getenv("MSSQL_POOL_TIMEOUT") or 30),
+                    ping=_ping,
+                    is_closed=lambda conn: getattr(conn, "closed", False),
+                    reset=lambda conn: conn.rollback(),
+                    name="sql server pool",
+                )
+    return _pool
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Hilos dedicados: las consultas lentas no ocupan el executor por defecto del loop
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(
+                        os.getenv("MSSQL_MAX_WORKERS")
+                        or get_sqlserver_pool().max_size
+                    ),
+                    thread_name_prefix="mssql",
+                )
+    return _executor
+
+
+def get_pool_stats() -> dict:
+    """Estadísticas del pool de SQL Server (checkouts, esperas, tiempo de espera)."""
+    return get_sqlserver_pool().stats()
+
+
+def _get_sessions() -> CursorSessions:
+    global _sessions
+    if _sessions is None:
+        with _lock:
+            if _sessions is None:
+                _sessions = CursorSessions(
+                    ttl=_paging["ttl"], max_sessions=_paging["max_sessions"]
+                )
+    return _sessions
+
 
+def _is_timeout(exc: Exception) -> bool:
+    # SQLSTATE HYT00: se agotó el tiempo de espera de la consulta (conn.timeout)
+    return bool(exc.args) and exc.args[0] == "HYT00"
 
-def execute_sql_server_query(input_query: str) -> json:
+
+def _is_broken(exc: Exception) -> bool:
+    return isinstance(exc, (pyodbc.OperationalError, pyodbc.InterfaceError))
+
+
+def _database_key() -> str:
+    return (
+        f"mssql://{os.getenv('MSSQL_SERVER')}:{os.getenv('MSSQL_PORT') or '1433'}"
+        f"/{os.getenv('MSSQL_DATABASE')}"
+    )
+
+
+async def async_execute_sql_server_query(
+    input_query: str = "",
+    page_token: Optional[str] = None,
+    use_cache: bool = True,
+    output_format: Optional[str] = None,
+) -> json:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(),
+        execute_sql_server_query,
+        input_query,
+        page_token,
+        use_cache,
+        output_format,
+    )
+
+
+def execute_sql_server_query(
+    input_query: str = "",
+    page_token: Optional[str] = None,
+    use_cache: bool = True,
+    output_format: Optional[str] = None,
+) -> json:
     """
     Ejecuta una consulta de solo lectura (SELECT) en SQL Server.
 
+    Las filas se leen por páginas con `fetchmany`: se devuelve la primera página
+    y un `next_page_token` si quedan filas. El total se limita con MSSQL_MAX_ROWS.
+
     Args:
         input_query (str): Consulta SQL de lectura (SELECT ...)
+        page_token (str, opcional): Token devuelto por una llamada anterior para
+            obtener la siguiente página (se ignora input_query).
+        use_cache (bool): Usar la caché de resultados (MSSQL_CACHE_TTL). False
+            fuerza una lectura nueva.
+        output_format (str, opcional): Formato de las filas: "csv" (por defecto,
+            SQL_OUTPUT_FORMAT), "tsv", "columns" (columnas + filas como arrays) o
+            "json" (un objeto por fila). Las páginas siguientes usan el de la primera.
 
     Returns:
         str: JSON serializado con resultados o mensaje de error.
     """
+    sessions = _get_sessions()
+    sessions.purge_expired()
+
+    if page_token:
+        return _next_page(sessions, page_token)
+
     if not input_query or not input_query.strip().upper().startswith("SELECT"):
-        return json.dumps(
+        return dumps(
             {
                 "status": "error",
                 "message": "Operación no permitida. Solo se permiten consultas de lectura (SELECT).",
             }
         )
 
-    conn = None
+    fmt = resolve_format(output_format)
+    if fmt is None:
+        return dumps(format_error(output_format))
+
+    if use_cache:
+        cached = query_cache.get(_database_key(), input_query, fmt)
+        if cached is not None:
+            return cached
+
+    # Tablas/columnas inexistentes se rechazan sin ir a la base de datos
+    rejection = validate_query(input_query, "sqlserver")
+    if rejection is not None:
+        return dumps(rejection)
+
+    pool = get_sqlserver_pool()
     try:
-        conn = get_sqlserver_connection()
-        if isinstance(conn, Exception):
-            return json.dumps(
-                {"status": "error", "message": f"Error de conexión: {conn}"}
-            )
+        conn = pool.acquire()
+    except Exception as e:
+        return dumps({"status": "error", "message": f"Error de conexión: {e}"})
 
-        with conn.cursor() as cur:
-            cur.execute(input_query)
-
-            if not cur.description:
-                return json.dumps(
-                    {
-                        "status": "success",
-                        "results": [],
-                        "row_count": 0,
-                        "message": "Consulta ejecutada correctamente, sin filas devueltas.",
-                    }
-                )
+    query = input_query
+    if _guard["auto_limit"]:
+        # Una fila más que el máximo para seguir detectando el truncado
+        query = ensure_limit(input_query, _paging["max_rows"] + 1, "sqlserver")
 
-            columns = [desc[0] for desc in cur.description]
-            rows = cur.fetchall()
-            formatted_results = [dict(zip(columns, row)) for row in rows]
+    try:
+        rejection = _preflight(conn, query)
+    except pyodbc.Error as e:
+        # La sesión puede haber quedado con SHOWPLAN activo: no se reutiliza
+        pool.release(conn, discard=True)
+        return dumps({"status": "error", "message": f"Error ejecutando la consulta: {e}"})
+    if rejection is not None:
+        pool.release(conn)
+        return dumps(rejection)
 
-            return json.dumps(
+    session = None
+    try:
+        cur = conn.cursor()
+        session = CursorSession(conn, cur, pool.release, _paging["max_rows"], fmt)
+        cur.execute(query)
+
+        if not cur.description:
+            session.close()
+            return dumps(
                 {
                     "status": "success",
-                    "results": formatted_results,
-                    "row_count": len(formatted_results),
+                    "results": [],
+                    "row_count": 0,
+                    "message": "Consulta ejecutada correctamente, sin filas devueltas.",
                 }
             )
 
+        rows, has_more, truncated = session.fetch_page(_paging["page_size"])
+        token = None
+        if has_more:
+            token = sessions.add(session)
+        else:
+            session.close()
+
+        output = dumps(
+            page_response(session, rows, token, truncated, _paging["max_rows"])
+        )
+        if token is None:
+            # Solo resultados completos: un page_token apunta a un cursor vivo
+            query_cache.set(_database_key(), input_query, output, _cache_ttl, fmt)
+        return output
+
     except pyodbc.Error as e:
-        return json.dumps({"status": "error", "message": f"Error ejecutando la consulta: {e}"})
+        if _is_timeout(e):
+            _close(session, pool, conn, False)
+            return dumps(timeout_rejection(_guard["timeout"]))
+        _close(session, pool, conn, _is_broken(e))
+        return dumps({"status": "error", "message": f"Error ejecutando la consulta: {e}"})
     except Exception as e:
-        return json.dumps({"status": "error", "message": f"Error inesperado: {e}"})
+        _close(session, pool, conn, False)
+        return dumps({"status": "error", "message": f"Error inesperado: {e}"})
+
+
+def _next_page(sessions: CursorSessions, page_token: str) -> json:
+    session = sessions.take(page_token)
+    if session is None:
+        return dumps(
+            {
+                "status": "error",
+                "message": "page_token inválido o expirado. Ejecuta la consulta de nuevo.",
+            }
+        )
+
+    try:
+        rows, has_more, truncated = session.fetch_page(_paging["page_size"])
+        if has_more:
+            sessions.put_back(page_token, session)
+        else:
+            session.close()
+
+        return dumps(
+            page_response(
+                session,
+                rows,
+                page_token if has_more else None,
+                truncated,
+                _paging["max_rows"],
+            )
+        )
+
+    except pyodbc.Error as e:
+        if _is_timeout(e):
+            session.close()
+            return dumps(timeout_rejection(_guard["timeout"]))
+        session.close(discard=_is_broken(e))
+        return dumps({"status": "error", "message": f"Error ejecutando la consulta: {e}"})
+    except Exception as e:
+        session.close()
+        return dumps({"status": "error", "message": f"Error inesperado: {e}"})
+
+
+def _preflight(conn, query: str) -> Optional[dict]:
+    """
+    Fija el timeout de la conexión (MSSQL_STATEMENT_TIMEOUT) y rechaza la
+    consulta si el coste estimado del plan supera MSSQL_MAX_QUERY_COST.
+    """
+    # pyodbc: segundos por sentencia, 0 = sin límite
+    conn.timeout = int(_guard["timeout"])
+    if _guard["max_cost"] <= 0:
+        return None
+
+    cur = conn.cursor()
+    try:
+        cur.execute("SET SHOWPLAN_XML ON")
+        try:
+            # Con SHOWPLAN la consulta no se ejecuta: devuelve el plan estimado
+            cur.execute(query)
+            plan = cur.fetchone()[0]
+        finally:
+            cur.execute("SET SHOWPLAN_XML OFF")
     finally:
-        if conn and not isinstance(conn, Exception):
-            conn.close()
+        cur.close()
+
+    cost = _PLAN_COST.search(plan or "")
+    if cost is None:
+        return None
+    rows = _PLAN_ROWS.search(plan)
+    cost, rows = float(cost.group(1)), float(rows.group(1)) if rows else 0.0
+    if cost > _guard["max_cost"]:
+        return cost_rejection(cost, rows, _guard["max_cost"])
+    return None
+
+
+def _close(session, pool, conn, broken: bool) -> None:
+    if session is not None:
+        session.close(discard=broken)
+    else:
+        pool.release(conn, discard=broken)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,326 @@
+import difflib
+import os
+import re
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_TOKEN = re.compile(
+    r"""
+      (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*'|N'(?:[^']|'')*')
+    | (?P<quoted>"(?:[^"]|"")*"|\[[^\]]*\]|`[^`]*`)
+    | (?P<word>[A-Za-z_#@][A-Za-z0-9_$#@]*)
+    | (?P<number>\d+(?:\.\d+)?)
+    | (?P<punct>[.,();*])
+    | (?P<other>\S)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Palabras que no pueden ser alias de una tabla
+_KEYWORDS = {
+    "all", "and", "anti", "apply", "as", "asc", "between", "by", "case", "cross",
+    "desc", "distinct", "else", "end", "except", "exists", "fetch", "for", "from",
+    "full", "group", "having", "in", "inner", "intersect", "is", "join", "lateral",
+    "left", "like", "limit", "natural", "not", "null", "offset", "on", "only", "option",
+    "or", "order", "outer", "pivot", "right", "select", "semi", "tablesample", "then",
+    "top", "union", "unpivot", "using", "values", "when", "where", "window", "with",
+}
+_CLAUSE_END = {
+    "where", "group", "order", "having", "limit", "offset", "fetch", "union",
+    "intersect", "except", "window", "for", "option", "on", "using",
+}
+_SYSTEM_SCHEMAS = {"pg_catalog", "information_schema", "sys"}
+
+
+def scan_sql(sql: str) -> list[tuple[str, str, int, int]]:
+    """Tokens (tipo, valor, inicio, fin) de una consulta, sin comentarios.
+
+    Tipos: word, keyword, string, number, punct, other. Los identificadores
+    entre comillas o corchetes se devuelven como `word` sin las comillas.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "comment":
+            continue
+        if kind == "quoted":
+            kind, value = "word", value[1:-1]
+        elif kind == "word":
+            kind = "keyword" if value.lower() in _KEYWORDS else "word"
+        tokens.append((kind, value, match.start(), match.end()))
+    return tokens
+
+
+def _tokenize(sql: str) -> list[tuple[str, str]]:
+    return [(kind, value) for kind, value, _, _ in scan_sql(sql)]
+
+
+class _Scope:
+    """Alias visibles en una consulta; las subconsultas ven también los de fuera."""
+
+    def __init__(self, parent: Optional["_Scope"] = None):
+        self.parent = parent
+        self.aliases: dict[str, set[Optional[str]]] = {}  # alias -> tablas (None si derivada)
+
+    def add(self, alias: str, table: Optional[str]) -> None:
+        self.aliases.setdefault(alias.lower(), set()).add(table)
+
+    def resolve(self, alias: str) -> Optional[str]:
+        """Tabla del alias en el ámbito más interno que lo define (None si no es segura)."""
+        scope = self
+        while scope is not None:
+            tables = scope.aliases.get(alias)
+            if tables is not None:
+                return next(iter(tables)) if len(tables) == 1 else None
+            scope = scope.parent
+        return None
+
+
+class _Level:
+    """Nivel de paréntesis: consulta (SELECT ...) o expresión/función."""
+
+    def __init__(self, is_query: bool, parent: Optional["_Level"] = None, derived: bool = False):
+        self.is_query = is_query
+        self.derived = derived  # subconsulta o función en un FROM: lleva alias
+        self.in_from = False
+        if parent is None:
+            self.scope = _Scope()
+        elif is_query:
+            self.scope = _Scope(parent.scope)
+        else:
+            self.scope = parent.scope
+
+
+class SqlReferences:
+    """Tablas y columnas cualificadas (alias.columna) de una consulta.
+
+    `columns` es una lista de (alias, columna, tabla); la tabla es None cuando
+    el alias no se puede resolver con certeza (desconocido, derivado o ambiguo).
+    """
+
+    def __init__(self, sql: str):
+        self.tables: list[str] = []
+        self.ctes: set[str] = set()
+        self.columns: list[tuple[str, str, Optional[str]]] = []
+        self._tokens = _tokenize(sql)
+        self._refs: list[tuple[_Scope, str, str]] = []
+        self._parse()
+        # Los alias del FROM se conocen al terminar, aunque se usen antes (SELECT)
+        self.columns = [
+            (alias, column, scope.resolve(alias)) for scope, alias, column in self._refs
+        ]
+
+    def _peek(self, i: int) -> tuple[str, str]:
+        return self._tokens[i] if i < len(self._tokens) else ("", "")
+
+    def _parse(self) -> None:
+        tokens = self._tokens
+        levels = [_Level(is_query=True)]
+        i = 0
+        while i < len(tokens):
+            kind, value = tokens[i]
+            lower = value.lower()
+            level = levels[-1]
+
+            if value == "(":
+                nxt = self._peek(i + 1)[1].lower()
+                levels.append(_Level(nxt in ("select", "with", "values"), level))
+                i += 1
+                continue
+
+            if value == ")":
+                closed = levels.pop() if len(levels) > 1 else level
+                i += 1
+                if closed.derived:
+                    i = self._read_alias(i, None, levels[-1].scope)
+                continue
+
+            if kind in ("word", "keyword") and self._peek(i + 1)[1].lower() == "as" and (
+                self._peek(i + 2)[1] == "("
+            ):
+                # WITH nombre AS ( ... ): una CTE no está en el catálogo
+                self.ctes.add(lower)
+
+            if not level.is_query:
+                i = self._column_ref(i, level.scope)
+                continue
+
+            # IS [NOT] DISTINCT FROM es un operador, no una cláusula FROM
+            distinct_from = lower == "from" and i > 0 and tokens[i - 1][1].lower() == "distinct"
+            if (lower in ("from", "join") and not distinct_from) or (
+                value == "," and level.in_from
+            ):
+                level.in_from = True
+                i = self._read_table(i + 1, levels)
+                continue
+
+            if lower in ("union", "intersect", "except"):
+                # Cada rama de un UNION tiene sus propios alias
+                level.scope = _Scope(level.scope.parent)
+            if lower in _CLAUSE_END or lower == "select":
+                level.in_from = False
+
+            i = self._column_ref(i, level.scope)
+
+    def _read_table(self, i: int, levels: list[_Level]) -> int:
+        scope = levels[-1].scope
+        while self._peek(i)[1].lower() in ("only", "lateral"):
+            i += 1
+
+        if self._peek(i)[1] == "(":
+            nxt = self._peek(i + 1)[1].lower()
+            levels.append(
+                _Level(nxt in ("select", "with", "values"), levels[-1], derived=True)
+            )
+            return i + 1
+
+        parts = []
+        while self._peek(i)[0] == "word":
+            parts.append(self._peek(i)[1])
+            if self._peek(i + 1)[1] != ".":
+                break
+            i += 2
+        if not parts:
+            return i
+        i += 1
+
+        if self._peek(i)[1] == "(":  # función de tabla: generate_series(...) g
+            levels.append(_Level(False, levels[-1], derived=True))
+            return i + 1
+
+        name = ".".join(parts[-2:])
+        self.tables.append(name)
+        scope.add(parts[-1], name)
+        scope.add(name, name)
+        return self._read_alias(i, name, scope)
+
+    def _read_alias(self, i: int, table: Optional[str], scope: _Scope) -> int:
+        if self._peek(i)[1].lower() == "as":
+            i += 1
+        kind, value = self._peek(i)
+        if kind == "word":
+            scope.add(value, table)
+            return i + 1
+        return i
+
+    def _column_ref(self, i: int, scope: _Scope) -> int:
+        kind, value = self._peek(i)
+        if (
+            kind == "word"
+            and self._peek(i + 1)[1] == "."
+            and self._peek(i + 2)[0] in ("word", "keyword")
+            and self._peek(i + 3)[1] not in (".", "(")
+            and (i == 0 or self._peek(i - 1)[1] != ".")
+        ):
+            self._refs.append((scope, value.lower(), self._peek(i + 2)[1]))
+            return i + 3
+        return i + 1
+
+
+def _is_system(name: str, source: str) -> bool:
+    lower = name.lower()
+    if "." in lower:
+        return lower.split(".")[0] in _SYSTEM_SCHEMAS
+    if source == "sqlserver":
+        return lower.startswith("sys")
+    return lower.startswith("pg_")
+
+
+def _suggest(name: str, candidates: list[str]) -> list[str]:
+    lookup = {candidate.lower(): candidate for candidate in candidates}
+    matches = difflib.get_close_matches(name.lower(), list(lookup), n=3, cutoff=0.6)
+    return [lookup[match] for match in matches]
+
+
+def find_issues(sql: str, source: str, catalog) -> list[dict]:
+    """Tablas y columnas cualificadas de `sql` que no existen en el catálogo de `source`."""
+    refs = SqlReferences(sql)
+    issues = []
+    table_names = [table["table_name"] for table in catalog.tables(source)]
+    resolved: dict[str, Optional[dict]] = {}
+
+    for name in refs.tables:
+        if name.lower() in refs.ctes or name.startswith(("#", "@")) or _is_system(name, source):
+            continue
+        table = catalog.get_table(source, name)
+        resolved[name] = table
+        if table is None and not any(i["name"] == name for i in issues):
+            issues.append(
+                {
+                    "type": "unknown_table",
+                    "name": name,
+                    "suggestions": _suggest(name.split(".")[-1], table_names),
+                }
+            )
+
+    for alias, column, table_name in refs.columns:
+        # Sin una tabla segura (alias ambiguo, derivado...) no se rechaza nada
+        if column == "*" or table_name is None:
+            continue
+        table = resolved.get(table_name)
+        if not table or not table.get("columns"):
+            continue
+        columns = [c["name"] for c in table["columns"]]
+        if column.lower() in (c.lower() for c in columns):
+            continue
+        ref = f"{alias}.{column}"
+        if not any(i["name"] == ref for i in issues):
+            issues.append(
+                {
+                    "type": "unknown_column",
+                    "name": ref,
+                    "table": table["table_name"],
+                    "suggestions": _suggest(column, columns),
+                }
+            )
+    return issues
+
+
+def _describe_issue(issue: dict) -> str:
+    if issue["type"] == "unknown_table":
+        text = f"table '{issue['name']}' does not exist"
+    else:
+        text = f"column '{issue['name']}' does not exist in table '{issue['table']}'"
+    if issue["suggestions"]:
+        text += f" (did you mean: {', '.join(issue['suggestions'])}?)"
+    return text
+
+
+def validate_query(sql: str, source: str) -> Optional[dict]:
+    """
+    Comprueba localmente las tablas y columnas de una consulta contra el catálogo.
+
+    Devuelve None si la consulta puede ejecutarse (o si no hay catálogo de
+    `source` todavía), o la respuesta de error para el modelo, con sugerencias.
+    Se desactiva con SQL_VALIDATION=false.
+    """
+    if os.getenv("SQL_VALIDATION", "true").lower() == "false":
+        return None
+
+    from .catalog import start_catalog
+
+    try:
+        catalog = start_catalog()
+        if not catalog.has_source(source):
+            return None
+        issues = find_issues(sql, source, catalog)
+    except Exception as e:
+        print(f"SQL validation skipped: {e}")
+        return None
+
+    if not issues:
+        return None
+
+    return {
+        "status": "error",
+        "error_type": "validation_error",
+        "message": "Query not executed: "
+        + "; ".join(_describe_issue(issue) for issue in issues)
+        + ". Use find_tables to look up table and column names.",
+        "issues": issues,
+    }
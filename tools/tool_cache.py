@@ -0,0 +1,9 @@
+import os
+
+from .ttl_cache import TTLCache
+
+# Salidas memoizadas por ToolRunner, con clave (herramienta, call_key); las
+# consultas SQL no pasan por aquí, ya las cachea query_cache
+tool_cache = TTLCache(
+    max_bytes=int(os.getenv("TOOL_CACHE_MAX_BYTES") or 16 * 1024 * 1024)
+)
@@ -0,0 +1,120 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .serialization import dumps
+
+_MAX_READ_LENGTH = 8000
+
+
+class ToolOutputStore:
+    """Salidas completas de herramientas que se recortaron antes de enviarlas al modelo.
+
+    Cada salida se guarda bajo un handle aleatorio durante `ttl` segundos; el
+    tamaño total se limita a `max_bytes` expulsando las menos usadas.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, text: str) -> Optional[str]:
+        """Guarda `text` y devuelve su handle (None si no cabe en el almacén)."""
+        size = len(text)
+        if size > self.max_bytes:
+            return None
+
+        handle = f"out_{secrets.token_urlsafe(9)}"
+        with self._lock:
+            self._purge_expired()
+            self._entries[handle] = (text, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return handle
+
+    def get(self, handle: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            text, expires = entry
+            if time.monotonic() >= expires:
+                self._remove(handle)
+                return None
+            self._entries.move_to_end(handle)
+            return text
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        for handle in [h for h, (_, expires) in self._entries.items() if now >= expires]:
+            self._remove(handle)
+
+    def _remove(self, handle: str) -> None:
+        text, _ = self._entries.pop(handle)
+        self._bytes -= len(text)
+
+
+_store: Optional[ToolOutputStore] = None
+_lock = threading.Lock()
+
+
+def get_output_store() -> ToolOutputStore:
+    """Almacén del proceso (TOOL_OUTPUT_STORE_MAX_BYTES, TOOL_OUTPUT_TTL en segundos)."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = ToolOutputStore(
+                    max_bytes=int(os.getenv("TOOL_OUTPUT_STORE_MAX_BYTES") or 64 * 1024 * 1024),
+                    ttl=float(os.getenv("TOOL_OUTPUT_TTL") or 3600),
+                )
+    return _store
+
+
+def read_tool_output(handle: str = "", offset: int = 0, length: int = _MAX_READ_LENGTH) -> str:
+    """
+    Lee un fragmento de la salida completa de una herramienta que se recortó.
+
+    Args:
+        handle (str): Handle indicado en la nota de la salida recortada.
+        offset (int): Posición (en caracteres) desde la que leer.
+        length (int): Número de caracteres a leer (máximo 8000).
+
+    Returns:
+        str: JSON con el fragmento, el tamaño total y el siguiente offset.
+    """
+    text = get_output_store().get(handle or "")
+    if text is None:
+        return dumps(
+            {
+                "status": "error",
+                "message": "Handle inválido o expirado. Vuelve a ejecutar la herramienta original.",
+            }
+        )
+
+    offset = max(0, min(int(offset or 0), len(text)))
+    length = max(1, min(int(length or _MAX_READ_LENGTH), _MAX_READ_LENGTH))
+    end = min(offset + length, len(text))
+    return dumps(
+        {
+            "status": "success",
+            "handle": handle,
+            "offset": offset,
+            "total_length": len(text),
+            "content": text[offset:end],
+            "next_offset": end if end < len(text) else None,
+        }
+    )
+
+
+async def async_read_tool_output(
+    handle: str = "", offset: int = 0, length: int = _MAX_READ_LENGTH
+) -> str:
+    return read_tool_output(handle, offset, length)
@@ -1,4 +1,4 @@
-import json
+from .serialization import dumps
 
 
 def get_current_weather(city: str):
@@ -13,7 +13,7 @@ def get_current_weather(city: str):
     """
     print(f"get_current_weather: {city}")
 
-    return json.dumps(
+    return dumps(
         {
             "city": city,
             "temperature": 24,
@@ -37,7 +37,7 @@ async def async_get_current_weather(city: str):
     """
     print(f"async_get_current_weather: {city}")
     
-    return json.dumps(
+    return dumps(
         {
             "city": city,
             "temperature": 24,
@@ -49,6 +49,28 @@ async def async_get_current_weather(city: str):
     )
 
 
+def get_current_weather_batch(calls: list[dict]) -> list:
+    """
+    Obtiene el clima de varias ciudades en una sola llamada.
+
+    Args:
+        calls (list[dict]): Argumentos de cada llamada ({"city": ...})
+
+    Returns:
+        list: Un JSON con información del clima por ciudad, en el mismo orden
+    """
+    return [get_current_weather(**kwargs) for kwargs in calls]
+
+
+async def async_get_current_weather_batch(calls: list[dict]) -> list:
+    return [await async_get_current_weather(**kwargs) for kwargs in calls]
+
+
+# Las llamadas en paralelo de una misma respuesta del modelo se agrupan en un lote
+get_current_weather.batch = get_current_weather_batch
+async_get_current_weather.batch = async_get_current_weather_batch
+
+
 if __name__ == "__main__":
     # Prueba de la función
     result = get_current_weather("Madrid")